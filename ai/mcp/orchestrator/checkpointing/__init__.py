@@ -0,0 +1,23 @@
+"""
+Checkpointing - сохранение состояния LangGraph workflow по шагам (SQLite)
+
+Используется LangGraphOrchestrator (langgraph_orchestrator.py),
+опциональная зависимость: pip install langgraph-checkpoint-sqlite
+
+```python
+from checkpointing import open_sqlite_checkpointer
+
+checkpointer = open_sqlite_checkpointer(Path(".orchestrator_state/checkpoints.sqlite"))
+app = workflow.compile(checkpointer=checkpointer)
+app.invoke(state, {"configurable": {"thread_id": run_id}})
+app.invoke(None, {"configurable": {"thread_id": run_id}})  # продолжение прерванного прогона
+```
+"""
+
+from .sqlite import ThreadedSqliteSaver, open_sqlite_checkpointer
+
+__all__ = [
+    # SQLite
+    "ThreadedSqliteSaver",
+    "open_sqlite_checkpointer",
+]
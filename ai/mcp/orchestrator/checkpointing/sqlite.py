@@ -0,0 +1,56 @@
+"""
+Checkpoint'ы LangGraph в локальном SQLite
+Каждый шаг графа (включая завершённые ветки fan-out) сохраняется до перехода к следующему,
+поэтому прерванный прогон продолжается без повторных вызовов уже ответивших агентов
+"""
+
+import asyncio
+import sqlite3
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError as e:
+    raise ImportError(
+        "Для checkpoint'ов в SQLite нужен пакет langgraph-checkpoint-sqlite: pip install langgraph-checkpoint-sqlite"
+    ) from e
+
+
+class ThreadedSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver с async-методами для ainvoke / astream
+
+    SqliteSaver поддерживает только синхронный API; асинхронные методы выполняют те же
+    операции в пуле потоков (соединение общее, доступ сериализуется блокировкой SqliteSaver).
+    Запись checkpoint'а - миллисекунды на фоне секунд генерации, event loop не блокируется.
+    """
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter: Optional[Dict[str, Any]] = None, before=None,
+                    limit: Optional[int] = None) -> AsyncIterator:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def open_sqlite_checkpointer(path: Path) -> ThreadedSqliteSaver:
+    """Checkpointer на файле path (каталог создаётся, схема - при первом открытии)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    saver = ThreadedSqliteSaver(conn)
+    saver.setup()
+    return saver
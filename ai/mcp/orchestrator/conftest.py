@@ -0,0 +1,29 @@
+"""
+Общие фикстуры тестов оркестратора
+"""
+
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+AGENTS_MAPPING = Path(__file__).parent.parent.parent / "agents_mapping.json"
+
+
+@pytest.fixture
+def orchestrator_module(monkeypatch):
+    """
+    Модуль langgraph_orchestrator без установленного autogen
+    Генератор агентов подменяется заглушкой: в тестах агенты - фейки, init_autogen не вызывается
+    """
+    try:
+        import autogen_agents_generator
+    except ImportError:
+        generator = types.ModuleType("autogen_agents_generator")
+        generator.AutoGenAgentsGenerator = type("AutoGenAgentsGenerator", (), {})
+        monkeypatch.setitem(sys.modules, "autogen_agents_generator", generator)
+    import langgraph_orchestrator
+
+    monkeypatch.setattr(langgraph_orchestrator, "AGENTS_MAPPING_PATH", AGENTS_MAPPING)
+    return langgraph_orchestrator
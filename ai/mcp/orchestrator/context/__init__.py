@@ -0,0 +1,49 @@
+"""
+Context - сборка промпта агента в бюджет токенов
+
+Используется LangGraphOrchestrator (langgraph_orchestrator.py):
+
+```python
+from context import ContextAssembler, ContextChunk, count_tokens
+
+assembler = ContextAssembler(token_budget=3000)
+chunks = [ContextChunk.from_hit(hit, "code") for hit in indexer.search_code(query)]
+prompt = assembler.assemble(query, history, chunks, reserved_tokens=count_tokens(system_prompt))
+prompt.messages  # [...история, {"role": "user", "content": "Контекст проекта: ... Запрос: ..."}]
+prompt.tokens    # <= 3000
+
+# История диалога: окно последних реплик + сводка старых, SQLite
+sessions = SessionStore(Path(".orchestrator_state/sessions.sqlite"), window_turns=20)
+sessions.extend("user-42", [{"role": "user", "content": query}, {"role": "assistant", "content": answer}])
+history = sessions.history("user-42")
+```
+"""
+
+from .tokens import count_tokens, truncate_to_tokens
+from .assembler import (
+    AssembledPrompt,
+    ContextAssembler,
+    ContextChunk,
+    deduplicate_chunks,
+    rank_chunks,
+)
+from .sessions import Session, SessionStore, Summarizer, truncating_summarizer
+
+__all__ = [
+    # Оценка токенов
+    "count_tokens",
+    "truncate_to_tokens",
+
+    # Сборка промпта
+    "ContextAssembler",
+    "AssembledPrompt",
+    "ContextChunk",
+    "deduplicate_chunks",
+    "rank_chunks",
+
+    # Память диалогов
+    "SessionStore",
+    "Session",
+    "Summarizer",
+    "truncating_summarizer",
+]
@@ -0,0 +1,212 @@
+"""
+Сборка промпта агента в фиксированный бюджет токенов
+RAG-чанки дедуплицируются (одинаковый текст, перекрывающиеся диапазоны строк одного файла)
+и ранжируются; история диалога берётся с конца; запрос включается всегда
+"""
+
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .tokens import count_tokens, truncate_to_tokens
+
+Message = Dict[str, str]
+
+# Служебная обёртка сообщения (роль, разделители) в токенах chat-шаблона
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@dataclass
+class ContextChunk:
+    """Фрагмент RAG-контекста: текст чанка и его место в проекте"""
+    content: str
+    source: str = ""  # "code" или "docs"
+    file_path: str = ""
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
+    score: float = 0.0
+
+    @classmethod
+    def from_hit(cls, hit: Dict[str, Any], source: str = "") -> "ContextChunk":
+        """Чанк из результата QdrantIndexer.search_code / search_docs"""
+        return cls(
+            content=hit.get("content", ""),
+            source=source,
+            file_path=hit.get("file_path", ""),
+            start_line=hit.get("start_line"),
+            end_line=hit.get("end_line"),
+            score=hit.get("score", 0.0),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def render(self) -> str:
+        location = self.file_path
+        if self.start_line is not None:
+            location += f":{self.start_line}-{self.end_line}"
+        return f"// {location}\n{self.content}" if location else self.content
+
+
+def _lines_exact(chunk: ContextChunk) -> bool:
+    """Текст чанка - ровно строки start_line..end_line (чанк не был обрезан по длине)"""
+    if chunk.start_line is None or chunk.end_line is None:
+        return False
+    return chunk.content.count("\n") + 1 == chunk.end_line - chunk.start_line + 1
+
+
+def deduplicate_chunks(chunks: Iterable[ContextChunk], min_new_ratio: float = 0.5) -> List[ContextChunk]:
+    """
+    Дедупликация в порядке ранга: повтор текста отбрасывается; у чанка, перекрывающего
+    уже взятые строки того же файла, перекрытие по краям отрезается (окна чанкинга перекрываются
+    на несколько строк), а чанк с новыми строками меньше min_new_ratio отбрасывается
+    """
+    seen: Set[str] = set()
+    covered: Dict[str, Set[int]] = {}
+    result = []
+
+    for chunk in chunks:
+        text_key = " ".join(chunk.content.split())
+        if not text_key or text_key in seen:
+            continue
+
+        if chunk.file_path and chunk.start_line is not None and chunk.end_line is not None:
+            lines = covered.setdefault(chunk.file_path, set())
+            span = range(chunk.start_line, chunk.end_line + 1)
+            new_lines = [line for line in span if line not in lines]
+            if len(new_lines) < min_new_ratio * len(span):
+                continue
+            if len(new_lines) < len(span) and _lines_exact(chunk):
+                start, end = new_lines[0], new_lines[-1]
+                content_lines = chunk.content.split("\n")
+                chunk = ContextChunk(
+                    content="\n".join(content_lines[start - chunk.start_line:end - chunk.start_line + 1]),
+                    source=chunk.source,
+                    file_path=chunk.file_path,
+                    start_line=start,
+                    end_line=end,
+                    score=chunk.score,
+                )
+            lines.update(span)
+
+        seen.add(text_key)
+        result.append(chunk)
+
+    return result
+
+
+def rank_chunks(chunks: Sequence[ContextChunk]) -> List[ContextChunk]:
+    """По убыванию score (RRF гибридного поиска сопоставим между коллекциями), при равенстве - исходный порядок"""
+    return sorted(chunks, key=lambda chunk: -chunk.score)
+
+
+@dataclass
+class AssembledPrompt:
+    """Результат сборки: сообщения для модели и учёт бюджета"""
+    messages: List[Message]
+    tokens: int
+    chunks: List[ContextChunk] = field(default_factory=list)
+    history_turns: int = 0
+    dropped_chunks: int = 0
+    dropped_turns: int = 0
+
+
+class ContextAssembler:
+    """
+    Упаковка истории + RAG + запроса в token_budget
+
+    Запрос включается всегда (обрезается, только если сам больше бюджета). Сводка сессии
+    (начальные system-сообщения истории) тоже всегда включается - в своём бюджете summary_tokens.
+    Оставшееся делится: реплики получают до history_share бюджета (свежие первыми, реплика длиннее
+    max_turn_share бюджета истории обрезается), RAG - остальное по рангу целыми чанками,
+    неиспользованный RAG-бюджет возвращается истории.
+    reserved_tokens - системный промпт агента, который идёт отдельно.
+    """
+
+    def __init__(self, token_budget: int = 3000, history_share: float = 0.4, summary_tokens: int = 400,
+                 max_turn_share: float = 0.5):
+        self.token_budget = token_budget
+        self.history_share = history_share
+        self.summary_tokens = summary_tokens
+        self.max_turn_share = max_turn_share
+
+    def select_chunks(self, chunks: Iterable[ContextChunk], budget: int) -> List[ContextChunk]:
+        """Дедупликация, ранжирование и отбор целых чанков в пределах budget токенов"""
+        selected, tokens = [], 0
+        # Сначала ранг: из перекрывающихся чанков остаётся более релевантный
+        for chunk in deduplicate_chunks(rank_chunks(list(chunks))):
+            chunk_tokens = count_tokens(chunk.render()) + 1
+            if tokens + chunk_tokens > budget:
+                continue
+            selected.append(chunk)
+            tokens += chunk_tokens
+        return selected
+
+    def _split_summary(self, history: Sequence[Message], budget: int) -> Tuple[List[Message], List[Message]]:
+        """Сводка (начальные system-сообщения, обрезанные до budget токенов) и реплики"""
+        count = next((i for i, message in enumerate(history) if message["role"] != "system"), len(history))
+        summary = []
+        for message in history[:count]:
+            content = truncate_to_tokens(message["content"], max(0, budget - MESSAGE_OVERHEAD_TOKENS))
+            if not content:
+                break
+            summary.append(message if content == message["content"] else {**message, "content": content})
+            budget -= count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+        return summary, list(history[count:])
+
+    def _select_history(self, turns: Sequence[Message], budget: int) -> List[Message]:
+        """
+        Свежие реплики в пределах budget: длинная реплика обрезается до max_turn_share бюджета,
+        не поместившаяся - пропускается, более старые продолжают набираться
+        """
+        selected, tokens = [], 0
+        turn_limit = int(budget * self.max_turn_share) - MESSAGE_OVERHEAD_TOKENS
+        for message in reversed(turns):
+            if count_tokens(message["content"]) > turn_limit:
+                content = truncate_to_tokens(message["content"], turn_limit) if turn_limit > 0 else ""
+                if not content:
+                    continue
+                message = {**message, "content": content}
+            message_tokens = count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+            if tokens + message_tokens > budget:
+                continue
+            selected.append(message)
+            tokens += message_tokens
+        selected.reverse()
+        return selected
+
+    def _history_tokens(self, history: Sequence[Message]) -> int:
+        return sum(count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in history)
+
+    def _user_message(self, query: str, chunks: Sequence[ContextChunk]) -> str:
+        if not chunks:
+            return query
+        context = "\n\n".join(chunk.render() for chunk in chunks)
+        return f"Контекст проекта:\n\n{context}\n\nЗапрос: {query}"
+
+    def assemble(self, query: str, history: Sequence[Message] = (), chunks: Iterable[ContextChunk] = (),
+                 reserved_tokens: int = 0) -> AssembledPrompt:
+        chunks = list(chunks)
+        available = max(0, self.token_budget - reserved_tokens - MESSAGE_OVERHEAD_TOKENS)
+        query = truncate_to_tokens(query, available)
+        remaining = max(0, available - count_tokens(query) - count_tokens("Контекст проекта:\n\nЗапрос: "))
+
+        # Сводка сессии - в своём бюджете: иначе она, как самая старая, вытесняется первой
+        summary, turns = self._split_summary(history, min(self.summary_tokens, remaining))
+        remaining = max(0, remaining - self._history_tokens(summary))
+
+        history_turns = self._select_history(turns, int(remaining * self.history_share))
+        selected = self.select_chunks(chunks, remaining - self._history_tokens(history_turns))
+        context_tokens = count_tokens(self._user_message("", selected)) if selected else 0
+        # Неиспользованный RAG-бюджет - более старым репликам
+        history_turns = [*summary, *self._select_history(turns, remaining - context_tokens)]
+
+        messages = [*history_turns, {"role": "user", "content": self._user_message(query, selected)}]
+        tokens = reserved_tokens + sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+        return AssembledPrompt(
+            messages=messages,
+            tokens=tokens,
+            chunks=selected,
+            history_turns=len(history_turns),
+            dropped_chunks=len(chunks) - len(selected),
+            dropped_turns=len(history) - len(history_turns),
+        )
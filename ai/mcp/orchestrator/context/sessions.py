@@ -0,0 +1,211 @@
+"""
+Память диалогов: скользящее окно реплик + сводка более старых (SQLite)
+Сессия загружается с диска при первом обращении; старые реплики сворачиваются в сводку
+в фоновом потоке, поэтому история в промпте не растёт с длиной сессии
+"""
+
+import concurrent.futures
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .tokens import count_tokens, truncate_to_tokens
+
+Message = Dict[str, str]
+
+# (текущая сводка, реплики для сворачивания) -> новая сводка
+Summarizer = Callable[[str, Sequence[Message]], str]
+
+SUMMARY_PREFIX = "Краткое содержание предыдущей части диалога:\n"
+
+
+def truncating_summarizer(max_tokens: int = 400) -> Summarizer:
+    """
+    Сводка без LLM: прежняя сводка + первая строка каждой реплики, обрезанные до max_tokens
+    (с конца - свежие реплики важнее)
+    """
+    def summarize(summary: str, turns: Sequence[Message]) -> str:
+        lines = [summary] if summary else []
+        lines += [f"{turn['role']}: {turn['content'].strip().splitlines()[0]}" for turn in turns if turn["content"].strip()]
+        text = "\n".join(lines)
+        while count_tokens(text) > max_tokens and "\n" in text:
+            text = text.split("\n", 1)[1]
+        return truncate_to_tokens(text, max_tokens)
+    return summarize
+
+
+@dataclass
+class Session:
+    """Состояние диалога: сводка свёрнутых реплик и окно последних"""
+    session_id: str
+    summary: str = ""
+    turns: List[Message] = field(default_factory=list)
+    # Номер первой реплики окна (= число свёрнутых в сводку)
+    first_seq: int = 0
+    summarizing: bool = False
+
+    @property
+    def total_turns(self) -> int:
+        return self.first_seq + len(self.turns)
+
+
+class SessionStore:
+    """
+    Хранилище сессий по session_id
+
+    Все реплики пишутся в SQLite (полный журнал); в памяти - только сводка и окно.
+    Когда окно превышает window_turns + summarize_batch, самые старые summarize_batch реплик
+    сворачиваются в сводку в фоне (summarizer - LLM или truncating_summarizer).
+    В памяти держится не больше max_sessions сессий (LRU), остальные догружаются лениво.
+    """
+
+    def __init__(self, path: Optional[Path] = None, window_turns: int = 20, summarize_batch: int = 10,
+                 summarizer: Optional[Summarizer] = None, max_sessions: int = 256):
+        self.path = Path(path) if path else None
+        self.window_turns = window_turns
+        self.summarize_batch = summarize_batch
+        self.summarizer = summarizer or truncating_summarizer()
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarize")
+        self._pending: List[concurrent.futures.Future] = []
+
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path) if self.path else ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " summary TEXT NOT NULL,"
+            " first_seq INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            " session_id TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " role TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " PRIMARY KEY (session_id, seq))"
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def _load(self, session_id: str) -> Session:
+        """Сессия из памяти или с диска (только сводка и несвёрнутые реплики)"""
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            return session
+
+        session = Session(session_id)
+        row = self._conn.execute(
+            "SELECT summary, first_seq FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is not None:
+            session.summary, session.first_seq = row
+            session.turns = [
+                {"role": role, "content": content}
+                for role, content in self._conn.execute(
+                    "SELECT role, content FROM turns WHERE session_id = ? AND seq >= ? ORDER BY seq",
+                    (session_id, session.first_seq),
+                )
+            ]
+
+        self._sessions[session_id] = session
+        while len(self._sessions) > self.max_sessions:
+            # Вытесняется давно не использованная сессия без фоновой сводки (её состояние уже на диске)
+            idle = next((key for key, value in self._sessions.items() if not value.summarizing), None)
+            if idle is None:
+                break
+            del self._sessions[idle]
+        return session
+
+    def _save_session(self, session: Session) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+            (session.session_id, session.summary, session.first_seq, time.time()),
+        )
+
+    def history(self, session_id: str) -> List[Message]:
+        """История для промпта: сводка (если есть) + окно последних реплик"""
+        with self._lock:
+            session = self._load(session_id)
+            messages = list(session.turns)
+            if session.summary:
+                messages.insert(0, {"role": "system", "content": SUMMARY_PREFIX + session.summary})
+            return messages
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        """Новая реплика; при переполнении окна - фоновое сворачивание старых реплик"""
+        self.extend(session_id, [{"role": role, "content": content}])
+
+    def extend(self, session_id: str, messages: Sequence[Message]) -> None:
+        with self._lock:
+            session = self._load(session_id)
+            start = session.total_turns
+            session.turns.extend({"role": m["role"], "content": m["content"]} for m in messages)
+            self._save_session(session)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO turns VALUES (?, ?, ?, ?)",
+                [(session_id, start + i, m["role"], m["content"]) for i, m in enumerate(messages)],
+            )
+            self._conn.commit()
+
+            if len(session.turns) > self.window_turns + self.summarize_batch and not session.summarizing:
+                session.summarizing = True
+                self._pending = [future for future in self._pending if not future.done()]
+                self._pending.append(self._pool.submit(self._summarize, session))
+
+    def _summarize(self, session: Session) -> None:
+        """Сворачивание самых старых реплик окна в сводку (в фоновом потоке)"""
+        try:
+            while True:
+                with self._lock:
+                    if len(session.turns) <= self.window_turns:
+                        return
+                    count = min(self.summarize_batch, len(session.turns) - self.window_turns)
+                    summary, batch = session.summary, session.turns[:count]
+
+                # Вызов модели - без блокировки: новые реплики добавляются в конец окна
+                new_summary = self.summarizer(summary, batch)
+
+                with self._lock:
+                    session.summary = new_summary
+                    del session.turns[:count]
+                    session.first_seq += count
+                    self._save_session(session)
+                    self._conn.commit()
+        except Exception as e:
+            # Окно остаётся несвёрнутым до следующей попытки - ответ пользователю не ломается
+            print(f"⚠️ Не удалось свернуть историю сессии {session.session_id}: {e}")
+        finally:
+            with self._lock:
+                session.summarizing = False
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Ожидание фоновых сводок (тесты, завершение процесса)"""
+        concurrent.futures.wait(list(self._pending), timeout=timeout)
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        self.wait()
+        self._pool.shutdown()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,52 @@
+"""
+Быстрая локальная оценка числа токенов промпта (без загрузки токенизатора модели)
+Оценка по классам символов близка к BPE-токенизаторам Qwen/Llama и немного завышена -
+упаковка в бюджет не выходит за окно модели
+"""
+
+import math
+import re
+
+# Латинское слово, слово в другом алфавите (кириллица), цифра, пробельный промежуток, прочий символ
+_PIECE_RE = re.compile(r"[A-Za-z]+|[^\W\d_A-Za-z]+|\d|\s+|[^\w\s]|_")
+
+# Символов на токен: английские слова и идентификаторы - ~4, кириллица - ~3
+LATIN_CHARS_PER_TOKEN = 4.0
+OTHER_CHARS_PER_TOKEN = 3.0
+
+
+def count_tokens(text: str) -> int:
+    """
+    Оценка числа токенов: слова - по длине и алфавиту, цифры и пунктуация - по токену на символ,
+    одиночный пробел сливается со следующим словом, перевод строки и отступ - токен
+    """
+    tokens = 0
+    for piece in _PIECE_RE.findall(text):
+        first = piece[0]
+        if first.isspace():
+            if len(piece) > 1 or first == "\n":
+                tokens += 1
+        elif first.isascii() and first.isalpha():
+            tokens += math.ceil(len(piece) / LATIN_CHARS_PER_TOKEN)
+        elif first.isalpha():
+            tokens += math.ceil(len(piece) / OTHER_CHARS_PER_TOKEN)
+        else:
+            tokens += 1
+    return tokens
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Начало текста, укладывающееся в max_tokens (по границе строки, если возможно)"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    lines, kept, tokens = text.split("\n"), [], 0
+    for line in lines:
+        line_tokens = count_tokens(line) + 1
+        if tokens + line_tokens > max_tokens:
+            break
+        kept.append(line)
+        tokens += line_tokens
+    if kept:
+        return "\n".join(kept)
+    # Одна длинная строка - пропорционально символам
+    return text[:max(0, int(len(text) * max_tokens / max(1, count_tokens(text))))]
@@ -3,16 +3,69 @@
 Индексирует SKILL.md файлы, документацию и код Swift
 """
 
+import argparse
 import json
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Dict, Any
-import qdrant_client
-from qdrant_client.models import Distance, VectorParams, PointStruct
-import hashlib
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+from indexing import (
+    IndexManifest,
+    FileState,
+    chunk_file,
+    EmbeddingBackend,
+    EmbeddingEngine,
+    HashingEmbeddingBackend,
+    LMStudioEmbeddingBackend,
+    CompletionTracker,
+    EmbeddingCache,
+    IndexingPipeline,
+    PointIdRegistry,
+    chunk_point_id,
+    relative_source_path,
+    discover_files,
+    read_files,
+    LexicalIndex,
+    reciprocal_rank_fusion,
+    create_watcher,
+    debounced_changes,
+    QueryCache,
+    IndexGeneration,
+    IndexingMetrics,
+    VectorStore,
+    SearchHit,
+    SearchFilter,
+    QdrantStore,
+    LocalVectorStore,
+)
+from indexing.chunking import DEFAULT_MAX_CHARS
+from indexing.storage import PAYLOAD_INDEX_FIELDS, path_prefixes, quantization_report
 
 # Путь к проекту Chat
 CHAT_PROJECT_PATH = Path(__file__).parent.parent
 
+# Локальное состояние индексатора (манифест инкрементальной индексации и т.п.)
+INDEX_STATE_PATH = Path(__file__).parent / ".index_state"
+MANIFEST_PATH = INDEX_STATE_PATH / "manifest.json"
+EMBEDDING_CACHE_PATH = INDEX_STATE_PATH / "embeddings.sqlite"
+GENERATION_PATH = INDEX_STATE_PATH / "generation"
+LOCAL_STORE_PATH = INDEX_STATE_PATH / "vectors"
+
+
+@dataclass
+class SearchRequest:
+    """Один поиск в QdrantIndexer.search_many (параметры как у search_code/search_docs)"""
+    query: str
+    collection: str = "code"  # "code" или "docs"
+    top_k: int = 5
+    mode: str = "hybrid"
+    directory: Any = None
+    language: Any = None
+    file_type: Any = None
+
 
 class QdrantIndexer:
     """
@@ -20,129 +73,264 @@ class QdrantIndexer:
     Используется MCP Memory Server и LangGraph Orchestrator
     """
 
-    def __init__(self, qdrant_url: str = "http://localhost:6333"):
-        self.client = qdrant_client.QdrantClient(host=qdrant_url.split(":")[0], port=int(qdrant_url.split(":")[1]))
+    def __init__(self, qdrant_url: str = "http://localhost:6333",
+                 embedding_backend: Optional[EmbeddingBackend] = None,
+                 embedding_workers: Optional[int] = None,
+                 embedding_processes: Optional[bool] = None,
+                 embedding_cache_path: Optional[Path] = EMBEDDING_CACHE_PATH,
+                 repository: str = "chat", project_root: Path = CHAT_PROJECT_PATH,
+                 store: Optional[VectorStore] = None):
+        # Сервер Qdrant по умолчанию; LocalVectorStore - встроенное хранилище без сервиса (CI, ноутбуки)
+        self.store = store or QdrantStore(qdrant_url)
         self.collection_name_code = "chat_code"
         self.collection_name_docs = "chat_docs"
+        # Несколько репозиториев могут жить в одной коллекции - ID и payload учитывают repository
+        self.repository = repository
+        self.project_root = project_root
+        self._id_registry = PointIdRegistry()
+        self.lexical_indexes: Dict[str, LexicalIndex] = {}
+        # Поколение индекса, которому соответствует загруженный BM25-индекс коллекции
+        self._lexical_generations: Dict[str, int] = {}
+        self.hybrid_candidates_factor = 4  # Кандидатов из каждого источника на один результат
+        self.rrf_k = 60  # Константа Reciprocal Rank Fusion
+        # Повторные запросы RAG отдаются из памяти, пока индекс не изменился (поколение общее с CLI индексации)
+        self.generation = IndexGeneration(GENERATION_PATH)
+        self.query_cache = QueryCache(max_entries=1024, ttl=300.0)
+        # Метрики последнего прогона индексации (пересоздаются в run_*_indexation)
+        self.metrics = IndexingMetrics()
         self.embedding_dim = 768  # nomic-embed-text
-
-    def _generate_vector_id(self, file_path: str) -> int:
-        """Генерация уникального ID на основе хеша пути файла"""
-        hash_obj = hashlib.md5(file_path.encode())
-        return int(hash_obj.hexdigest()[:8], 16)
+        self.chunk_max_chars = DEFAULT_MAX_CHARS  # Ограничение входа эмбеддинга на один чанк
+        self.upsert_batch_size = 64  # Точек в одном upsert
+        self.read_workers = 8  # Потоков чтения файлов
+        self.checkpoint_every_batches = 10  # Как часто сохранять манифест во время индексации
+
+        # По умолчанию - детерминированный локальный бэкенд (работает без сети и модели)
+        backend = embedding_backend or HashingEmbeddingBackend(self.embedding_dim)
+        self.embedding_dim = backend.dim
+        # Кэш эмбеддингов общий для индексации и поиска: неизменённый контент не эмбеддится повторно
+        cache = EmbeddingCache(embedding_cache_path) if embedding_cache_path else None
+        # Процессы или потоки: по умолчанию процессы для CPU-bound бэкенда (hashing), потоки для сетевых
+        self.embedder = EmbeddingEngine(backend, max_workers=embedding_workers, use_processes=embedding_processes,
+                                        cache=cache)
+        # Батчей в работе одновременно: загружает все ядра и ограничивает память
+        self.max_pending_batches = self.embedder.max_workers + 1
+
+    def _generate_vector_id(self, file_path: str, start_line: int = 0, end_line: int = 0) -> int:
+        """
+        Генерация стабильного 64-битного ID точки из (репозиторий, путь, диапазон строк)
+        Каждый ID проверяется на коллизию в рамках прогона индексации
+        """
+        source_path = relative_source_path(file_path, self.project_root)
+        point_id = chunk_point_id(self.repository, source_path, start_line, end_line)
+        return self._id_registry.register(point_id, f"{source_path}:{start_line}-{end_line}")
 
     def _create_collections(self) -> None:
-        """Создание коллекций в Qdrant если не существуют"""
+        """Создание коллекций в хранилище если не существуют"""
         # Коллекция для кода Swift
-        if not self.client.collection_exists(self.collection_name_code):
-            self.client.create_collection(
-                collection_name=self.collection_name_code,
-                vectors_config=VectorParams(size=self.embedding_dim, distance=Distance.COSINE),
-            )
+        if not self.store.collection_exists(self.collection_name_code):
+            self.store.create_collection(self.collection_name_code, self.embedding_dim)
             print(f"✅ Создана коллекция: {self.collection_name_code}")
+        else:
+            self.store.sync_collection_config(self.collection_name_code)
 
         # Коллекция для документации
-        if not self.client.collection_exists(self.collection_name_docs):
-            self.client.create_collection(
-                collection_name=self.collection_name_docs,
-                vectors_config=VectorParams(size=self.embedding_dim, distance=Distance.COSINE),
-            )
+        if not self.store.collection_exists(self.collection_name_docs):
+            self.store.create_collection(self.collection_name_docs, self.embedding_dim)
             print(f"✅ Создана коллекция: {self.collection_name_docs}")
+        else:
+            self.store.sync_collection_config(self.collection_name_docs)
+
+        # Payload-индексы для фильтрованного поиска (создание идемпотентно - существующие коллекции тоже получают их)
+        for collection_name in (self.collection_name_code, self.collection_name_docs):
+            for field_name in PAYLOAD_INDEX_FIELDS:
+                self.store.create_payload_index(collection_name, field_name)
 
     def _embed_text(self, text: str) -> list:
+        """Генерация эмбеддинга для текста (запросы поиска, одиночные документы)"""
+        return self.embedder.embed(text)
+
+    def _chunk_file(self, file_path: Path, content: str, collection_name: str) -> List[Tuple[int, str, dict]]:
         """
-        Генерация эмбеддинга для текста
-        В production использовать SentenceTransformer или API Qdrant
-        Для примера возвращаем случайный вектор (заменить на реальный)
+        Нарезка файла на чанки: (point id, текст для эмбеддинга, payload)
+        Payload содержит диапазон строк и текст чанка для RAG-контекста
         """
-        # Здесь будет интеграция с SentenceTransformer("nomic-embed-text")
-        # Для примера - заглушка
-        import random
-        return [random.uniform(-1, 1) for _ in range(self.embedding_dim)]
+        items = []
+        source_path = relative_source_path(file_path, self.project_root)
+        for chunk in chunk_file(file_path, content, max_chars=self.chunk_max_chars):
+            if collection_name == self.collection_name_code:
+                payload = {
+                    "file_path": str(file_path),
+                    "language": "swift",
+                    "size": len(content),
+                    "type": "code",
+                    "directory": str(file_path.parent),
+                }
+            else:
+                payload = {
+                    "file_path": str(file_path),
+                    "language": "markdown",
+                    "type": "documentation",
+                    "size": len(content),
+                    "directory": str(file_path.parent),
+                }
+            payload.update({
+                "repository": self.repository,
+                "source_path": source_path,
+                "path_prefixes": path_prefixes(source_path),
+                "chunk_index": chunk.index,
+                "start_line": chunk.start_line,
+                "end_line": chunk.end_line,
+                "symbol": chunk.symbol,
+                "content": chunk.text,
+            })
+            point_id = self._generate_vector_id(str(file_path), chunk.start_line, chunk.end_line)
+            items.append((point_id, chunk.text, payload))
+        return items
+
+    def _iter_file_chunks(self, files: Iterable[Path], collection_name: str, tracker: CompletionTracker,
+                          on_file_done: Callable[[str, List[int], FileState], None],
+                          failed: List[str]) -> Iterator[Tuple[int, str, dict]]:
+        """Ленивое чтение и чанкинг файлов (первые стадии конвейера)"""
+        # Чтение идёт в пуле потоков с опережением - I/O перекрывается с эмбеддингом
+        for source in read_files(files, max_workers=self.read_workers):
+            file_path = source.path
+            try:
+                if source.error is not None:
+                    raise source.error
+                self.metrics.count("bytes_read", source.size)
+                with self.metrics.timed("chunk_file"):
+                    items = self._chunk_file(file_path, source.content, collection_name)
+                self.metrics.count("chunks", len(items))
+            except Exception as e:
+                failed.append(str(file_path))
+                print(f"⚠️ Ошибка индексации {file_path}: {e}")
+                continue
 
-    def index_swift_files(self, project_path: Path = None) -> int:
+            # В манифест попадает состояние прочитанных байт: правка файла после чтения
+            # не должна помечать его проиндексированным с новым хешем
+            if tracker.expect(str(file_path), [point_id for point_id, _, _ in items], source.state):
+                on_file_done(str(file_path), [], source.state)
+            yield from items
+
+    def _index_files(self, files: Iterable[Path], collection_name: str,
+                     manifest: Optional[IndexManifest] = None) -> dict:
+        """
+        Потоковая индексация файлов в коллекцию батчами по upsert_batch_size точек
+        Файл записывается в манифест (чекпоинт), как только загружены все его чанки
+        """
+        tracker = CompletionTracker()
+        completed: List[str] = []
+        failed: List[str] = []
+        batches_done = 0
+
+        def on_file_done(key: str, point_ids: List[int], state: FileState) -> None:
+            completed.append(key)
+            if manifest is None:
+                return
+            previous = manifest.get(key)
+            manifest.record(Path(key), collection_name, point_ids, state)
+            stale_ids = [pid for pid in previous.point_ids if pid not in point_ids] if previous else []
+            self._delete_points(collection_name, stale_ids)
+
+        lexical_index = self._lexical_index(collection_name)
+
+        def on_batch_done(batch: List[Tuple[int, str, dict]]) -> None:
+            nonlocal batches_done
+            lexical_index.add_many(batch)
+            for key, point_ids, state in tracker.ack(point_id for point_id, _, _ in batch):
+                on_file_done(key, point_ids, state)
+
+            batches_done += 1
+            if manifest is not None and batches_done % self.checkpoint_every_batches == 0:
+                manifest.save()
+                lexical_index.save()
+
+        def upsert(points: List[Tuple[int, list, dict]]) -> None:
+            self.store.upsert(collection_name, points)
+
+        pipeline = IndexingPipeline(
+            self.embedder,
+            upsert,
+            batch_size=self.upsert_batch_size,
+            max_pending_batches=self.max_pending_batches,
+            on_batch_done=on_batch_done,
+            metrics=self.metrics,
+        )
+        with self.metrics.stage(f"index_{collection_name}"):
+            pipeline_stats = pipeline.run(
+                self._iter_file_chunks(files, collection_name, tracker, on_file_done, failed)
+            )
+
+        with self.metrics.stage("finalize"):
+            if manifest is not None:
+                manifest.save()
+            self.store.optimize(collection_name)
+            lexical_index.warm_up()
+            lexical_index.save()
+        if pipeline_stats.points:
+            self._bump_generation()
+
+        self.metrics.count("files_indexed", len(completed))
+        self.metrics.count("files_failed", len(failed) + len(tracker.pending()))
+        self.metrics.count("points_upserted", pipeline_stats.points)
+        self.metrics.count("upsert_retries", pipeline_stats.retries)
+
+        return {
+            "files": len(completed),
+            "completed": completed,
+            "chunks": pipeline_stats.points,
+            "failed_files": len(failed) + len(tracker.pending()),
+            "retries": pipeline_stats.retries,
+        }
+
+    def discover_sources(self, project_path: Path = None) -> Dict[str, List[Path]]:
+        """
+        Один обход проекта для обеих коллекций (с учётом .gitignore, build, DerivedData, Pods)
+        Возвращает {коллекция: [файлы]}
+        """
+        with self.metrics.stage("discovery"):
+            found = discover_files(project_path or self.project_root, [".swift", ".md"])
+        self.metrics.count("files_discovered", len(found[".swift"]) + len(found[".md"]))
+        return {
+            self.collection_name_code: found[".swift"],
+            self.collection_name_docs: found[".md"],
+        }
+
+    def index_swift_files(self, project_path: Path = None, manifest: Optional[IndexManifest] = None,
+                          files: Optional[List[Path]] = None) -> int:
         """
         Индексация всех Swift файлов проекта
         Возвращает количество проиндексированных файлов
         """
-        if not project_path:
-            project_path = CHAT_PROJECT_PATH
-
-        swift_files = list(project_path.rglob("*.swift"))
+        if files is None:
+            files = self.discover_sources(project_path)[self.collection_name_code]
+        swift_files = list(files)
         print(f"📂 Найдено {len(swift_files)} Swift файлов")
 
-        points = []
-        for file_path in swift_files:
-            try:
-                content = file_path.read_text(encoding='utf-8')
-                embedding = self._embed_text(content)
-
-                point = PointStruct(
-                    id=self._generate_vector_id(str(file_path)),
-                    vector=embedding,
-                    payload={
-                        "file_path": str(file_path),
-                        "language": "swift",
-                        "size": len(content),
-                        "type": "code",
-                        "directory": str(file_path.parent),
-                    }
-                )
-                points.append(point)
-            except Exception as e:
-                print(f"⚠️ Ошибка индексации {file_path}: {e}")
+        result = self._index_files(swift_files, self.collection_name_code, manifest)
+        print(f"✅ Проиндексировано {result['files']} Swift файлов ({result['chunks']} чанков)")
+        if result["failed_files"]:
+            print(f"⚠️ Не проиндексировано Swift файлов: {result['failed_files']}")
 
-        # Batch upsert в Qdrant
-        if points:
-            self.client.upsert(
-                collection_name=self.collection_name_code,
-                points=points,
-            )
-            print(f"✅ Проиндексировано {len(points)} Swift файлов")
+        return result["files"]
 
-        return len(points)
-
-    def index_documentation(self, project_path: Path = None) -> int:
+    def index_documentation(self, project_path: Path = None, manifest: Optional[IndexManifest] = None,
+                            files: Optional[List[Path]] = None) -> int:
         """
         Индексация документации (SKILL.md, README.md, *.md файлы)
         Возвращает количество проиндексированных файлов
         """
-        if not project_path:
-            project_path = CHAT_PROJECT_PATH
-
-        # Поиск всех MD файлов
-        md_files = list(project_path.rglob("*.md"))
+        if files is None:
+            files = self.discover_sources(project_path)[self.collection_name_docs]
+        md_files = list(files)
         print(f"📄 Найдено {len(md_files)} Markdown файлов")
 
-        points = []
-        for file_path in md_files:
-            try:
-                content = file_path.read_text(encoding='utf-8')
-                embedding = self._embed_text(content)
-
-                point = PointStruct(
-                    id=self._generate_vector_id(str(file_path)),
-                    vector=embedding,
-                    payload={
-                        "file_path": str(file_path),
-                        "type": "documentation",
-                        "size": len(content),
-                        "directory": str(file_path.parent),
-                    }
-                )
-                points.append(point)
-            except Exception as e:
-                print(f"⚠️ Ошибка индексации {file_path}: {e}")
+        result = self._index_files(md_files, self.collection_name_docs, manifest)
+        print(f"✅ Проиндексировано {result['files']} Markdown файлов ({result['chunks']} чанков)")
+        if result["failed_files"]:
+            print(f"⚠️ Не проиндексировано Markdown файлов: {result['failed_files']}")
 
-        # Batch upsert в Qdrant
-        if points:
-            self.client.upsert(
-                collection_name=self.collection_name_docs,
-                points=points,
-            )
-            print(f"✅ Проиндексировано {len(points)} Markdown файлов")
-
-        return len(points)
+        return result["files"]
 
     def index_agents_mapping(self) -> int:
         """
@@ -158,75 +346,222 @@ class QdrantIndexer:
             content = mapping_path.read_text(encoding='utf-8')
             embedding = self._embed_text(content)
 
-            point = PointStruct(
-                id=self._generate_vector_id(str(mapping_path)),
-                vector=embedding,
-                payload={
+            point = (
+                self._generate_vector_id(str(mapping_path)),
+                embedding,
+                {
                     "file_path": str(mapping_path),
+                    "language": "json",
                     "type": "configuration",
+                    "path_prefixes": path_prefixes(relative_source_path(mapping_path, self.project_root)),
                     "size": len(mapping_path.read_text()),
                     "description": "Маппинг 30+ агентов для маршрутизации запросов"
-                }
+                },
             )
 
-            self.client.upsert(
-                collection_name=self.collection_name_docs,
-                points=[point],
-            )
+            self.store.upsert(self.collection_name_docs, [point])
+            self._bump_generation()
             print(f"✅ Проиндексирован agents_mapping.json")
             return 1
         except Exception as e:
             print(f"⚠️ Ошибка индексации: {e}")
             return 0
 
-    def search_code(self, query: str, top_k: int = 5) -> list:
+    def _lexical_index(self, collection_name: str) -> LexicalIndex:
         """
-        Поиск по коду в Qdrant (RAG для LangGraph)
-        Возвращает топ-K наиболее релевантных файлов
+        BM25-индекс коллекции (загружается с диска при первом обращении)
+        Перезагружается, когда поколение индекса сменил другой процесс (CLI индексация, watcher) -
+        иначе поиск сливает ранги с устаревшим индексом и отдаёт payload удалённых чанков
         """
-        # Генерация эмбеддинга запроса
-        query_embedding = self._embed_text(query)
-
-        # Поиск в коллекции code
-        results = self.client.search(
-            collection_name=self.collection_name_code,
-            query_vector=query_embedding,
-            limit=top_k,
-        )
-
+        generation = self.generation.value
+        if self._lexical_generations.get(collection_name) != generation:
+            path = INDEX_STATE_PATH / f"lexical_{collection_name}.pkl"
+            self.lexical_indexes[collection_name] = LexicalIndex.load(path)
+            self._lexical_generations[collection_name] = generation
+        return self.lexical_indexes[collection_name]
+
+    def _bump_generation(self) -> None:
+        """Новое поколение после изменений этого процесса: загруженные BM25-индексы уже актуальны"""
+        generation = self.generation.bump()
+        for collection_name in self.lexical_indexes:
+            self._lexical_generations[collection_name] = generation
+
+    def _delete_points(self, collection_name: str, point_ids: List[int]) -> None:
+        """Удаление точек из хранилища векторов и лексического индекса"""
+        if not point_ids:
+            return
+        self.store.delete(collection_name, point_ids)
+        self._lexical_index(collection_name).remove(point_ids)
+        self._bump_generation()
+
+    def _cached_search(self, collection_name: str, query: str, top_k: int, mode: str,
+                       query_filter: Optional[SearchFilter] = None) -> List[Tuple[float, dict]]:
+        """
+        Поиск через кэш результатов: повтор запроса в том же поколении индекса
+        не требует эмбеддинга и обращения к Qdrant
+        """
+        key = QueryCache.make_key(collection_name, query, top_k, mode, query_filter)
+        generation = self.generation.value
+        results = self.query_cache.get(key, generation)
+        if results is None:
+            results = self._search(collection_name, query, top_k, mode, query_filter)
+            self.query_cache.put(key, results, generation)
+        return results
+
+    def _plan_search(self, collection_name: str, mode: str, top_k: int) -> Tuple[str, int]:
+        """Фактический режим поиска и число кандидатов из каждого источника"""
+        if mode not in ("vector", "lexical", "hybrid"):
+            raise ValueError(f"Неизвестный режим поиска: {mode}")
+        if mode == "hybrid" and not len(self._lexical_index(collection_name)):
+            mode = "vector"
+        # Для слияния рангов берём больше кандидатов из каждого источника
+        return mode, top_k * self.hybrid_candidates_factor if mode == "hybrid" else top_k
+
+    def _search(self, collection_name: str, query: str, top_k: int, mode: str,
+                query_filter: Optional[SearchFilter] = None,
+                hits: Optional[List[SearchHit]] = None) -> List[Tuple[float, dict]]:
+        """
+        Поиск в коллекции: vector (dense), lexical (BM25) или hybrid (RRF по обоим рангам)
+        query_filter ограничивает оба источника (payload-индекс хранилища и payload лексического индекса)
+        hits - уже найденные векторным поиском точки (batch-поиск в search_many)
+        Возвращает [(score, payload)]
+        """
+        mode, candidates = self._plan_search(collection_name, mode, top_k)
+        lexical_index = self._lexical_index(collection_name)
+        payloads: Dict[Any, dict] = {}
+        rankings: List[List[Any]] = []
+        scores: Dict[Any, float] = {}
+
+        if mode in ("vector", "hybrid"):
+            if hits is None:
+                hits = self.store.search(collection_name, self._embed_text(query), candidates, query_filter)
+            hits = hits[:candidates]
+            for hit in hits:
+                payloads[hit.id] = hit.payload
+                scores[hit.id] = hit.score
+            rankings.append([hit.id for hit in hits])
+
+        if mode in ("lexical", "hybrid"):
+            lexical_hits = lexical_index.search(query, candidates, query_filter)
+            rankings.append([doc_id for doc_id, _ in lexical_hits])
+            if mode == "lexical":
+                scores.update(lexical_hits)
+
+        if mode == "hybrid":
+            ranked = reciprocal_rank_fusion(rankings, k=self.rrf_k)[:top_k]
+        else:
+            ranked = [(doc_id, scores[doc_id]) for doc_id in rankings[0][:top_k]]
+
+        # Текст чанка хранится только в хранилище векторов - догружаем payload найденных лексически
+        missing = [doc_id for doc_id, _ in ranked if doc_id not in payloads]
+        if missing:
+            payloads.update(self.store.retrieve(collection_name, missing))
+            for doc_id in missing:
+                payloads.setdefault(doc_id, lexical_index.payloads.get(doc_id, {}))
+
+        return [(score, payloads[doc_id]) for doc_id, score in ranked]
+
+    def _format_results(self, collection_name: str, results: List[Tuple[float, dict]]) -> list:
+        """Результаты поиска для RAG-контекста (поля зависят от коллекции)"""
+        if collection_name == self.collection_name_code:
+            return [
+                {
+                    "file_path": payload["file_path"],
+                    "score": score,
+                    "size": payload["size"],
+                    "directory": payload["directory"],
+                    "start_line": payload.get("start_line"),
+                    "end_line": payload.get("end_line"),
+                    "symbol": payload.get("symbol", ""),
+                    "content": payload.get("content", ""),
+                }
+                for score, payload in results
+            ]
         return [
             {
-                "file_path": hit.payload["file_path"],
-                "score": hit.score,
-                "size": hit.payload["size"],
-                "directory": hit.payload["directory"],
+                "file_path": payload["file_path"],
+                "score": score,
+                "size": payload["size"],
+                "type": payload.get("type", "documentation"),
+                "start_line": payload.get("start_line"),
+                "end_line": payload.get("end_line"),
+                "symbol": payload.get("symbol", ""),
+                "content": payload.get("content", ""),
             }
-            for hit in results
+            for score, payload in results
         ]
 
-    def search_docs(self, query: str, top_k: int = 5) -> list:
+    def search_code(self, query: str, top_k: int = 5, mode: str = "hybrid",
+                    directory=None, language=None, file_type=None) -> list:
+        """
+        Поиск по коду в Qdrant (RAG для LangGraph)
+        Возвращает топ-K наиболее релевантных чанков (файл + диапазон строк)
+        mode: "hybrid" (по умолчанию, BM25 + вектор), "vector" или "lexical"
+        directory, language, file_type - фильтры по payload (строка или список):
+        search_code("навигация", directory="Features/") ищет только под Features
+        """
+        query_filter = SearchFilter.build(directory, language, file_type)
+        results = self._cached_search(self.collection_name_code, query, top_k, mode, query_filter)
+        return self._format_results(self.collection_name_code, results)
+
+    def search_docs(self, query: str, top_k: int = 5, mode: str = "hybrid",
+                    directory=None, language=None, file_type=None) -> list:
         """
         Поиск по документации в Qdrant (RAG для LangGraph)
-        Возвращает топ-K наиболее релевантных файлов
+        Возвращает топ-K наиболее релевантных чанков (файл + диапазон строк)
+        mode: "hybrid" (по умолчанию, BM25 + вектор), "vector" или "lexical"
+        directory, language, file_type - фильтры по payload (строка или список)
         """
-        # Генерация эмбеддинга запроса
-        query_embedding = self._embed_text(query)
+        query_filter = SearchFilter.build(directory, language, file_type)
+        results = self._cached_search(self.collection_name_docs, query, top_k, mode, query_filter)
+        return self._format_results(self.collection_name_docs, results)
 
-        # Поиск в коллекции docs
-        results = self.client.search(
-            collection_name=self.collection_name_docs,
-            query_vector=query_embedding,
-            limit=top_k,
-        )
+    def search_many(self, requests: Sequence[Union[str, SearchRequest]]) -> List[list]:
+        """
+        Несколько поисков за один проход (контекст RAG: код + документация, подзапросы)
+        Промахи кэша эмбеддятся одним батчем, векторный поиск - один batch-запрос на коллекцию
+        Строка - поиск по коду с параметрами по умолчанию; результаты в порядке запросов
+        """
+        collections = {"code": self.collection_name_code, "docs": self.collection_name_docs}
+        requests = [SearchRequest(request) if isinstance(request, str) else request for request in requests]
+        generation = self.generation.value
+        results: List[Optional[List[Tuple[float, dict]]]] = [None] * len(requests)
+        # (номер запроса, коллекция, фильтр, ключ кэша, режим, кандидатов)
+        pending = []
+
+        for i, request in enumerate(requests):
+            if request.collection not in collections:
+                raise ValueError(f"Неизвестная коллекция: {request.collection}")
+            collection_name = collections[request.collection]
+            query_filter = SearchFilter.build(request.directory, request.language, request.file_type)
+            key = QueryCache.make_key(collection_name, request.query, request.top_k, request.mode, query_filter)
+            results[i] = self.query_cache.get(key, generation)
+            if results[i] is None:
+                mode, candidates = self._plan_search(collection_name, request.mode, request.top_k)
+                pending.append((i, collection_name, query_filter, key, mode, candidates))
+
+        vector_pending = [item for item in pending if item[4] != "lexical"]
+        vectors = self.embedder.embed_many(requests[item[0]].query for item in vector_pending)
+        hits: Dict[int, List[SearchHit]] = {}
+        for collection_name in {item[1] for item in vector_pending}:
+            group = [(item, vector) for item, vector in zip(vector_pending, vectors) if item[1] == collection_name]
+            batch = self.store.search_batch(
+                collection_name,
+                [vector for _, vector in group],
+                max(item[5] for item, _ in group),
+                [item[2] for item, _ in group],
+            )
+            for (item, _), item_hits in zip(group, batch):
+                hits[item[0]] = item_hits
+
+        for i, collection_name, query_filter, key, mode, _ in pending:
+            request = requests[i]
+            results[i] = self._search(collection_name, request.query, request.top_k, mode, query_filter, hits.get(i))
+            self.query_cache.put(key, results[i], generation)
 
         return [
-            {
-                "file_path": hit.payload["file_path"],
-                "score": hit.score,
-                "size": hit.payload["size"],
-                "type": hit.payload.get("type", "documentation"),
-            }
-            for hit in results
+            self._format_results(collections[request.collection], request_results)
+            for request, request_results in zip(requests, results)
         ]
 
     def run_full_indexation(self) -> dict:
@@ -235,15 +570,21 @@ class QdrantIndexer:
         Возвращает статистику индексации
         """
         print("🚀 Запуск полной индексации...")
+        self._start_metrics()
 
         # Создание коллекций
         self._create_collections()
+        self._id_registry = PointIdRegistry()
+
+        # Манифест обновляется и при полной индексации - следующий --incremental начнёт с чекпоинта
+        manifest = IndexManifest.load(MANIFEST_PATH)
+        sources = self.discover_sources()
 
         # Индексация Swift файлов
-        swift_count = self.index_swift_files()
+        swift_count = self.index_swift_files(manifest=manifest, files=sources[self.collection_name_code])
 
         # Индексация документации
-        docs_count = self.index_documentation()
+        docs_count = self.index_documentation(manifest=manifest, files=sources[self.collection_name_docs])
 
         # Индексация agents_mapping.json
         mapping_count = self.index_agents_mapping()
@@ -262,31 +603,200 @@ class QdrantIndexer:
             "swift_files": swift_count,
             "markdown_files": docs_count,
             "configuration": mapping_count,
-            "total": total
+            "total": total,
+            "metrics": self._finish_metrics(),
         }
 
+    def run_incremental_indexation(self, project_path: Path = None, manifest_path: Path = None) -> dict:
+        """
+        Инкрементальная индексация по локальному манифесту
+        Эмбеддит и загружает только новые/изменённые файлы, удаляет точки удалённых файлов
+        Возвращает счётчики added/updated/deleted/skipped
+        """
+        print("🚀 Запуск инкрементальной индексации...")
+        self._start_metrics()
+        self._create_collections()
+        self._id_registry = PointIdRegistry()
+
+        manifest = IndexManifest.load(manifest_path or MANIFEST_PATH)
+        stats = {"added": 0, "updated": 0, "deleted": 0, "skipped": 0, "failed": 0}
+
+        sources = self.discover_sources(project_path)
+
+        for collection_name, files in sources.items():
+            self._sync_collection(manifest, collection_name, manifest.diff(files, collection_name), stats)
+
+        manifest.save()
+
+        print(f"\n✅ Инкрементальная индексация завершена!")
+        print(f"📊 Статистика:")
+        print(f"  - Добавлено: {stats['added']}")
+        print(f"  - Обновлено: {stats['updated']}")
+        print(f"  - Удалено: {stats['deleted']}")
+        print(f"  - Пропущено (без изменений): {stats['skipped']}")
+        if stats["failed"]:
+            print(f"  - Ошибки: {stats['failed']}")
+
+        stats["metrics"] = self._finish_metrics()
+        return stats
+
+    def _sync_collection(self, manifest: IndexManifest, collection_name: str, diff, stats: dict) -> None:
+        """Применение diff манифеста к коллекции: удаление, затем индексация новых и изменённых файлов"""
+        stats["skipped"] += len(diff.unchanged)
+
+        # ID неизменённых файлов резервируются, чтобы новый чанк не перезаписал их точки
+        for file_path in diff.unchanged:
+            self._id_registry.reserve(manifest.get(file_path).point_ids, str(file_path))
+
+        # Удалённые файлы - удаляем их точки
+        self._delete_points(collection_name, [point_id for entry in diff.deleted for point_id in entry.point_ids])
+        for entry in diff.deleted:
+            manifest.forget(entry.path)
+        stats["deleted"] += len(diff.deleted)
+
+        # Новые и изменённые файлы - через потоковый конвейер
+        result = self._index_files(diff.added + diff.modified, collection_name, manifest)
+        added = {str(p) for p in diff.added}
+        for key in result["completed"]:
+            stats["added" if key in added else "updated"] += 1
+        stats["failed"] += result["failed_files"]
+
+    def index_changed_paths(self, paths: Iterable[Path], manifest: IndexManifest,
+                            project_path: Path = None) -> dict:
+        """
+        Переиндексация только изменённых путей (из watcher)
+        Директории раскрываются обходом (новые) или по манифесту (удалённые/перемещённые);
+        обход учитывает .gitignore корня проекта, как и полная индексация
+        """
+        project_path = Path(project_path or self.project_root)
+        self._id_registry = PointIdRegistry()
+        stats = {"added": 0, "updated": 0, "deleted": 0, "skipped": 0, "failed": 0}
+        suffixes = {".swift": self.collection_name_code, ".md": self.collection_name_docs}
+        present: Dict[str, List[Path]] = {collection: [] for collection in suffixes.values()}
+        scope: List[Path] = []
+
+        for path in paths:
+            path = Path(path)
+            scope.append(path)
+            if path.is_dir():
+                for suffix, files in discover_files(path, suffixes, base=project_path).items():
+                    present[suffixes[suffix]].extend(files)
+            elif path.suffix.lower() in suffixes and path.is_file():
+                present[suffixes[path.suffix.lower()]].append(path)
+
+        for collection_name, files in present.items():
+            diff = manifest.diff(sorted(set(files)), collection_name, scope=scope)
+            if diff.has_changes:
+                self._sync_collection(manifest, collection_name, diff, stats)
+
+        manifest.save()
+        return stats
+
+    def watch(self, project_path: Path = None, manifest_path: Path = None, debounce: float = 0.5,
+              max_delay: float = 5.0, force_polling: bool = False, poll_interval: float = 2.0,
+              stop_event: Optional[threading.Event] = None) -> None:
+        """
+        Режим демона: инкрементальная индексация, затем живое обновление по событиям файловой системы
+        Пачки изменений схлопываются (debounce) и переиндексируются только затронутые файлы
+        """
+        project_path = Path(project_path or self.project_root)
+        self.run_incremental_indexation(project_path, manifest_path)
+        manifest = IndexManifest.load(manifest_path or MANIFEST_PATH)
+
+        watcher = create_watcher(project_path, [".swift", ".md"], force_polling, poll_interval)
+        print(f"👀 Отслеживание изменений в {project_path} ({type(watcher).__name__})...")
+        failed: Set[Path] = set()
+        try:
+            for changes in debounced_changes(watcher, debounce, max_delay, stop_event):
+                rescan = watcher.overflowed
+                # Очередь событий переполнилась - изменения могли потеряться, нужен полный проход
+                changes = {project_path} if rescan else changes | failed
+                self._start_metrics()
+                try:
+                    stats = self.index_changed_paths(changes, manifest, project_path)
+                except Exception as e:
+                    # Ошибка одной пачки не останавливает демон: пути повторяются со следующей пачкой
+                    failed = set(changes)
+                    print(f"⚠️ Ошибка переиндексации ({len(changes)} путей), повтор при следующем изменении: {e}")
+                    continue
+                failed = set()
+                if rescan:
+                    watcher.overflowed = False
+                elapsed = self.metrics.report()["elapsed_s"]
+                print(f"🔄 Изменено путей: {len(changes)} → добавлено {stats['added']}, обновлено {stats['updated']}, "
+                      f"удалено {stats['deleted']} за {elapsed:.2f} с")
+        finally:
+            watcher.close()
+
+    def _start_metrics(self) -> None:
+        """Новый сборщик метрик на прогон индексации"""
+        self.metrics = IndexingMetrics()
+        cache = self.embedder.cache
+        self._cache_counts = (cache.hits, cache.misses) if cache else (0, 0)
+
+    def _finish_metrics(self) -> dict:
+        """Итоговый отчёт метрик прогона + краткая сводка в консоль"""
+        cache = self.embedder.cache
+        if cache:
+            self.metrics.count("embedding_cache_hits", cache.hits - self._cache_counts[0])
+            self.metrics.count("embedding_cache_misses", cache.misses - self._cache_counts[1])
+
+        report = self.metrics.report()
+        embed = report["latencies"].get("embed_batch", {})
+        upsert = report["latencies"].get("upsert_batch", {})
+        print(f"⏱️ Метрики: {report['throughput']['files_per_s']:.1f} файлов/с, "
+              f"{report['throughput']['mb_per_s']:.2f} МБ/с, "
+              f"embed p50/p99 {embed.get('p50_ms', 0):.0f}/{embed.get('p99_ms', 0):.0f} мс, "
+              f"upsert p50/p99 {upsert.get('p50_ms', 0):.0f}/{upsert.get('p99_ms', 0):.0f} мс")
+        return report
+
+    def write_metrics(self, json_path: Optional[Path] = None, prometheus_path: Optional[Path] = None) -> None:
+        """Сохранение метрик последнего прогона: JSON-отчёт и/или текст Prometheus"""
+        if json_path:
+            Path(json_path).write_text(
+                json.dumps(self.metrics.report(), indent=2, ensure_ascii=False), encoding="utf-8"
+            )
+        if prometheus_path:
+            Path(prometheus_path).write_text(self.metrics.to_prometheus(), encoding="utf-8")
+
+    def quantization_report(self, collection_name: Optional[str] = None, queries: Optional[List[str]] = None,
+                            sample: int = 200, top_k: int = 10, oversampling: Optional[float] = None) -> List[dict]:
+        """
+        Отчёт recall@K vs память для вариантов квантования (none / int8 / binary)
+        на векторах коллекции; запросы - свой набор текстов или отложенная выборка векторов
+        (исключается из поиска: иначе ближайший сосед запроса - он сам, и recall завышен)
+        oversampling - множитель кандидатов, с которым работает поиск (--oversampling)
+        """
+        collection_name = collection_name or self.collection_name_code
+        vectors = np.asarray(self.store.vectors(collection_name), dtype=np.float32)
+        if not len(vectors):
+            return []
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        if queries:
+            query_vectors = np.asarray(self.embedder.embed_many(queries), dtype=np.float32)
+            query_vectors /= np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+        else:
+            rng = np.random.default_rng(0)
+            held_out = np.zeros(len(vectors), dtype=bool)
+            held_out[rng.choice(len(vectors), min(sample, len(vectors) // 2), replace=False)] = True
+            query_vectors, vectors = vectors[held_out], vectors[~held_out]
+
+        multipliers = {"int8": oversampling, "binary": oversampling} if oversampling else None
+        return quantization_report(vectors, query_vectors, top_k=top_k, oversampling=multipliers)
+
     def health_check(self) -> dict:
         """
-        Проверка здоровья Qdrant и статистики коллекций
+        Проверка здоровья хранилища векторов и статистики коллекций
         """
         try:
             # Получение информации о коллекциях
-            code_collection = self.client.get_collection(self.collection_name_code)
-            docs_collection = self.client.get_collection(self.collection_name_docs)
-
             return {
                 "status": "healthy",
+                "store": self.store.name,
                 "collections": {
-                    self.collection_name_code: {
-                        "points_count": code_collection.points_count,
-                        "vectors_count": code_collection.vectors_count,
-                        "indexed_at": code_collection.updated_at if hasattr(code_collection, 'updated_at') else None
-                    },
-                    self.collection_name_docs: {
-                        "points_count": docs_collection.points_count,
-                        "vectors_count": docs_collection.vectors_count,
-                        "indexed_at": docs_collection.updated_at if hasattr(docs_collection, 'updated_at') else None
-                    }
+                    self.collection_name_code: self.store.info(self.collection_name_code),
+                    self.collection_name_docs: self.store.info(self.collection_name_docs),
                 }
             }
         except Exception as e:
@@ -298,16 +808,138 @@ class QdrantIndexer:
 
 # Основной запуск для тестирования
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Индексация проекта Chat в Qdrant")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Индексировать только изменённые файлы (по манифесту .index_state/manifest.json)",
+    )
+    parser.add_argument(
+        "--embeddings",
+        choices=["hashing", "lmstudio"],
+        default="hashing",
+        help="Бэкенд эмбеддингов: локальный hashing (по умолчанию) или LM Studio /v1/embeddings",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Количество параллельных батчей эмбеддингов")
+    parser.add_argument(
+        "--embedding-processes",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Эмбеддинги в пуле процессов (--no-embedding-processes - в потоках). По умолчанию процессы для "
+             "hashing (считается в Python, потоки упираются в GIL) и потоки для lmstudio (ожидание HTTP)",
+    )
+    parser.add_argument(
+        "--no-embedding-cache",
+        action="store_true",
+        help="Не использовать кэш эмбеддингов .index_state/embeddings.sqlite",
+    )
+    parser.add_argument(
+        "--store",
+        choices=["qdrant", "local"],
+        default="qdrant",
+        help="Хранилище векторов: сервер Qdrant (по умолчанию) или встроенное локальное (.index_state/vectors)",
+    )
+    parser.add_argument("--qdrant-url", default="http://localhost:6333", help="Адрес сервера Qdrant")
+    parser.add_argument(
+        "--local-dtype",
+        choices=["float32", "float16"],
+        default=None,
+        help="Тип векторов новых коллекций локального хранилища (по умолчанию float32; float16 - вдвое меньше памяти)",
+    )
+    parser.add_argument(
+        "--local-index",
+        choices=["ivf", "hnsw"],
+        default=None,
+        help="ANN-индекс локального хранилища (по умолчанию - точный brute-force поиск)",
+    )
+    parser.add_argument(
+        "--quantization",
+        choices=["int8", "binary"],
+        default=None,
+        help="Квантование векторов (Qdrant и локальное хранилище): int8 - 4x, binary - 32x меньше RAM",
+    )
+    parser.add_argument("--oversampling", type=float, default=None, help="Множитель кандидатов для rescoring")
+    parser.add_argument(
+        "--quantization-report",
+        action="store_true",
+        help="Вывести отчёт recall vs память для вариантов квантования и выйти",
+    )
+    parser.add_argument(
+        "--report-queries",
+        type=Path,
+        default=None,
+        help="Файл с запросами для отчёта (по одному на строку); по умолчанию - отложенная выборка векторов коллекции",
+    )
+    parser.add_argument("--metrics-json", type=Path, default=None, help="Куда сохранить JSON-отчёт метрик прогона")
+    parser.add_argument(
+        "--metrics-prometheus",
+        type=Path,
+        default=None,
+        help="Куда сохранить метрики в текстовом формате Prometheus (textfile collector)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Режим демона: после инкрементальной индексации следить за изменениями файлов (inotify / опрос)",
+    )
+    parser.add_argument("--poll", action="store_true", help="Использовать опрос вместо inotify")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Интервал опроса файловой системы, с")
+    parser.add_argument("--debounce", type=float, default=0.5, help="Пауза без событий перед переиндексацией, с")
+    args = parser.parse_args()
+
     print("🚀 Запуск индексатора Qdrant...")
 
-    indexer = QdrantIndexer(qdrant_url="http://localhost:6333")
+    backend = LMStudioEmbeddingBackend() if args.embeddings == "lmstudio" else None
+    if args.store == "local":
+        store = LocalVectorStore(
+            LOCAL_STORE_PATH,
+            dtype=args.local_dtype,
+            index=args.local_index,
+            quantization=args.quantization,
+            oversampling=args.oversampling,
+        )
+    else:
+        store = QdrantStore(args.qdrant_url, quantization=args.quantization, oversampling=args.oversampling)
+    indexer = QdrantIndexer(
+        qdrant_url=args.qdrant_url,
+        embedding_backend=backend,
+        embedding_workers=args.workers,
+        embedding_processes=args.embedding_processes,
+        embedding_cache_path=None if args.no_embedding_cache else EMBEDDING_CACHE_PATH,
+        store=store,
+    )
+
+    if args.quantization_report:
+        queries = None
+        if args.report_queries:
+            queries = [line.strip() for line in args.report_queries.read_text(encoding="utf-8").splitlines() if line.strip()]
+        report = {
+            collection: indexer.quantization_report(collection, queries, oversampling=args.oversampling)
+            for collection in (indexer.collection_name_code, indexer.collection_name_docs)
+        }
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        raise SystemExit(0)
+
+    if args.watch:
+        try:
+            indexer.watch(debounce=args.debounce, force_polling=args.poll, poll_interval=args.poll_interval)
+        except KeyboardInterrupt:
+            print("\n👋 Отслеживание остановлено")
+        raise SystemExit(0)
+
+    if args.incremental:
+        # Быстрый режим для git hook - без health check и примера поиска
+        indexer.run_incremental_indexation()
+        indexer.write_metrics(args.metrics_json, args.metrics_prometheus)
+        raise SystemExit(0)
 
     # Полный цикл индексации
     stats = indexer.run_full_indexation()
+    indexer.write_metrics(args.metrics_json, args.metrics_prometheus)
 
     # Проверка здоровья
     health = indexer.health_check()
-    print(f"\n🏥 Здоровье Qdrant:")
+    print(f"\n🏥 Здоровье хранилища ({indexer.store.name}):")
     print(json.dumps(health, indent=2, ensure_ascii=False))
 
     # Пример поиска
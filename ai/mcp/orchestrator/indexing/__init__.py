@@ -0,0 +1,126 @@
+"""
+Indexing - вспомогательные компоненты индексации проекта для RAG
+
+Используется QdrantIndexer (index_to_qdrant.py):
+
+```python
+from indexing import IndexManifest
+
+manifest = IndexManifest.load(Path(".index_state/manifest.json"))
+diff = manifest.diff(swift_files, collection="chat_code")
+```
+"""
+
+from .manifest import FileState, IndexManifest, ManifestEntry, ManifestDiff, file_sha256
+from .chunking import Chunk, chunk_file, chunk_swift, chunk_markdown, chunk_text
+from .embeddings import (
+    EmbeddingBackend,
+    EmbeddingEngine,
+    HashingEmbeddingBackend,
+    LMStudioEmbeddingBackend,
+    SentenceTransformerBackend,
+    estimate_tokens,
+    tokenize,
+)
+from .cache import EmbeddingCache, embedding_key
+from .ids import (
+    PointIdRegistry,
+    PointIdCollisionError,
+    chunk_point_id,
+    document_point_id,
+    relative_source_path,
+)
+from .discovery import (
+    IgnoreMatcher,
+    SourceFile,
+    discover_files,
+    parse_gitignore,
+    read_files,
+)
+from .lexical import LexicalIndex, reciprocal_rank_fusion
+from .query_cache import QueryCache, IndexGeneration, normalize_query
+from .storage import VectorStore, SearchHit, SearchFilter, QdrantStore, LocalVectorStore
+from .metrics import IndexingMetrics, peak_rss_bytes, percentile
+from .watcher import (
+    FileWatcher,
+    InotifyWatcher,
+    PollingWatcher,
+    create_watcher,
+    debounced_changes,
+)
+from .pipeline import IndexingPipeline, PipelineStats, CompletionTracker, batched
+
+__all__ = [
+    # Инкрементальная индексация
+    "IndexManifest",
+    "ManifestEntry",
+    "ManifestDiff",
+    "FileState",
+    "file_sha256",
+
+    # Чанкинг
+    "Chunk",
+    "chunk_file",
+    "chunk_swift",
+    "chunk_markdown",
+    "chunk_text",
+
+    # Эмбеддинги
+    "EmbeddingBackend",
+    "EmbeddingEngine",
+    "HashingEmbeddingBackend",
+    "LMStudioEmbeddingBackend",
+    "SentenceTransformerBackend",
+    "estimate_tokens",
+    "tokenize",
+    "EmbeddingCache",
+    "embedding_key",
+
+    # ID точек
+    "PointIdRegistry",
+    "PointIdCollisionError",
+    "chunk_point_id",
+    "document_point_id",
+    "relative_source_path",
+
+    # Обход и чтение файлов
+    "IgnoreMatcher",
+    "SourceFile",
+    "discover_files",
+    "parse_gitignore",
+    "read_files",
+
+    # Лексический поиск
+    "LexicalIndex",
+    "reciprocal_rank_fusion",
+
+    # Кэш результатов поиска
+    "QueryCache",
+    "IndexGeneration",
+    "normalize_query",
+
+    # Хранилища векторов
+    "VectorStore",
+    "SearchHit",
+    "SearchFilter",
+    "QdrantStore",
+    "LocalVectorStore",
+
+    # Метрики индексации
+    "IndexingMetrics",
+    "peak_rss_bytes",
+    "percentile",
+
+    # Отслеживание изменений
+    "FileWatcher",
+    "InotifyWatcher",
+    "PollingWatcher",
+    "create_watcher",
+    "debounced_changes",
+
+    # Потоковый конвейер
+    "IndexingPipeline",
+    "PipelineStats",
+    "CompletionTracker",
+    "batched",
+]
@@ -0,0 +1,119 @@
+"""
+Персистентный кэш эмбеддингов (SQLite)
+Ключ - хеш (модель + текст), значение - вектор float32; LRU-вытеснение по лимиту записей
+"""
+
+import hashlib
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from .embeddings import Vector
+
+# Максимум переменных в одном SQL-запросе (лимит SQLite по умолчанию - 999)
+SQL_CHUNK = 500
+
+
+def embedding_key(model_id: str, text: str) -> bytes:
+    """Контентный ключ кэша: sha256(model_id + текст)"""
+    return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Кэш эмбеддингов на диске, общий для индексации и поиска
+
+    При превышении max_entries удаляются давно не использованные записи
+    (с запасом evict_fraction, чтобы не чистить на каждой вставке).
+    """
+
+    def __init__(self, path: Path, max_entries: int = 100_000, evict_fraction: float = 0.1):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.evict_fraction = evict_fraction
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_access INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings(last_access)")
+        self._conn.commit()
+
+        # Логические часы LRU: монотонный счётчик вместо времени (нет совпадений у быстрых операций)
+        self._clock = self._conn.execute("SELECT COALESCE(MAX(last_access), 0) FROM embeddings").fetchone()[0]
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model_id: str, texts: Sequence[str]) -> List[Optional[Vector]]:
+        """Поиск векторов в кэше (None для промахов), обновляет время доступа найденных"""
+        keys = [embedding_key(model_id, text) for text in texts]
+        found: Dict[bytes, Vector] = {}
+
+        with self._lock:
+            for start in range(0, len(keys), SQL_CHUNK):
+                part = keys[start:start + SQL_CHUNK]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+
+            if found:
+                now = self._tick()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+        result = [found.get(key) for key in keys]
+        hits = sum(1 for vector in result if vector is not None)
+        self.hits += hits
+        self.misses += len(result) - hits
+        return result
+
+    def put_many(self, model_id: str, texts: Sequence[str], vectors: Sequence[Vector]) -> None:
+        """Сохранение векторов и вытеснение старых записей при превышении лимита"""
+        with self._lock:
+            now = self._tick()
+            rows = [
+                (embedding_key(model_id, text), array("f", vector).tobytes(), now)
+                for text, vector in zip(texts, vectors)
+            ]
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - self.max_entries + int(self.max_entries * self.evict_fraction)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (excess,),
+                )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,195 @@
+"""
+Чанкинг файлов для индексации
+Swift режется по границам объявлений (type/extension/func), Markdown - по заголовкам
+"""
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# ~500 токенов для nomic-embed-text - предсказуемый размер входа эмбеддинга
+DEFAULT_MAX_CHARS = 2000
+# Перекрытие (в строках) между окнами, если объявление/раздел не помещается в один чанк
+DEFAULT_OVERLAP_LINES = 3
+
+SWIFT_DECLARATION_RE = re.compile(
+    r"^\s*(?:@\w+(?:\([^)]*\))?\s+)*"
+    r"(?:(?:public|private|fileprivate|internal|open|final|static|class|override|"
+    r"mutating|nonmutating|nonisolated|convenience|required|indirect|lazy)\s+)*"
+    r"(?P<kind>class|struct|enum|protocol|extension|actor|func|init|deinit|subscript)\b"
+    r"\s*(?P<name>[A-Za-z_][\w.]*)?"
+)
+SWIFT_LEADING_RE = re.compile(r"^\s*(///|//|/\*|\*|@)")
+MARKDOWN_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+MARKDOWN_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+
+# (start, end) - полуинтервал индексов строк, symbol - имя объявления/путь заголовков
+Segment = Tuple[int, int, str]
+
+
+@dataclass
+class Chunk:
+    """Фрагмент файла для отдельной точки в векторной базе"""
+    file_path: str
+    text: str
+    start_line: int  # 1-based, включительно
+    end_line: int  # 1-based, включительно
+    index: int
+    symbol: str = ""
+
+
+def _window_segment(lines: List[str], segment: Segment, max_chars: int, overlap_lines: int) -> List[Segment]:
+    """Разбиение слишком большого сегмента на окна с перекрытием"""
+    start, end, symbol = segment
+    windows = []
+    window_start = start
+
+    while window_start < end:
+        size = 0
+        window_end = window_start
+        while window_end < end and (window_end == window_start or size + len(lines[window_end]) + 1 <= max_chars):
+            size += len(lines[window_end]) + 1
+            window_end += 1
+
+        windows.append((window_start, window_end, symbol))
+        if window_end >= end:
+            break
+        window_start = max(window_end - overlap_lines, window_start + 1)
+
+    return windows
+
+
+def _pack_segments(lines: List[str], segments: List[Segment], file_path: str,
+                   max_chars: int, overlap_lines: int) -> List[Chunk]:
+    """Нарезка больших сегментов на окна и склейка соседних маленьких в пределах max_chars"""
+    pieces: List[Segment] = []
+    for segment in segments:
+        start, end, _ = segment
+        if sum(len(line) + 1 for line in lines[start:end]) > max_chars:
+            pieces.extend(_window_segment(lines, segment, max_chars, overlap_lines))
+        else:
+            pieces.append(segment)
+
+    merged: List[List] = []
+    for start, end, symbol in pieces:
+        size = sum(len(line) + 1 for line in lines[start:end])
+        if merged and merged[-1][1] == start and merged[-1][3] + size <= max_chars:
+            merged[-1][1] = end
+            merged[-1][3] += size
+            if not merged[-1][2]:
+                merged[-1][2] = symbol
+        else:
+            merged.append([start, end, symbol, size])
+
+    chunks = []
+    for start, end, symbol, _ in merged:
+        text = "\n".join(lines[start:end])
+        if not text.strip():
+            continue
+        chunks.append(Chunk(
+            file_path=file_path,
+            text=text[:max_chars],
+            start_line=start + 1,
+            end_line=end,
+            index=len(chunks),
+            symbol=symbol,
+        ))
+    return chunks
+
+
+def chunk_swift(text: str, file_path: str = "", max_chars: int = DEFAULT_MAX_CHARS,
+                overlap_lines: int = DEFAULT_OVERLAP_LINES) -> List[Chunk]:
+    """
+    Чанкинг Swift файла по объявлениям
+    Doc-комментарии и атрибуты перед объявлением попадают в его чанк, импорты - в первый чанк
+    """
+    lines = text.splitlines()
+    boundaries: List[Tuple[int, str]] = []
+
+    for i, line in enumerate(lines):
+        match = SWIFT_DECLARATION_RE.match(line)
+        if not match:
+            continue
+        symbol = f"{match.group('kind')} {match.group('name') or ''}".strip()
+
+        # Поднимаемся вверх по doc-комментариям и атрибутам
+        start = i
+        while start > 0 and SWIFT_LEADING_RE.match(lines[start - 1]):
+            start -= 1
+        if boundaries and start <= boundaries[-1][0]:
+            continue
+        boundaries.append((start, symbol))
+
+    if not boundaries:
+        boundaries.append((0, ""))
+    else:
+        # Преамбула (импорты) принадлежит первому объявлению
+        boundaries[0] = (0, boundaries[0][1])
+
+    segments = [
+        (start, boundaries[i + 1][0] if i + 1 < len(boundaries) else len(lines), symbol)
+        for i, (start, symbol) in enumerate(boundaries)
+    ]
+    return _pack_segments(lines, segments, file_path, max_chars, overlap_lines)
+
+
+def chunk_markdown(text: str, file_path: str = "", max_chars: int = DEFAULT_MAX_CHARS,
+                   overlap_lines: int = DEFAULT_OVERLAP_LINES) -> List[Chunk]:
+    """
+    Чанкинг Markdown по заголовкам
+    symbol чанка - путь заголовков ("Раздел > Подраздел"), заголовки внутри ``` игнорируются
+    """
+    lines = text.splitlines()
+    boundaries: List[Tuple[int, str]] = [(0, "")]
+    heading_path: List[Tuple[int, str]] = []
+    in_fence = False
+
+    for i, line in enumerate(lines):
+        if MARKDOWN_FENCE_RE.match(line):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+
+        match = MARKDOWN_HEADING_RE.match(line)
+        if not match:
+            continue
+        level = len(match.group(1))
+        heading_path = [(lvl, title) for lvl, title in heading_path if lvl < level]
+        heading_path.append((level, match.group(2)))
+        symbol = " > ".join(title for _, title in heading_path)
+
+        if i == 0:
+            boundaries[0] = (0, symbol)
+        else:
+            boundaries.append((i, symbol))
+
+    segments = [
+        (start, boundaries[i + 1][0] if i + 1 < len(boundaries) else len(lines), symbol)
+        for i, (start, symbol) in enumerate(boundaries)
+    ]
+    return _pack_segments(lines, segments, file_path, max_chars, overlap_lines)
+
+
+def chunk_text(text: str, file_path: str = "", max_chars: int = DEFAULT_MAX_CHARS,
+               overlap_lines: int = DEFAULT_OVERLAP_LINES) -> List[Chunk]:
+    """Чанкинг произвольного текста окнами строк с перекрытием"""
+    lines = text.splitlines()
+    return _pack_segments(lines, [(0, len(lines), "")], file_path, max_chars, overlap_lines)
+
+
+def chunk_file(file_path: Path, text: str, max_chars: Optional[int] = None,
+               overlap_lines: Optional[int] = None) -> List[Chunk]:
+    """Выбор стратегии чанкинга по расширению файла"""
+    chunker = {
+        ".swift": chunk_swift,
+        ".md": chunk_markdown,
+    }.get(Path(file_path).suffix.lower(), chunk_text)
+
+    return chunker(
+        text,
+        file_path=str(file_path),
+        max_chars=max_chars or DEFAULT_MAX_CHARS,
+        overlap_lines=DEFAULT_OVERLAP_LINES if overlap_lines is None else overlap_lines,
+    )
@@ -0,0 +1,241 @@
+"""
+Обход проекта для индексации
+Один проход по дереву с правилами игнорирования (.gitignore, build, DerivedData, Pods)
+и параллельное чтение файлов пулом потоков
+"""
+
+import os
+import re
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .manifest import FileState
+
+# Директории, которые никогда не индексируются (сборка, зависимости, кэши)
+DEFAULT_IGNORED_DIRS = {
+    ".git",
+    ".build",
+    ".swiftpm",
+    "build",
+    "DerivedData",
+    "Pods",
+    "Carthage",
+    "node_modules",
+    "xcuserdata",
+    "__pycache__",
+    "venv",
+}
+
+
+def _translate_gitignore_pattern(pattern: str) -> str:
+    """Перевод glob-паттерна .gitignore в регулярное выражение"""
+    result = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            result.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            result.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            result.append("[^/]*")
+        elif char == "?":
+            result.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                result.append(re.escape(char))
+            else:
+                result.append("[" + pattern[i + 1:end].replace("\\", "\\\\") + "]")
+                i = end
+        else:
+            result.append(re.escape(char))
+        i += 1
+    return "".join(result)
+
+
+@dataclass
+class IgnoreRule:
+    """Одно правило .gitignore (относительно директории base)"""
+    base: str
+    regex: "re.Pattern"
+    negate: bool
+    dir_only: bool
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return False
+            rel_path = rel_path[len(self.base) + 1:]
+        return self.regex.match(rel_path) is not None
+
+
+def parse_gitignore(text: str, base: str = "") -> List[IgnoreRule]:
+    """Разбор .gitignore (комментарии, !negation, dir/, /anchored, **)"""
+    rules = []
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        if not line or line.startswith("#"):
+            continue
+
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        line = line.replace("\\#", "#").replace("\\!", "!")
+
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+
+        anchored = "/" in line
+        line = line.lstrip("/")
+        body = _translate_gitignore_pattern(line)
+        regex = re.compile(("^" if anchored else "^(?:.*/)?") + body + "$")
+        rules.append(IgnoreRule(base=base, regex=regex, negate=negate, dir_only=dir_only))
+    return rules
+
+
+class IgnoreMatcher:
+    """Набор правил игнорирования: последнее совпавшее правило побеждает (как в git)"""
+
+    def __init__(self, ignored_dirs: Optional[Set[str]] = None, skip_hidden: bool = True):
+        self.ignored_dirs = DEFAULT_IGNORED_DIRS if ignored_dirs is None else ignored_dirs
+        self.skip_hidden = skip_hidden
+        self.rules: List[IgnoreRule] = []
+
+    def add_gitignore(self, gitignore_path: Path, base: str = "") -> None:
+        try:
+            self.rules.extend(parse_gitignore(gitignore_path.read_text(encoding="utf-8"), base))
+        except (OSError, UnicodeDecodeError):
+            pass
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        name = rel_path.rsplit("/", 1)[-1]
+        if is_dir and name in self.ignored_dirs:
+            return True
+        if self.skip_hidden and name.startswith("."):
+            return True
+
+        ignored = False
+        for rule in self.rules:
+            if rule.matches(rel_path, is_dir):
+                ignored = not rule.negate
+        return ignored
+
+
+def _enter_subtree(root: Path, base: Optional[Path], matcher: IgnoreMatcher) -> Optional[str]:
+    """
+    Путь root относительно base с правилами .gitignore всех директорий от base до root
+    None - root сам игнорируется (или лежит внутри игнорируемой директории)
+    """
+    if base is None:
+        return ""
+    try:
+        parts = root.resolve().relative_to(Path(base).resolve()).parts
+    except ValueError:
+        return ""
+
+    directory, rel_dir = Path(base), ""
+    for part in parts:
+        if (directory / ".gitignore").is_file():
+            matcher.add_gitignore(directory / ".gitignore", rel_dir)
+        rel_dir = f"{rel_dir}/{part}" if rel_dir else part
+        directory = directory / part
+        if matcher.is_ignored(rel_dir, True):
+            return None
+    return rel_dir
+
+
+def discover_files(root: Path, extensions: Iterable[str], matcher: Optional[IgnoreMatcher] = None,
+                   base: Optional[Path] = None) -> Dict[str, List[Path]]:
+    """
+    Один обход дерева с отсечением игнорируемых директорий
+    base - корень репозитория, если root - его поддиректория: правила .gitignore корня
+    и промежуточных директорий применяются так же, как при полном обходе
+    Возвращает {расширение: [пути]} в детерминированном порядке
+    """
+    root = Path(root)
+    matcher = matcher or IgnoreMatcher()
+    wanted = {ext.lower() for ext in extensions}
+    found: Dict[str, List[Path]] = {ext: [] for ext in wanted}
+
+    start = _enter_subtree(root, base, matcher)
+    stack: List[Tuple[Path, str]] = [] if start is None else [(root, start)]
+    while stack:
+        directory, rel_dir = stack.pop()
+        if (directory / ".gitignore").is_file():
+            matcher.add_gitignore(directory / ".gitignore", rel_dir)
+
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if matcher.is_ignored(rel_path, is_dir):
+                continue
+
+            if is_dir:
+                subdirs.append((Path(entry.path), rel_path))
+                continue
+
+            suffix = os.path.splitext(entry.name)[1].lower()
+            if suffix in wanted:
+                found[suffix].append(Path(entry.path))
+
+        stack.extend(reversed(subdirs))
+
+    return found
+
+
+@dataclass
+class SourceFile:
+    """Прочитанный файл (или ошибка чтения)"""
+    path: Path
+    content: Optional[str] = None
+    error: Optional[Exception] = None
+    size: int = 0  # Прочитано байт
+    state: Optional[FileState] = None  # (mtime, size, хеш) прочитанных байт - для манифеста
+
+
+def _read_source(path: Path) -> SourceFile:
+    try:
+        with open(path, "rb") as f:
+            mtime = os.fstat(f.fileno()).st_mtime
+            data = f.read()
+        return SourceFile(path=path, content=data.decode("utf-8"), size=len(data),
+                          state=FileState.from_bytes(data, mtime))
+    except Exception as e:
+        return SourceFile(path=path, error=e)
+
+
+def read_files(paths: Iterable[Path], max_workers: int = 8, max_in_flight: int = 32) -> Iterator[SourceFile]:
+    """
+    Параллельное чтение файлов с сохранением порядка
+    Не более max_in_flight файлов прочитано заранее - чтение опережает обработку, но не всю память
+    """
+    in_flight: Deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for path in paths:
+            in_flight.append(pool.submit(_read_source, path))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+
+        while in_flight:
+            yield in_flight.popleft().result()
@@ -0,0 +1,256 @@
+"""
+Эмбеддинги для индексации и поиска
+Подключаемые бэкенды + батчевый движок с ограниченной параллельностью
+"""
+
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import re
+import urllib.request
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    from .cache import EmbeddingCache
+
+Vector = List[float]
+
+TOKEN_RE = re.compile(r"[A-Za-zА-Яа-яЁё_][A-Za-zА-Яа-яЁё0-9_]*|\d+")
+CAMEL_CASE_RE = re.compile(r"[A-ZА-ЯЁ]+(?=[A-ZА-ЯЁ][a-zа-яё])|[A-ZА-ЯЁ]?[a-zа-яё]+|[A-ZА-ЯЁ]+|\d+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Быстрая оценка количества токенов (~4 символа на токен)"""
+    return len(text) // 4 + 1
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Токенизация текста и идентификаторов Swift
+    `ChatViewModel` → ["chatviewmodel", "chat", "view", "model"]
+    """
+    tokens = []
+    for word in TOKEN_RE.findall(text):
+        lower = word.lower()
+        tokens.append(lower)
+        parts = [part.lower() for piece in word.split("_") for part in CAMEL_CASE_RE.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class EmbeddingBackend(ABC):
+    """Базовый класс бэкенда эмбеддингов"""
+
+    name: str = "base"
+    # Вычисление в Python под GIL: параллельно только в пуле процессов (сетевые бэкенды ждут I/O - хватает потоков)
+    cpu_bound: bool = False
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @property
+    def model_id(self) -> str:
+        """Идентификатор модели (используется в ключах кэша)"""
+        return f"{self.name}:{self.dim}"
+
+    @abstractmethod
+    def embed_batch(self, texts: List[str]) -> List[Vector]:
+        """Эмбеддинги для батча текстов (порядок сохраняется)"""
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Детерминированный локальный бэкенд (feature hashing токенов)
+    Не требует модели и сети - используется по умолчанию и в тестах
+    """
+
+    name = "hashing"
+    cpu_bound = True
+
+    def embed_batch(self, texts: List[str]) -> List[Vector]:
+        return [self._embed_one(text) for text in texts]
+
+    def _embed_one(self, text: str) -> Vector:
+        vector = [0.0] * self.dim
+        for token in tokenize(text):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dim] += sign
+
+        # Сублинейное масштабирование частот + L2-нормализация для cosine
+        vector = [math.copysign(math.log1p(abs(v)), v) for v in vector]
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm:
+            vector = [v / norm for v in vector]
+        return vector
+
+
+class LMStudioEmbeddingBackend(EmbeddingBackend):
+    """Эмбеддинги через OpenAI-совместимый endpoint LM Studio (/v1/embeddings)"""
+
+    name = "lmstudio"
+
+    def __init__(self, dim: int = 768, model: str = "text-embedding-nomic-embed-text-v1.5",
+                 base_url: str = "http://localhost:1234", timeout: float = 60.0):
+        super().__init__(dim)
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.name}:{self.model}:{self.dim}"
+
+    def embed_batch(self, texts: List[str]) -> List[Vector]:
+        request = urllib.request.Request(
+            f"{self.base_url}/v1/embeddings",
+            data=json.dumps({"model": self.model, "input": texts}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.loads(response.read().decode("utf-8"))
+
+        items = sorted(data["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in items]
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Локальная модель SentenceTransformer (загружается лениво при первом вызове)"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, dim: int = 768, model: str = "nomic-ai/nomic-embed-text-v1.5"):
+        super().__init__(dim)
+        self.model = model
+        self._model = None
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.name}:{self.model}:{self.dim}"
+
+    def embed_batch(self, texts: List[str]) -> List[Vector]:
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model, trust_remote_code=True)
+        return self._model.encode(texts, normalize_embeddings=True).tolist()
+
+    def __getstate__(self):
+        # Модель не передаётся в дочерние процессы - загружается там заново
+        state = self.__dict__.copy()
+        state["_model"] = None
+        return state
+
+
+def _embed_batch(backend: EmbeddingBackend, texts: List[str]) -> List[Vector]:
+    """Top-level функция для ProcessPoolExecutor"""
+    return backend.embed_batch(texts)
+
+
+class EmbeddingEngine:
+    """
+    Батчевый движок эмбеддингов
+
+    Группирует тексты в батчи по бюджету токенов и выполняет их в пуле потоков
+    (сетевые бэкенды) или процессов (CPU-bound бэкенды) с ограничением параллельности.
+    use_processes=None - выбор по backend.cpu_bound.
+    Если передан кэш, в бэкенд уходят только тексты, которых в нём нет.
+    """
+
+    def __init__(self, backend: EmbeddingBackend, max_batch_tokens: int = 8192,
+                 max_batch_size: int = 64, max_workers: Optional[int] = None,
+                 use_processes: Optional[bool] = None, cache: Optional["EmbeddingCache"] = None):
+        self.backend = backend
+        self.cache = cache
+        self.backend_calls = 0  # Количество батчей, реально отправленных в бэкенд
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.use_processes = backend.cpu_bound if use_processes is None else use_processes
+        self._executor: Optional[Executor] = None
+
+    @property
+    def dim(self) -> int:
+        return self.backend.dim
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                # spawn: пул создаётся, когда уже работают потоки конвейера, а fork многопоточного процесса небезопасен
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def make_batches(self, texts: List[str]) -> List[List[int]]:
+        """Разбиение текстов на батчи (индексы) по бюджету токенов и размеру батча"""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if current and (current_tokens + tokens > self.max_batch_tokens or len(current) >= self.max_batch_size):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def embed(self, text: str) -> Vector:
+        """Эмбеддинг одного текста (без пула)"""
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: Iterable[str]) -> List[Vector]:
+        """Эмбеддинги для списка текстов: кэш, затем параллельные батчи для промахов"""
+        texts = list(texts)
+        if not texts:
+            return []
+        if self.cache is None:
+            return self._compute(texts)
+
+        model_id = self.backend.model_id
+        vectors = self.cache.get_many(model_id, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            computed = self._compute(unique)
+            self.cache.put_many(model_id, unique, computed)
+            by_text = dict(zip(unique, computed))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+        return vectors
+
+    def _compute(self, texts: List[str]) -> List[Vector]:
+        """Вызов бэкенда батчами (параллельно, если батчей несколько)"""
+        batches = self.make_batches(texts)
+        self.backend_calls += len(batches)
+        # В процессах и одиночный батч уходит в пул: конвейер индексации вызывает embed_many
+        # из нескольких потоков, и вычисление в вызывающем потоке упёрлось бы в GIL
+        if self.max_workers == 1 or (len(batches) == 1 and not self.use_processes):
+            results = [self.backend.embed_batch([texts[i] for i in batch]) for batch in batches]
+        else:
+            executor = self._get_executor()
+            futures = [executor.submit(_embed_batch, self.backend, [texts[i] for i in batch]) for batch in batches]
+            results = [future.result() for future in futures]
+
+        vectors: List[Optional[Vector]] = [None] * len(texts)
+        for batch, batch_vectors in zip(batches, results):
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+        return vectors
+
+    def close(self) -> None:
+        """Остановка пула"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,213 @@
+"""
+Локальный лексический индекс (BM25) и слияние рангов для гибридного поиска
+Находит точные совпадения идентификаторов (имена типов Swift), которые пропускает dense-поиск
+"""
+
+import heapq
+import math
+import os
+import pickle
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from .embeddings import TOKEN_RE, tokenize
+from .storage.base import SearchFilter
+
+# Поля payload, которые хранятся в лексическом индексе (без текста чанка)
+STORED_FIELDS = ("file_path", "directory", "path_prefixes", "language", "type", "size",
+                 "start_line", "end_line", "symbol")
+
+
+class LexicalIndex:
+    """
+    Инвертированный индекс BM25 по токенам и частям идентификаторов
+
+    Поддерживает инкрементальные add/remove по point id, поэтому обновляется
+    вместе с векторной коллекцией в тех же батчах индексации.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path: Optional[Path] = None, k1: float = 1.2, b: float = 0.75,
+                 max_df_ratio: float = 0.3, max_posting_scan: int = 2000, part_weight: float = 0.3):
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        # Термины, встречающиеся в большей доле документов, почти не влияют на ранжирование
+        self.max_df_ratio = max_df_ratio
+        # Вес частей идентификатора в запросе (`ChatViewModel` → chat, view, model) относительно целого слова
+        self.part_weight = part_weight
+        # Длинные posting-листы сканируются только по top-N документам с наибольшим вкладом
+        self.max_posting_scan = max_posting_scan
+        self._impact_cache: Dict[str, List[Tuple[Any, int]]] = {}
+        self.postings: Dict[str, Dict[Any, int]] = {}
+        self.doc_lengths: Dict[Any, int] = {}
+        self.doc_terms: Dict[Any, Tuple[str, ...]] = {}
+        self.payloads: Dict[Any, Dict[str, Any]] = {}
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def load(cls, path: Path) -> "LexicalIndex":
+        """Загрузка индекса с диска (пустой индекс, если файла нет или версия устарела)"""
+        index = cls(path)
+        if not index.path.exists():
+            return index
+
+        try:
+            with open(index.path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"⚠️ Лексический индекс {index.path} повреждён, будет пересоздан: {e}")
+            return index
+
+        if data.get("version") != cls.VERSION:
+            return index
+
+        index.postings = data["postings"]
+        index.doc_lengths = data["doc_lengths"]
+        index.doc_terms = data["doc_terms"]
+        index.payloads = data["payloads"]
+        index._impact_cache = data.get("impacts", {})
+        index.total_length = sum(index.doc_lengths.values())
+        return index
+
+    def save(self) -> None:
+        """Атомарная запись индекса на диск"""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            data = {
+                "version": self.VERSION,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths,
+                "doc_terms": self.doc_terms,
+                "payloads": self.payloads,
+                "impacts": self._impact_cache,
+            }
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def add(self, doc_id: Hashable, text: str, payload: Optional[Dict[str, Any]] = None) -> None:
+        """Добавление (или замена) документа"""
+        counts = Counter(tokenize(text))
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, tf in counts.items():
+                self._impact_cache.pop(term, None)
+                self.postings.setdefault(term, {})[doc_id] = tf
+            length = sum(counts.values())
+            self.doc_lengths[doc_id] = length
+            self.doc_terms[doc_id] = tuple(counts)
+            self.payloads[doc_id] = {key: payload[key] for key in STORED_FIELDS if payload and key in payload}
+            self.total_length += length
+
+    def add_many(self, items: Iterable[Tuple[Hashable, str, Dict[str, Any]]]) -> None:
+        for doc_id, text, payload in items:
+            self.add(doc_id, text, payload)
+
+    def remove(self, doc_ids: Iterable[Hashable]) -> None:
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: Hashable) -> None:
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            self._impact_cache.pop(term, None)
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+        self.payloads.pop(doc_id, None)
+
+    def search(self, query: str, top_k: int = 5,
+               query_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float]]:
+        """Top-K документов по BM25: [(doc_id, score)], только подходящие под фильтр по payload"""
+        words = {word.lower() for word in TOKEN_RE.findall(query)}
+        terms = set(tokenize(query))
+        n_docs = len(self.doc_lengths)
+        if not terms or not n_docs:
+            return []
+
+        terms = [term for term in terms if term in self.postings]
+        selective = [term for term in terms if len(self.postings[term]) <= self.max_df_ratio * n_docs]
+        # Частые термины пропускаются, если в запросе есть более специфичные
+        terms = selective or terms
+
+        avg_length = self.total_length / n_docs
+        doc_lengths = self.doc_lengths
+        scores: Dict[Any, float] = {}
+        k1, b = self.k1, self.b
+        length_factor = k1 * b / avg_length
+        base_norm = k1 * (1.0 - b)
+        accepted: Dict[Any, bool] = {}
+
+        for term in terms:
+            posting = self.postings[term]
+            df = len(posting)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            weight = idf * (k1 + 1.0) * (1.0 if term in words else self.part_weight)
+            # С фильтром top-N длинного листа может не содержать подходящих документов - сканируется весь лист
+            if df <= self.max_posting_scan or query_filter is not None:
+                entries = posting.items()
+            else:
+                entries = self._top_impacts(term, base_norm, length_factor)
+            for doc_id, tf in entries:
+                if query_filter is not None:
+                    if doc_id not in accepted:
+                        accepted[doc_id] = query_filter.matches(self.payloads.get(doc_id, {}))
+                    if not accepted[doc_id]:
+                        continue
+                norm = base_norm + length_factor * doc_lengths[doc_id]
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * tf / (tf + norm)
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def warm_up(self) -> None:
+        """Предрасчёт top-N для всех длинных posting-листов (выполняется после индексации)"""
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return
+        length_factor = self.k1 * self.b * n_docs / self.total_length
+        base_norm = self.k1 * (1.0 - self.b)
+        for term, posting in list(self.postings.items()):
+            if len(posting) > self.max_posting_scan:
+                self._top_impacts(term, base_norm, length_factor)
+
+    def _top_impacts(self, term: str, base_norm: float, length_factor: float) -> List[Tuple[Any, int]]:
+        """Документы длинного posting-листа с наибольшим вкладом BM25 (кэш до изменения индекса)"""
+        cached = self._impact_cache.get(term)
+        if cached is None:
+            doc_lengths = self.doc_lengths
+            cached = heapq.nlargest(
+                self.max_posting_scan,
+                self.postings[term].items(),
+                key=lambda item: item[1] / (item[1] + base_norm + length_factor * doc_lengths[item[0]]),
+            )
+            self._impact_cache[term] = cached
+        return cached
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> List[Tuple[Any, float]]:
+    """
+    Reciprocal Rank Fusion: score(d) = Σ 1 / (k + rank(d))
+    Не требует нормализации несравнимых шкал BM25 и cosine
+    """
+    scores: Dict[Any, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
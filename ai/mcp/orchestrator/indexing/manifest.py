@@ -0,0 +1,199 @@
+"""
+Манифест индексации для инкрементальной переиндексации
+Хранит (path, mtime, size, content hash → point ids) для каждого проиндексированного файла
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+PointId = Union[int, str]
+
+
+def file_sha256(file_path: Path) -> str:
+    """Хеш содержимого файла (SHA256)"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class FileState:
+    """Состояние прочитанных байт файла: по нему манифест решает, нужна ли переиндексация"""
+    mtime: float
+    size: int
+    content_hash: str
+
+    @classmethod
+    def from_bytes(cls, data: bytes, mtime: float) -> "FileState":
+        """mtime берётся до чтения: запись во время чтения даст более новый mtime на диске"""
+        return cls(mtime=mtime, size=len(data), content_hash=hashlib.sha256(data).hexdigest())
+
+    @classmethod
+    def read(cls, file_path: Path) -> "FileState":
+        with open(file_path, "rb") as f:
+            mtime = os.fstat(f.fileno()).st_mtime
+            return cls.from_bytes(f.read(), mtime)
+
+
+@dataclass
+class ManifestEntry:
+    """Запись манифеста для одного файла"""
+    path: str
+    mtime: float
+    size: int
+    content_hash: str
+    collection: str
+    point_ids: List[PointId] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ManifestEntry":
+        return cls(
+            path=data["path"],
+            mtime=data["mtime"],
+            size=data["size"],
+            content_hash=data["content_hash"],
+            collection=data["collection"],
+            point_ids=list(data.get("point_ids", [])),
+        )
+
+
+@dataclass
+class ManifestDiff:
+    """Результат сравнения файлов на диске с манифестом"""
+    added: List[Path] = field(default_factory=list)
+    modified: List[Path] = field(default_factory=list)
+    deleted: List[ManifestEntry] = field(default_factory=list)
+    unchanged: List[Path] = field(default_factory=list)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.modified or self.deleted)
+
+
+class IndexManifest:
+    """
+    Локальный манифест проиндексированных файлов
+
+    Быстрая проверка по (mtime, size) без чтения файла; если они отличаются -
+    сравнивается хеш содержимого, чтобы `touch` или checkout не вызывал переиндексацию.
+    """
+
+    # 2 - в payload точек добавлены path_prefixes (фильтр по директории), нужна переиндексация
+    VERSION = 2
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[str, ManifestEntry] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "IndexManifest":
+        """Загрузка манифеста с диска (пустой манифест, если файла нет или он повреждён)"""
+        manifest = cls(path)
+        if not manifest.path.exists():
+            return manifest
+
+        try:
+            data = json.loads(manifest.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Манифест {manifest.path} повреждён, будет пересоздан: {e}")
+            return manifest
+
+        if data.get("version") != cls.VERSION:
+            print(f"⚠️ Версия манифеста {data.get('version')} устарела, будет выполнена полная индексация")
+            return manifest
+
+        for raw in data.get("files", []):
+            entry = ManifestEntry.from_dict(raw)
+            manifest.entries[entry.path] = entry
+        return manifest
+
+    def save(self) -> None:
+        """Атомарная запись манифеста на диск"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": self.VERSION,
+            "files": [entry.to_dict() for entry in sorted(self.entries.values(), key=lambda e: e.path)],
+        }
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def get(self, file_path: Union[str, Path]) -> Optional[ManifestEntry]:
+        return self.entries.get(str(file_path))
+
+    def diff(self, files: Iterable[Path], collection: str,
+             scope: Optional[Iterable[Union[str, Path]]] = None) -> ManifestDiff:
+        """
+        Сравнение списка файлов коллекции с манифестом
+        Файлы коллекции, которых больше нет на диске, попадают в deleted
+        scope - проверять на удаление только эти пути (и всё под ними), а не всю коллекцию
+        """
+        result = ManifestDiff()
+        seen = set()
+        prefixes = tuple(str(path) for path in scope) if scope is not None else None
+
+        for file_path in files:
+            key = str(file_path)
+            seen.add(key)
+            entry = self.entries.get(key)
+
+            if entry is None or entry.collection != collection:
+                result.added.append(file_path)
+                continue
+
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+
+            if stat.st_mtime == entry.mtime and stat.st_size == entry.size:
+                result.unchanged.append(file_path)
+                continue
+
+            content_hash = file_sha256(file_path)
+            if content_hash == entry.content_hash:
+                # Содержимое не изменилось - обновляем только метаданные
+                entry.mtime = stat.st_mtime
+                entry.size = stat.st_size
+                result.unchanged.append(file_path)
+            else:
+                result.modified.append(file_path)
+
+        for key, entry in self.entries.items():
+            if entry.collection != collection or key in seen:
+                continue
+            if prefixes is not None and not any(key == p or key.startswith(p.rstrip("/") + "/") for p in prefixes):
+                continue
+            result.deleted.append(entry)
+
+        return result
+
+    def record(self, file_path: Path, collection: str, point_ids: List[PointId],
+               state: FileState) -> ManifestEntry:
+        """
+        Запись (или обновление) файла в манифесте после успешного upsert
+        state - состояние байт, из которых построены векторы (файл на диске мог измениться после чтения)
+        """
+        entry = ManifestEntry(
+            path=str(file_path),
+            mtime=state.mtime,
+            size=state.size,
+            content_hash=state.content_hash,
+            collection=collection,
+            point_ids=list(point_ids),
+        )
+        self.entries[entry.path] = entry
+        return entry
+
+    def forget(self, file_path: Union[str, Path]) -> Optional[ManifestEntry]:
+        """Удаление файла из манифеста"""
+        return self.entries.pop(str(file_path), None)
@@ -0,0 +1,152 @@
+"""
+Метрики индексации по стадиям
+Счётчики, латентности с перцентилями, длительность стадий, пропускная способность и пиковый RSS
+Отчёт в JSON (dict) и в текстовом формате Prometheus
+"""
+
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Перцентиль по отсортированному списку (nearest-rank)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Пиковый RSS процесса (ru_maxrss: KiB в Linux, байты в macOS)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class IndexingMetrics:
+    """
+    Сборщик метрик одного прогона индексации (потокобезопасный)
+
+    count("bytes_read", n) - счётчики, observe("embed_batch", seconds) - латентности,
+    with stage("discovery"): ... - длительность стадий.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.started = clock()
+        self.counters: Dict[str, float] = {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.stages: Dict[str, float] = {}
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        """Замер одной операции в латентность name"""
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.observe(name, self._clock() - started)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Замер стадии (повторные вызовы суммируются)"""
+        started = self._clock()
+        try:
+            yield
+        finally:
+            elapsed = self._clock() - started
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def latency_summary(self, name: str) -> Dict[str, float]:
+        with self._lock:
+            values = sorted(self.latencies.get(name, []))
+        summary = {
+            "count": len(values),
+            "total_s": sum(values),
+            "mean_ms": sum(values) / len(values) * 1000 if values else 0.0,
+            "max_ms": values[-1] * 1000 if values else 0.0,
+        }
+        for p in PERCENTILES:
+            summary[f"p{p}_ms"] = percentile(values, p) * 1000
+        return summary
+
+    def report(self) -> dict:
+        """Структурированный отчёт (JSON-сериализуемый)"""
+        elapsed = self._clock() - self.started
+        with self._lock:
+            counters = dict(self.counters)
+            stages = dict(self.stages)
+            latency_names = list(self.latencies)
+
+        seconds = max(elapsed, 1e-9)
+        return {
+            "elapsed_s": elapsed,
+            "counters": counters,
+            "stages_s": stages,
+            "latencies": {name: self.latency_summary(name) for name in latency_names},
+            "throughput": {
+                "files_per_s": counters.get("files_indexed", 0) / seconds,
+                "mb_per_s": counters.get("bytes_read", 0) / 1024 / 1024 / seconds,
+                "chunks_per_s": counters.get("chunks", 0) / seconds,
+            },
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+
+    def to_prometheus(self, prefix: str = "chat_indexer") -> str:
+        """Отчёт в текстовом формате Prometheus (для node_exporter textfile collector)"""
+        report = self.report()
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[str]) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.extend(samples)
+
+        for name, value in sorted(report["counters"].items()):
+            metric(f"{name}_total", "counter", f"Indexing counter {name}", [f"{prefix}_{name}_total {value}"])
+
+        metric("stage_seconds", "gauge", "Wall time per indexing stage", [
+            f'{prefix}_stage_seconds{{stage="{stage}"}} {seconds}'
+            for stage, seconds in sorted(report["stages_s"].items())
+        ])
+
+        for name in sorted(report["latencies"]):
+            summary = report["latencies"][name]
+            samples = [
+                f'{prefix}_{name}_seconds{{quantile="{p / 100}"}} {summary[f"p{p}_ms"] / 1000}'
+                for p in PERCENTILES
+            ]
+            samples.append(f"{prefix}_{name}_seconds_sum {summary['total_s']}")
+            samples.append(f"{prefix}_{name}_seconds_count {summary['count']}")
+            metric(f"{name}_seconds", "summary", f"Latency of {name}", samples)
+
+        for name, value in sorted(report["throughput"].items()):
+            metric(name, "gauge", f"Indexing throughput {name}", [f"{prefix}_{name} {value}"])
+
+        metric("elapsed_seconds", "gauge", "Total indexing wall time", [f"{prefix}_elapsed_seconds {report['elapsed_s']}"])
+        if report["peak_rss_bytes"] is not None:
+            metric("peak_rss_bytes", "gauge", "Peak resident set size", [f"{prefix}_peak_rss_bytes {report['peak_rss_bytes']}"])
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,178 @@
+"""
+Потоковый конвейер индексации: read → chunk → embed → upsert
+Батчи фиксированного размера, ограниченное число батчей в работе и повтор каждого батча при ошибке
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple, TypeVar
+
+from .embeddings import EmbeddingEngine, Vector
+from .metrics import IndexingMetrics
+
+T = TypeVar("T")
+
+# (point id, текст для эмбеддинга, payload)
+PipelineItem = Tuple[Any, str, Dict[str, Any]]
+# (point id, вектор, payload) - готово к upsert
+EmbeddedItem = Tuple[Any, Vector, Dict[str, Any]]
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Разбиение итератора на списки фиксированного размера (последний может быть меньше)"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@dataclass
+class PipelineStats:
+    """Статистика прогона конвейера"""
+    batches: int = 0
+    points: int = 0
+    retries: int = 0
+    failed_batches: int = 0
+    failed_points: int = 0
+
+
+class CompletionTracker:
+    """
+    Отслеживание полностью загруженных файлов
+    Файл считается завершённым, когда подтверждены upsert всех его точек - это точка чекпоинта
+    Вместе с point ids возвращается state файла (например, состояние прочитанных байт для манифеста)
+    """
+
+    def __init__(self):
+        self._point_ids: Dict[str, List[Any]] = {}
+        self._states: Dict[str, Any] = {}
+        self._remaining: Dict[str, Set[Any]] = {}
+        self._owner: Dict[Any, str] = {}
+        self._lock = threading.Lock()
+
+    def expect(self, key: str, point_ids: List[Any], state: Any = None) -> bool:
+        """Регистрация точек файла; True если файл пустой и завершён сразу"""
+        with self._lock:
+            if not point_ids:
+                return True
+            self._point_ids[key] = list(point_ids)
+            self._states[key] = state
+            self._remaining[key] = set(point_ids)
+            for point_id in point_ids:
+                self._owner[point_id] = key
+            return False
+
+    def ack(self, point_ids: Iterable[Any]) -> List[Tuple[str, List[Any], Any]]:
+        """Подтверждение загруженных точек; возвращает завершённые файлы, их point ids и state"""
+        completed = []
+        with self._lock:
+            for point_id in point_ids:
+                key = self._owner.pop(point_id, None)
+                if key is None:
+                    continue
+                remaining = self._remaining[key]
+                remaining.discard(point_id)
+                if not remaining:
+                    del self._remaining[key]
+                    completed.append((key, self._point_ids.pop(key), self._states.pop(key)))
+        return completed
+
+    def pending(self) -> List[str]:
+        """Файлы, часть точек которых так и не была загружена"""
+        with self._lock:
+            return list(self._remaining)
+
+
+class IndexingPipeline:
+    """
+    Конвейер эмбеддинга и загрузки точек батчами
+
+    Элементы читаются лениво; одновременно в работе не более `max_pending_batches` батчей,
+    поэтому память не растёт с размером репозитория. Эмбеддинг идёт в фоне, пока
+    основной поток загружает предыдущие батчи.
+    """
+
+    def __init__(self, embedder: EmbeddingEngine, upsert: Callable[[List[EmbeddedItem]], None],
+                 batch_size: int = 64, max_pending_batches: int = 4, max_retries: int = 3,
+                 retry_delay: float = 0.5, on_batch_done: Optional[Callable[[List[PipelineItem]], None]] = None,
+                 metrics: Optional[IndexingMetrics] = None):
+        self.embedder = embedder
+        self.upsert = upsert
+        self.batch_size = batch_size
+        self.max_pending_batches = max(1, max_pending_batches)
+        self.max_retries = max(1, max_retries)
+        self.retry_delay = retry_delay
+        self.on_batch_done = on_batch_done
+        self.metrics = metrics
+
+    def _embed(self, texts: List[str]) -> List[Vector]:
+        """Эмбеддинг батча с замером латентности"""
+        if self.metrics is None:
+            return self.embedder.embed_many(texts)
+        with self.metrics.timed("embed_batch"):
+            vectors = self.embedder.embed_many(texts)
+        self.metrics.count("embedded_texts", len(texts))
+        return vectors
+
+    def _upsert(self, points: List[EmbeddedItem]) -> None:
+        if self.metrics is None:
+            return self.upsert(points)
+        with self.metrics.timed("upsert_batch"):
+            self.upsert(points)
+
+    def run(self, items: Iterable[PipelineItem]) -> PipelineStats:
+        """Прогон всех элементов через конвейер"""
+        stats = PipelineStats()
+        in_flight: Deque[Tuple[List[PipelineItem], Future]] = deque()
+
+        with ThreadPoolExecutor(max_workers=self.max_pending_batches) as pool:
+            for batch in batched(items, self.batch_size):
+                texts = [text for _, text, _ in batch]
+                in_flight.append((batch, pool.submit(self._embed, texts)))
+
+                # Back-pressure: не читаем дальше, пока очередь батчей заполнена
+                if len(in_flight) >= self.max_pending_batches:
+                    self._commit(*in_flight.popleft(), stats)
+
+            while in_flight:
+                self._commit(*in_flight.popleft(), stats)
+
+        return stats
+
+    def _commit(self, batch: List[PipelineItem], future: Future, stats: PipelineStats) -> None:
+        """Загрузка одного батча с повторами (повторяется и эмбеддинг, если он упал)"""
+        vectors: Optional[List[Vector]] = None
+        last_error: Optional[Exception] = None
+
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                if vectors is None:
+                    vectors = future.result() if attempt == 1 else self._embed(
+                        [text for _, text, _ in batch]
+                    )
+                self._upsert([
+                    (point_id, vector, payload)
+                    for (point_id, _, payload), vector in zip(batch, vectors)
+                ])
+            except Exception as e:
+                last_error = e
+                if attempt < self.max_retries:
+                    stats.retries += 1
+                    time.sleep(self.retry_delay * 2 ** (attempt - 1))
+                continue
+
+            stats.batches += 1
+            stats.points += len(batch)
+            if self.on_batch_done:
+                self.on_batch_done(batch)
+            return
+
+        stats.failed_batches += 1
+        stats.failed_points += len(batch)
+        print(f"⚠️ Батч из {len(batch)} точек не загружен после {self.max_retries} попыток: {last_error}")
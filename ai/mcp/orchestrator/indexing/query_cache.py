@@ -0,0 +1,122 @@
+"""
+Кэш результатов поиска (RAG) в памяти процесса
+TTL + LRU, ключ - (нормализованный запрос, коллекция, top_k, режим, фильтр) в рамках поколения индекса
+"""
+
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """
+    Нормализация запроса для ключа кэша: NFC + схлопывание пробелов
+    Регистр сохраняется - токенизатор разбивает camelCase, и `ChatView` ≠ `chatview`
+    """
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
+class IndexGeneration:
+    """
+    Поколение индекса - счётчик, который индексатор увеличивает при каждом изменении коллекций
+    Хранится в файле, поэтому процесс поиска видит обновления от CLI индексации (проверка по mtime)
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self._value = 0
+        self._mtime_ns: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> int:
+        if self.path is None:
+            return self._value
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return self._value
+        if mtime_ns != self._mtime_ns:
+            with self._lock:
+                try:
+                    self._value = int(self.path.read_text(encoding="utf-8").strip() or 0)
+                except (OSError, ValueError):
+                    pass
+                self._mtime_ns = mtime_ns
+        return self._value
+
+    def bump(self) -> int:
+        """Новое поколение: все закэшированные результаты становятся недействительными"""
+        current = self.value
+        with self._lock:
+            self._value = current + 1
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+                tmp_path.write_text(str(self._value), encoding="utf-8")
+                os.replace(tmp_path, self.path)
+                self._mtime_ns = os.stat(self.path).st_mtime_ns
+            return self._value
+
+
+class QueryCache:
+    """
+    LRU-кэш результатов поиска с TTL
+
+    При смене поколения индекса кэш очищается целиком при следующем обращении,
+    поэтому результат никогда не переживает переиндексацию.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(collection: str, query: str, top_k: int, mode: str,
+                 query_filter: Hashable = None) -> Tuple[str, str, int, str, Hashable]:
+        return collection, normalize_query(query), top_k, mode, query_filter
+
+    def _sync_generation(self, generation: int) -> None:
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key: Hashable, generation: int = 0) -> Optional[Any]:
+        """Результат из кэша или None (промах, истёк TTL или сменилось поколение)"""
+        with self._lock:
+            self._sync_generation(generation)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any, generation: int = 0) -> None:
+        with self._lock:
+            self._sync_generation(generation)
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
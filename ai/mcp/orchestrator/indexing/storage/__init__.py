@@ -0,0 +1,55 @@
+"""
+Storage - хранилища векторов для индексатора
+
+```python
+from indexing.storage import LocalVectorStore, QdrantStore
+
+store = LocalVectorStore(Path(".index_state/vectors"), dtype="float16", index="ivf")
+store = QdrantStore("http://localhost:6333", quantization="int8")
+```
+"""
+
+from .base import VectorStore, SearchHit, StoredPoint, SearchFilter, PAYLOAD_INDEX_FIELDS, path_prefixes
+from .qdrant import QdrantStore, parse_qdrant_url
+from .local import LocalVectorStore, LocalCollection
+from .ann import ANNIndex, IVFIndex, HNSWIndex, top_k_rows
+from .quantization import (
+    Quantizer,
+    ScalarQuantizer,
+    BinaryQuantizer,
+    make_quantizer,
+    quantized_search,
+    quantization_report,
+)
+
+__all__ = [
+    # Абстракция
+    "VectorStore",
+    "SearchHit",
+    "StoredPoint",
+
+    # Фильтрация по payload
+    "SearchFilter",
+    "PAYLOAD_INDEX_FIELDS",
+    "path_prefixes",
+
+    # Реализации
+    "QdrantStore",
+    "parse_qdrant_url",
+    "LocalVectorStore",
+    "LocalCollection",
+
+    # ANN-индексы локального хранилища
+    "ANNIndex",
+    "IVFIndex",
+    "HNSWIndex",
+    "top_k_rows",
+
+    # Квантование
+    "Quantizer",
+    "ScalarQuantizer",
+    "BinaryQuantizer",
+    "make_quantizer",
+    "quantized_search",
+    "quantization_report",
+]
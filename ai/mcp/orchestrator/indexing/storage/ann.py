@@ -0,0 +1,158 @@
+"""
+Приближённый поиск ближайших соседей для локального хранилища
+IVF (k-means по cosine, NumPy) и HNSW (hnswlib, если установлен)
+"""
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def top_k_rows(scores: np.ndarray, limit: int) -> np.ndarray:
+    """Индексы top-K значений по убыванию (argpartition + сортировка только K элементов)"""
+    if limit >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, limit - 1)[:limit]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+class ANNIndex(ABC):
+    """Базовый класс ANN-индекса по строкам нормализованной матрицы"""
+
+    kind: str = "base"
+
+    @abstractmethod
+    def build(self, matrix: np.ndarray) -> None:
+        """Построение индекса по строкам matrix"""
+
+    @abstractmethod
+    def search(self, matrix: np.ndarray, query: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(строки, scores) top-K по убыванию score"""
+
+    @abstractmethod
+    def save(self, path: Path) -> None:
+        """Сохранение индекса на диск"""
+
+    @classmethod
+    @abstractmethod
+    def load(cls, path: Path, dim: int) -> Optional["ANNIndex"]:
+        """Загрузка сохранённого индекса (None, если файла нет)"""
+
+
+class IVFIndex(ANNIndex):
+    """
+    Inverted File Index: строки разбиты на n_lists кластеров (сферический k-means),
+    запрос сканирует только nprobe ближайших кластеров
+    """
+
+    kind = "ivf"
+
+    def __init__(self, n_lists: Optional[int] = None, nprobe: int = 16, iterations: int = 10,
+                 sample_per_list: int = 256, seed: int = 0):
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.sample_per_list = sample_per_list
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        # Строки, отсортированные по кластеру, и границы кластеров в этом массиве
+        self.rows: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+
+    def build(self, matrix: np.ndarray) -> None:
+        n = len(matrix)
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, n)
+        rng = np.random.default_rng(self.seed)
+
+        # Центроиды обучаются на подвыборке - этого достаточно для разбиения
+        sample_size = min(n, n_lists * self.sample_per_list)
+        sample = np.asarray(matrix[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for list_id in range(n_lists):
+                members = sample[assignment == list_id]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[list_id] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        assignment = np.concatenate([
+            np.argmax(np.asarray(matrix[start:start + 65536], dtype=np.float32) @ centroids.T, axis=1)
+            for start in range(0, n, 65536)
+        ])
+        self.centroids = centroids
+        self.rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        self.offsets = np.searchsorted(assignment[self.rows], np.arange(n_lists + 1))
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        probe = top_k_rows(self.centroids @ query, min(self.nprobe, len(self.centroids)))
+        candidates = np.concatenate([self.rows[self.offsets[i]:self.offsets[i + 1]] for i in probe])
+        candidates.sort()  # Последовательное чтение memory map
+        scores = np.asarray(matrix[candidates], dtype=np.float32) @ query
+        order = top_k_rows(scores, limit)
+        return candidates[order], scores[order]
+
+    def save(self, path: Path) -> None:
+        with open(path, "wb") as f:
+            np.savez(f, centroids=self.centroids, rows=self.rows, offsets=self.offsets, nprobe=self.nprobe)
+
+    @classmethod
+    def load(cls, path: Path, dim: int) -> Optional["IVFIndex"]:
+        if not path.exists():
+            return None
+        data = np.load(path)
+        index = cls(n_lists=len(data["centroids"]), nprobe=int(data["nprobe"]))
+        index.centroids, index.rows, index.offsets = data["centroids"], data["rows"], data["offsets"]
+        return index
+
+
+class HNSWIndex(ANNIndex):
+    """Граф HNSW через hnswlib (опциональная зависимость: pip install hnswlib)"""
+
+    kind = "hnsw"
+
+    def __init__(self, m: int = 16, ef_construction: int = 200, ef_search: int = 64):
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._index = None
+
+    @staticmethod
+    def _hnswlib():
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("Для HNSW-индекса нужен пакет hnswlib: pip install hnswlib") from e
+        return hnswlib
+
+    def build(self, matrix: np.ndarray) -> None:
+        hnswlib = self._hnswlib()
+        n, dim = matrix.shape
+        self._index = hnswlib.Index(space="ip", dim=dim)
+        self._index.init_index(max_elements=n, ef_construction=self.ef_construction, M=self.m)
+        for start in range(0, n, 65536):
+            block = np.asarray(matrix[start:start + 65536], dtype=np.float32)
+            self._index.add_items(block, np.arange(start, start + len(block)))
+        self._index.set_ef(self.ef_search)
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        self._index.set_ef(max(self.ef_search, limit))
+        labels, distances = self._index.knn_query(query, k=min(limit, self._index.get_current_count()))
+        # Для space="ip" hnswlib возвращает 1 - <q, x>
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    def save(self, path: Path) -> None:
+        self._index.save_index(str(path))
+
+    @classmethod
+    def load(cls, path: Path, dim: int) -> Optional["HNSWIndex"]:
+        if not path.exists():
+            return None
+        index = cls()
+        index._index = cls._hnswlib().Index(space="ip", dim=dim)
+        index._index.load_index(str(path))
+        index._index.set_ef(index.ef_search)
+        return index
@@ -0,0 +1,141 @@
+"""
+Абстракция хранилища векторов
+Индексатор работает с коллекциями только через VectorStore - Qdrant или встроенное локальное хранилище
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from ..embeddings import Vector
+
+# (point id, вектор, payload)
+StoredPoint = Tuple[int, Vector, Dict[str, Any]]
+
+# Поля payload с keyword-индексом (фильтрация без сканирования всей коллекции)
+PAYLOAD_INDEX_FIELDS = ("path_prefixes", "language", "type", "repository")
+
+FilterValue = Union[None, str, Iterable[str]]
+
+
+def path_prefixes(source_path: str) -> List[str]:
+    """
+    Директории-предки относительного пути - фильтр по директории становится точным совпадением
+    "Features/Chat/ChatView.swift" → ["Features", "Features/Chat"]
+    """
+    parts = source_path.replace("\\", "/").split("/")[:-1]
+    return ["/".join(parts[:i]) for i in range(1, len(parts) + 1) if parts[i - 1]]
+
+
+def _values(value: FilterValue, normalize) -> Tuple[str, ...]:
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        value = [value]
+    return tuple(sorted({normalize(item) for item in value} - {""}))
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """
+    Фильтр поиска по payload: внутри поля - любое из значений, между полями - И
+    directory - директория относительно корня проекта ("Features/" - всё под Features)
+    """
+    directory: Tuple[str, ...] = ()
+    language: Tuple[str, ...] = ()
+    type: Tuple[str, ...] = ()
+
+    @classmethod
+    def build(cls, directory: FilterValue = None, language: FilterValue = None,
+              type: FilterValue = None) -> Optional["SearchFilter"]:
+        """Фильтр из аргументов поиска; None, если ограничений нет"""
+        search_filter = cls(
+            directory=_values(directory, lambda item: item.replace("\\", "/").strip("/").removeprefix("./")),
+            language=_values(language, str.lower),
+            type=_values(type, str.lower),
+        )
+        return search_filter if search_filter.conditions() else None
+
+    def conditions(self) -> List[Tuple[str, Tuple[str, ...]]]:
+        """Условия (поле payload, допустимые значения) для непустых ограничений"""
+        fields = (("path_prefixes", self.directory), ("language", self.language), ("type", self.type))
+        return [(field_name, values) for field_name, values in fields if values]
+
+    def matches(self, payload: Dict[str, Any]) -> bool:
+        """Проверка payload (для хранилищ и индексов без встроенной фильтрации)"""
+        for field_name, values in self.conditions():
+            actual = payload.get(field_name)
+            actual = actual if isinstance(actual, list) else [actual]
+            if not any(item in values for item in actual):
+                return False
+        return True
+
+
+@dataclass
+class SearchHit:
+    """Результат поиска по вектору"""
+    id: int
+    score: float
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+
+class VectorStore(ABC):
+    """Базовый класс хранилища векторов (метрика - cosine)"""
+
+    name: str = "base"
+
+    @abstractmethod
+    def collection_exists(self, collection: str) -> bool:
+        """Существует ли коллекция"""
+
+    @abstractmethod
+    def create_collection(self, collection: str, dim: int) -> None:
+        """Создание коллекции для векторов размерности dim"""
+
+    @abstractmethod
+    def upsert(self, collection: str, points: Sequence[StoredPoint]) -> None:
+        """Добавление или замена точек"""
+
+    @abstractmethod
+    def delete(self, collection: str, point_ids: Sequence[int]) -> None:
+        """Удаление точек по ID (отсутствующие ID игнорируются)"""
+
+    @abstractmethod
+    def search(self, collection: str, vector: Vector, limit: int,
+               query_filter: Optional[SearchFilter] = None) -> List[SearchHit]:
+        """Top-K ближайших точек по cosine (по убыванию score), только подходящие под фильтр"""
+
+    def search_batch(self, collection: str, vectors: Sequence[Vector], limit: int,
+                     query_filters: Optional[Sequence[Optional[SearchFilter]]] = None) -> List[List[SearchHit]]:
+        """Несколько запросов за одно обращение: результаты по каждому вектору в исходном порядке"""
+        query_filters = query_filters or [None] * len(vectors)
+        return [self.search(collection, vector, limit, query_filter)
+                for vector, query_filter in zip(vectors, query_filters)]
+
+    @abstractmethod
+    def retrieve(self, collection: str, point_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        """Payload точек по ID: {id: payload}"""
+
+    @abstractmethod
+    def count(self, collection: str) -> int:
+        """Количество точек в коллекции"""
+
+    def create_payload_index(self, collection: str, field_name: str) -> None:
+        """Keyword-индекс поля payload для фильтрации (повторный вызов ничего не меняет)"""
+
+    def sync_collection_config(self, collection: str) -> None:
+        """Применение настроек хранилища (квантование) к коллекции, созданной с другими"""
+
+    @abstractmethod
+    def vectors(self, collection: str) -> Sequence[Vector]:
+        """Все векторы коллекции (для отчёта recall/память по вариантам квантования)"""
+
+    def info(self, collection: str) -> Dict[str, Any]:
+        """Статистика коллекции для health check"""
+        return {"points_count": self.count(collection)}
+
+    def optimize(self, collection: str) -> None:
+        """Обслуживание после индексации (например, перестроение ANN-индекса)"""
+
+    def close(self) -> None:
+        """Освобождение ресурсов (соединения, memory map)"""
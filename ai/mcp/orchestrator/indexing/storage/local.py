@@ -0,0 +1,541 @@
+"""
+Встроенное локальное хранилище векторов (без сервера)
+Матрица векторов в memory-mapped .npy (float32/float16), payload и ID в SQLite,
+brute-force cosine top-K одной матричной операцией, опциональные квантование (int8/binary),
+IVF/HNSW индекс и keyword-индекс полей payload для фильтрации
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .ann import ANNIndex, HNSWIndex, IVFIndex, top_k_rows
+from .base import SearchFilter, SearchHit, StoredPoint, VectorStore
+from .quantization import DEFAULT_OVERSAMPLING, Quantizer, make_quantizer, quantized_search
+from ..cache import SQL_CHUNK
+from ..embeddings import Vector
+
+ANN_INDEXES = {"ivf": IVFIndex, "hnsw": HNSWIndex}
+ANN_FILES = {"ivf": "ivf.npz", "hnsw": "hnsw.bin"}
+
+# Строк матрицы за одну операцию при brute-force поиске (ограничивает временную память для float16)
+SCAN_BLOCK = 65536
+INITIAL_CAPACITY = 1024
+
+
+class LocalCollection:
+    """
+    Одна коллекция на диске:
+    meta.json (размерность, dtype), vectors.npy (memory map), points.sqlite (id → строка, payload)
+
+    Матрица всегда плотная: при удалении последняя строка переносится на место удалённой,
+    поэтому поиск - это одно умножение matrix[:count] @ query без маски удалённых.
+
+    При квантовании в памяти держатся только коды (int8 или биты), поиск идёт по ним,
+    а top кандидаты пересчитываются по исходным векторам из memory map (rescoring).
+
+    Поиск с фильтром: подходящие ID берутся из таблицы payload_index (field, value, id),
+    и скоринг идёт только по их строкам.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Path, dim: int, dtype: str = "float32", index: Optional[str] = None,
+                 index_min_points: int = 20_000, quantization: Optional[str] = None,
+                 oversampling: Optional[float] = None):
+        self.path = Path(path)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.index_kind = index
+        self.index_min_points = index_min_points
+        self.quantization = quantization
+        self.oversampling = oversampling or DEFAULT_OVERSAMPLING.get(quantization, 1.0)
+        self._quantizer: Optional[Quantizer] = make_quantizer(quantization, dim)
+        self._codes: Optional[np.ndarray] = None
+        self._lock = threading.RLock()
+        self._ann: Optional[ANNIndex] = None
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        if not (self.path / "meta.json").exists():
+            self._write_meta()
+
+        self._conn = sqlite3.connect(str(self.path / "points.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS points ("
+            " id INTEGER PRIMARY KEY,"
+            " row INTEGER NOT NULL,"
+            " payload TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS indexed_fields (field TEXT PRIMARY KEY)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS payload_index ("
+            " field TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " id INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS payload_index_value ON payload_index (field, value)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS payload_index_id ON payload_index (id)")
+        self._conn.commit()
+        self._indexed_fields = {field for field, in self._conn.execute("SELECT field FROM indexed_fields")}
+
+        rows = self._conn.execute("SELECT id, row FROM points").fetchall()
+        self.count = len(rows)
+        self._id_to_row: Dict[int, int] = dict(rows)
+        self._matrix = self._open_matrix(max(INITIAL_CAPACITY, self.count))
+        self._row_ids = np.zeros(len(self._matrix), dtype=np.int64)
+        for point_id, row in rows:
+            self._row_ids[row] = point_id
+        if self._quantizer is not None:
+            self._encode_all()
+
+        if index:
+            self._ann = ANN_INDEXES[index].load(self.path / ANN_FILES[index], dim)
+
+    def _write_meta(self) -> None:
+        (self.path / "meta.json").write_text(json.dumps({
+            "version": self.VERSION,
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "index": self.index_kind,
+            "quantization": self.quantization,
+        }), encoding="utf-8")
+
+    @classmethod
+    def open(cls, path: Path, dtype: Optional[str] = None, index: Optional[str] = None,
+             quantization: Optional[str] = None, **kwargs) -> "LocalCollection":
+        """
+        Открытие существующей коллекции (параметры из meta.json)
+        Явно заданные index / quantization, отличные от сохранённых, применяются: коды квантования
+        строятся при открытии, ANN-индекс - при optimize. dtype векторов на диске не меняется
+        без переиндексации - при расхождении только предупреждение.
+        """
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if dtype is not None and np.dtype(dtype).name != meta["dtype"]:
+            print(f"⚠️ Коллекция {path.name} хранит векторы в {meta['dtype']}, {dtype} требует переиндексации "
+                  f"(удалите {path})")
+        stored_index, stored_quantization = meta.get("index"), meta.get("quantization")
+        index = index or stored_index
+        quantization = quantization or stored_quantization
+        collection = cls(path, meta["dim"], meta["dtype"], index, quantization=quantization, **kwargs)
+        if (index, quantization) != (stored_index, stored_quantization):
+            print(f"⚠️ Коллекция {path.name}: индекс {stored_index} → {index}, "
+                  f"квантование {stored_quantization} → {quantization}")
+            if stored_index and stored_index != index and (path / ANN_FILES[stored_index]).exists():
+                (path / ANN_FILES[stored_index]).unlink()
+            collection._write_meta()
+        return collection
+
+    def _encode_all(self, fit: bool = True) -> None:
+        """Квантование всей матрицы (при открытии коллекции) - коды живут только в памяти"""
+        if fit:
+            self._quantizer.fit(self._matrix[:self.count])
+        self._codes = self._quantizer.empty(len(self._matrix))
+        for start in range(0, self.count, SCAN_BLOCK):
+            end = min(start + SCAN_BLOCK, self.count)
+            self._codes[start:end] = self._quantizer.encode(np.asarray(self._matrix[start:end], dtype=np.float32))
+
+    def _open_matrix(self, capacity: int) -> np.ndarray:
+        matrix_path = self.path / "vectors.npy"
+        if matrix_path.exists():
+            matrix = np.load(matrix_path, mmap_mode="r+")
+            if len(matrix) >= capacity:
+                return matrix
+            return self._grow(matrix, capacity)
+        return np.lib.format.open_memmap(matrix_path, mode="w+", dtype=self.dtype, shape=(capacity, self.dim))
+
+    def _grow(self, matrix: np.ndarray, capacity: int) -> np.ndarray:
+        """Увеличение файла матрицы (копирование в новый memory map и атомарная замена)"""
+        tmp_path = self.path / "vectors.npy.tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype, shape=(capacity, self.dim))
+        grown[:self.count] = matrix[:self.count]
+        grown.flush()
+        del grown, matrix
+        self._matrix = None
+        os.replace(tmp_path, self.path / "vectors.npy")
+        return np.load(self.path / "vectors.npy", mmap_mode="r+")
+
+    def _ensure_capacity(self, needed: int) -> None:
+        if needed <= len(self._matrix):
+            return
+        capacity = max(needed, len(self._matrix) * 2)
+        self._matrix = self._grow(self._matrix, capacity)
+        row_ids = np.zeros(capacity, dtype=np.int64)
+        row_ids[:self.count] = self._row_ids[:self.count]
+        self._row_ids = row_ids
+        if self._codes is not None:
+            codes = self._quantizer.empty(capacity)
+            codes[:self.count] = self._codes[:self.count]
+            self._codes = codes
+
+    def _invalidate_ann(self) -> None:
+        """Любая запись делает ANN-индекс устаревшим - до перестроения поиск точный"""
+        if not self.index_kind:
+            return
+        self._ann = None
+        ann_path = self.path / ANN_FILES[self.index_kind]
+        if ann_path.exists():
+            ann_path.unlink()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def upsert(self, points: Sequence[StoredPoint]) -> None:
+        if not points:
+            return
+        vectors = self._normalize(np.asarray([vector for _, vector, _ in points], dtype=np.float32))
+        with self._lock:
+            if self._quantizer is not None and not self.count:
+                # Параметры квантования подбираются по первым данным коллекции
+                self._quantizer.fit(vectors)
+            # Данные вышли за подобранный диапазон (int8 обрезал бы их) - диапазон расширяется,
+            # коды всей коллекции пересчитываются после записи
+            refit = self._quantizer is not None and self.count > 0 and not self._quantizer.covers(vectors)
+            if refit:
+                self._quantizer.expand(vectors)
+            rows = []
+            for point_id, _, _ in points:
+                row = self._id_to_row.get(point_id)
+                if row is None:
+                    row = self.count
+                    self._ensure_capacity(row + 1)
+                    self._id_to_row[point_id] = row
+                    self._row_ids[row] = point_id
+                    self.count += 1
+                rows.append(row)
+
+            self._matrix[rows] = vectors.astype(self.dtype)
+            self._matrix.flush()
+            if refit:
+                self._encode_all(fit=False)
+            elif self._codes is not None:
+                self._codes[rows] = self._quantizer.encode(vectors)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO points VALUES (?, ?, ?)",
+                [(point_id, row, json.dumps(payload, ensure_ascii=False))
+                 for (point_id, _, payload), row in zip(points, rows)],
+            )
+            self._index_payloads([(point_id, payload) for point_id, _, payload in points])
+            self._conn.commit()
+            self._invalidate_ann()
+
+    def delete(self, point_ids: Sequence[int]) -> None:
+        with self._lock:
+            moved = []
+            deleted = []
+            for point_id in point_ids:
+                row = self._id_to_row.pop(point_id, None)
+                if row is None:
+                    continue
+                deleted.append((point_id,))
+                last = self.count - 1
+                if row != last:
+                    last_id = int(self._row_ids[last])
+                    self._matrix[row] = self._matrix[last]
+                    if self._codes is not None:
+                        self._codes[row] = self._codes[last]
+                    self._row_ids[row] = last_id
+                    self._id_to_row[last_id] = row
+                    moved.append((row, last_id))
+                self.count -= 1
+
+            if not deleted:
+                return
+            self._matrix.flush()
+            self._conn.executemany("DELETE FROM points WHERE id = ?", deleted)
+            self._conn.executemany("DELETE FROM payload_index WHERE id = ?", deleted)
+            self._conn.executemany("UPDATE points SET row = ? WHERE id = ?", moved)
+            self._conn.commit()
+            self._invalidate_ann()
+
+    def _index_payloads(self, items: Sequence[tuple]) -> None:
+        """Обновление payload_index для индексируемых полей (списки - по значению на элемент)"""
+        if not self._indexed_fields:
+            return
+        self._conn.executemany("DELETE FROM payload_index WHERE id = ?", [(point_id,) for point_id, _ in items])
+        self._conn.executemany("INSERT INTO payload_index VALUES (?, ?, ?)", [
+            (field_name, str(value), point_id)
+            for point_id, payload in items
+            for field_name in self._indexed_fields
+            for value in self._field_values(payload.get(field_name))
+        ])
+
+    @staticmethod
+    def _field_values(value: Any) -> list:
+        if value is None:
+            return []
+        return value if isinstance(value, list) else [value]
+
+    def create_payload_index(self, field_name: str) -> None:
+        """Keyword-индекс поля: заполняется по уже сохранённым точкам"""
+        with self._lock:
+            if field_name in self._indexed_fields:
+                return
+            self._indexed_fields.add(field_name)
+            self._conn.execute("INSERT OR IGNORE INTO indexed_fields VALUES (?)", (field_name,))
+            self._conn.executemany("INSERT INTO payload_index VALUES (?, ?, ?)", [
+                (field_name, str(value), point_id)
+                for point_id, payload in self._conn.execute("SELECT id, payload FROM points").fetchall()
+                for value in self._field_values(json.loads(payload).get(field_name))
+            ])
+            self._conn.commit()
+
+    def _filtered_rows(self, query_filter: SearchFilter) -> np.ndarray:
+        """Строки матрицы, подходящие под фильтр (по возрастанию - последовательное чтение memory map)"""
+        conditions = query_filter.conditions()
+        indexed = [(field_name, values) for field_name, values in conditions if field_name in self._indexed_fields]
+        ids = None
+        for field_name, values in indexed:
+            # Значения - частями по SQL_CHUNK (лимит переменных SQLite), пересечение полей - в памяти
+            field_ids = set()
+            for start in range(0, len(values), SQL_CHUNK):
+                part = values[start:start + SQL_CHUNK]
+                field_ids.update(point_id for point_id, in self._conn.execute(
+                    f"SELECT id FROM payload_index WHERE field = ? AND value IN ({','.join('?' * len(part))})",
+                    (field_name, *part),
+                ))
+            ids = field_ids if ids is None else ids & field_ids
+        if ids is not None:
+            ids = list(ids)
+        if len(indexed) < len(conditions):
+            # Поле без индекса - проверка payload (полный проход по SQLite)
+            if ids is None:
+                candidates = self._conn.execute("SELECT id, payload FROM points").fetchall()
+            else:
+                candidates = list(self.retrieve(ids).items())
+            ids = [point_id for point_id, payload in candidates
+                   if query_filter.matches(payload if isinstance(payload, dict) else json.loads(payload))]
+        rows = np.fromiter((self._id_to_row[point_id] for point_id in ids if point_id in self._id_to_row),
+                           dtype=np.int64)
+        rows.sort()
+        return rows
+
+    def build_index(self) -> bool:
+        """Перестроение ANN-индекса (если он настроен и точек достаточно); True если построен"""
+        with self._lock:
+            if not self.index_kind or self.count < self.index_min_points:
+                return False
+            ann = ANN_INDEXES[self.index_kind]()
+            ann.build(self._matrix[:self.count])
+            ann.save(self.path / ANN_FILES[self.index_kind])
+            self._ann = ann
+            return True
+
+    def search(self, vector: Vector, limit: int, exact: bool = False,
+               query_filter: Optional[SearchFilter] = None) -> List[SearchHit]:
+        return self.search_batch([vector], limit, exact=exact, query_filters=[query_filter])[0]
+
+    def search_batch(self, vectors: Sequence[Vector], limit: int, exact: bool = False,
+                     query_filters: Optional[Sequence[Optional[SearchFilter]]] = None) -> List[List[SearchHit]]:
+        """
+        Несколько запросов за один проход: запросы без фильтра при точном поиске
+        считаются одним матричным произведением matrix[:count] @ queries.T
+        """
+        if not len(vectors):
+            return []
+        queries = self._normalize(np.asarray(vectors, dtype=np.float32))
+        query_filters = list(query_filters or [None] * len(queries))
+        found: List[tuple] = [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))] * len(queries)
+        with self._lock:
+            count = self.count
+            if not count or limit <= 0:
+                return [[] for _ in queries]
+
+            batched = [i for i, query_filter in enumerate(query_filters) if query_filter is None]
+            if len(batched) > 1 and self._ann is None and (self._codes is None or exact):
+                scores = self._scan(queries[batched].T, count)
+                for column, i in enumerate(batched):
+                    rows = top_k_rows(scores[:, column], limit)
+                    found[i] = (rows, scores[rows, column])
+            else:
+                batched = []
+            done = set(batched)
+            for i, (query, query_filter) in enumerate(zip(queries, query_filters)):
+                if i not in done:
+                    found[i] = self._search_rows(query, count, limit, exact, query_filter)
+            ids = [[int(point_id) for point_id in self._row_ids[rows]] for rows, _ in found]
+
+        # payload всех запросов - одним SQL-запросом
+        payloads = self.retrieve(list({point_id for query_ids in ids for point_id in query_ids}))
+        return [
+            [SearchHit(id=point_id, score=float(score), payload=payloads.get(point_id, {}))
+             for point_id, score in zip(query_ids, scores)]
+            for query_ids, (_, scores) in zip(ids, found)
+        ]
+
+    def _search_rows(self, query: np.ndarray, count: int, limit: int, exact: bool,
+                     query_filter: Optional[SearchFilter]) -> tuple:
+        """Top-K одного запроса: (строки матрицы, scores)"""
+        if query_filter is not None:
+            # ANN-индекс строится по всей коллекции - отфильтрованное подмножество сканируется целиком
+            subset = self._filtered_rows(query_filter)
+            if not len(subset):
+                return subset, np.zeros(0, dtype=np.float32)
+            if self._codes is not None and not exact:
+                return quantized_search(
+                    self._quantizer, self._codes, self._matrix, query, limit, self.oversampling, rows=subset
+                )
+            scores = np.asarray(self._matrix[subset], dtype=np.float32) @ query
+            top = top_k_rows(scores, limit)
+            return subset[top], scores[top]
+        if self._ann is not None and not exact:
+            return self._ann.search(self._matrix, query, limit)
+        if self._codes is not None and not exact:
+            return quantized_search(
+                self._quantizer, self._codes[:count], self._matrix, query, limit, self.oversampling
+            )
+        scores = self._scan(query, count)
+        rows = top_k_rows(scores, limit)
+        return rows, scores[rows]
+
+    def _scan(self, query: np.ndarray, count: int) -> np.ndarray:
+        """
+        Cosine со всеми строками: векторы нормализованы, поэтому это скалярные произведения
+        query - вектор (dim,) или матрица запросов (dim, q) → scores (count,) или (count, q)
+        """
+        if self.dtype == np.float32:
+            return self._matrix[:count] @ query
+        return np.concatenate([
+            np.asarray(self._matrix[start:min(start + SCAN_BLOCK, count)], dtype=np.float32) @ query
+            for start in range(0, count, SCAN_BLOCK)
+        ])
+
+    def retrieve(self, point_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        point_ids = list(point_ids)
+        rows = []
+        with self._lock:
+            for start in range(0, len(point_ids), SQL_CHUNK):
+                part = point_ids[start:start + SQL_CHUNK]
+                rows.extend(self._conn.execute(
+                    f"SELECT id, payload FROM points WHERE id IN ({','.join('?' * len(part))})", part
+                ).fetchall())
+        return {point_id: json.loads(payload) for point_id, payload in rows}
+
+    def vectors(self) -> np.ndarray:
+        """Векторы коллекции (memory map, без копирования) - для отчётов и бенчмарков"""
+        return self._matrix[:self.count]
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "points_count": self.count,
+            "vectors_count": self.count,
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "index": self.index_kind if self._ann is not None else None,
+            "quantization": self.quantization,
+            "payload_indexes": sorted(self._indexed_fields),
+            "vectors_bytes": self.count * self.dim * self.dtype.itemsize,
+            # Резидентная память под поиск: коды при квантовании, иначе вся матрица
+            "ram_bytes": self.count * (
+                self._quantizer.bytes_per_vector() if self._quantizer else self.dim * self.dtype.itemsize
+            ),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._matrix.flush()
+            self._conn.close()
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Хранилище векторов в директории (по поддиректории на коллекцию)
+    Для CI и ноутбуков без Qdrant; также базовая линия для бенчмарков Qdrant
+    """
+
+    name = "local"
+
+    def __init__(self, path: Path, dtype: Optional[str] = None, index: Optional[str] = None,
+                 index_min_points: int = 20_000, quantization: Optional[str] = None,
+                 oversampling: Optional[float] = None):
+        # Настройки (None - float32 / без индекса / без квантования для новых коллекций, как сохранено - для
+        # существующих); явно заданные index и quantization применяются и к существующим коллекциям
+        if index is not None and index not in ANN_INDEXES:
+            raise ValueError(f"Неизвестный тип ANN-индекса: {index}")
+        make_quantizer(quantization, 1)  # Проверка типа квантования
+        self.path = Path(path)
+        self.dtype = dtype
+        self.index = index
+        self.index_min_points = index_min_points
+        self.quantization = quantization
+        self.oversampling = oversampling
+        self._collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+
+    def _collection(self, collection: str) -> LocalCollection:
+        with self._lock:
+            if collection not in self._collections:
+                path = self.path / collection
+                if not (path / "meta.json").exists():
+                    raise KeyError(f"Коллекция {collection} не найдена в {self.path}")
+                self._collections[collection] = LocalCollection.open(
+                    path, self.dtype, self.index, self.quantization,
+                    index_min_points=self.index_min_points, oversampling=self.oversampling,
+                )
+            return self._collections[collection]
+
+    def collection_exists(self, collection: str) -> bool:
+        return collection in self._collections or (self.path / collection / "meta.json").exists()
+
+    def create_collection(self, collection: str, dim: int) -> None:
+        with self._lock:
+            self._collections[collection] = LocalCollection(
+                self.path / collection, dim, self.dtype or "float32", self.index, self.index_min_points,
+                self.quantization, self.oversampling,
+            )
+
+    def drop_collection(self, collection: str) -> None:
+        with self._lock:
+            existing = self._collections.pop(collection, None)
+            if existing is not None:
+                existing.close()
+            shutil.rmtree(self.path / collection, ignore_errors=True)
+
+    def upsert(self, collection: str, points: Sequence[StoredPoint]) -> None:
+        self._collection(collection).upsert(points)
+
+    def delete(self, collection: str, point_ids: Sequence[int]) -> None:
+        self._collection(collection).delete(point_ids)
+
+    def create_payload_index(self, collection: str, field_name: str) -> None:
+        self._collection(collection).create_payload_index(field_name)
+
+    def search(self, collection: str, vector: Vector, limit: int,
+               query_filter: Optional[SearchFilter] = None) -> List[SearchHit]:
+        return self._collection(collection).search(vector, limit, query_filter=query_filter)
+
+    def search_batch(self, collection: str, vectors: Sequence[Vector], limit: int,
+                     query_filters: Optional[Sequence[Optional[SearchFilter]]] = None) -> List[List[SearchHit]]:
+        return self._collection(collection).search_batch(vectors, limit, query_filters=query_filters)
+
+    def retrieve(self, collection: str, point_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        return self._collection(collection).retrieve(point_ids)
+
+    def count(self, collection: str) -> int:
+        return self._collection(collection).count
+
+    def info(self, collection: str) -> Dict[str, Any]:
+        return self._collection(collection).info()
+
+    def vectors(self, collection: str) -> np.ndarray:
+        return self._collection(collection).vectors()
+
+    def optimize(self, collection: str) -> None:
+        self._collection(collection).build_index()
+
+    def close(self) -> None:
+        with self._lock:
+            for collection in self._collections.values():
+                collection.close()
+            self._collections.clear()
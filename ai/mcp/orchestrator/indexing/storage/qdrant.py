@@ -0,0 +1,197 @@
+"""
+Хранилище векторов на сервере Qdrant
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from .base import SearchFilter, SearchHit, StoredPoint, VectorStore
+from .quantization import DEFAULT_OVERSAMPLING, QUANTIZERS
+from ..embeddings import Vector
+
+
+def parse_qdrant_url(url: str) -> Dict[str, Any]:
+    """
+    Параметры подключения QdrantClient из строки
+    "http://localhost:6333", "localhost:6333" → url=...; ":memory:" → location (встроенный режим клиента)
+    """
+    if url == ":memory:":
+        return {"location": ":memory:"}
+    if "://" not in url:
+        url = f"http://{url}"
+    return {"url": url}
+
+
+class QdrantStore(VectorStore):
+    """
+    Коллекции на сервере Qdrant (qdrant_client импортируется только при использовании)
+    quantization: None, "int8" (scalar) или "binary" - коды в RAM, исходные векторы на диске,
+    поиск с oversampling и rescoring по исходным векторам
+    """
+
+    name = "qdrant"
+
+    def __init__(self, url: str = "http://localhost:6333", client: Optional[Any] = None,
+                 quantization: Optional[str] = None, oversampling: Optional[float] = None):
+        from qdrant_client import QdrantClient, models
+
+        if quantization is not None and quantization not in QUANTIZERS:
+            raise ValueError(f"Неизвестный тип квантования: {quantization}")
+        self.url = url
+        self.models = models
+        self.quantization = quantization
+        self.oversampling = oversampling or DEFAULT_OVERSAMPLING.get(quantization, 1.0)
+        self.client = client or QdrantClient(**parse_qdrant_url(url))
+
+    def _quantization_config(self) -> Optional[Any]:
+        models = self.models
+        if self.quantization == "int8":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def _quantization_kind(self, config: Optional[Any]) -> Optional[str]:
+        if isinstance(config, self.models.ScalarQuantization):
+            return "int8"
+        if isinstance(config, self.models.BinaryQuantization):
+            return "binary"
+        return None if config is None else type(config).__name__
+
+    def _search_params(self) -> Optional[Any]:
+        if self.quantization is None:
+            return None
+        return self.models.SearchParams(
+            quantization=self.models.QuantizationSearchParams(rescore=True, oversampling=self.oversampling)
+        )
+
+    def _filter(self, query_filter: Optional[SearchFilter]) -> Optional[Any]:
+        """SearchFilter → models.Filter (условия по полям с payload-индексом)"""
+        if query_filter is None:
+            return None
+        models = self.models
+        return models.Filter(must=[
+            models.FieldCondition(key=field_name, match=models.MatchAny(any=list(values)))
+            for field_name, values in query_filter.conditions()
+        ])
+
+    def collection_exists(self, collection: str) -> bool:
+        return self.client.collection_exists(collection)
+
+    def create_collection(self, collection: str, dim: int) -> None:
+        self.client.create_collection(
+            collection_name=collection,
+            # При квантовании исходные векторы хранятся на диске - в RAM только коды
+            vectors_config=self.models.VectorParams(
+                size=dim,
+                distance=self.models.Distance.COSINE,
+                on_disk=self.quantization is not None,
+            ),
+            quantization_config=self._quantization_config(),
+        )
+
+    def sync_collection_config(self, collection: str) -> None:
+        """
+        Квантование существующей коллекции приводится к заданному (update_collection, Qdrant
+        перестраивает коды в фоне); без quantization коллекция остаётся как есть
+        """
+        if self.quantization is None:
+            return
+        current = self._quantization_kind(self.client.get_collection(collection).config.quantization_config)
+        if current == self.quantization:
+            return
+        print(f"⚠️ Коллекция {collection}: квантование {current} → {self.quantization}")
+        self.client.update_collection(collection_name=collection, quantization_config=self._quantization_config())
+
+    def create_payload_index(self, collection: str, field_name: str) -> None:
+        self.client.create_payload_index(
+            collection_name=collection,
+            field_name=field_name,
+            field_schema=self.models.PayloadSchemaType.KEYWORD,
+        )
+
+    def upsert(self, collection: str, points: Sequence[StoredPoint]) -> None:
+        self.client.upsert(
+            collection_name=collection,
+            points=[
+                self.models.PointStruct(id=point_id, vector=list(vector), payload=payload)
+                for point_id, vector, payload in points
+            ],
+        )
+
+    def delete(self, collection: str, point_ids: Sequence[int]) -> None:
+        if not point_ids:
+            return
+        self.client.delete(
+            collection_name=collection,
+            points_selector=self.models.PointIdsList(points=list(point_ids)),
+        )
+
+    def search(self, collection: str, vector: Vector, limit: int,
+               query_filter: Optional[SearchFilter] = None) -> List[SearchHit]:
+        response = self.client.query_points(
+            collection_name=collection,
+            query=list(vector),
+            query_filter=self._filter(query_filter),
+            limit=limit,
+            with_payload=True,
+            search_params=self._search_params(),
+        )
+        return [SearchHit(id=point.id, score=point.score, payload=point.payload or {}) for point in response.points]
+
+    def search_batch(self, collection: str, vectors: Sequence[Vector], limit: int,
+                     query_filters: Optional[Sequence[Optional[SearchFilter]]] = None) -> List[List[SearchHit]]:
+        if not vectors:
+            return []
+        query_filters = query_filters or [None] * len(vectors)
+        responses = self.client.query_batch_points(
+            collection_name=collection,
+            requests=[
+                self.models.QueryRequest(
+                    query=list(vector),
+                    filter=self._filter(query_filter),
+                    limit=limit,
+                    with_payload=True,
+                    params=self._search_params(),
+                )
+                for vector, query_filter in zip(vectors, query_filters)
+            ],
+        )
+        return [
+            [SearchHit(id=point.id, score=point.score, payload=point.payload or {}) for point in response.points]
+            for response in responses
+        ]
+
+    def retrieve(self, collection: str, point_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        if not point_ids:
+            return {}
+        records = self.client.retrieve(collection_name=collection, ids=list(point_ids), with_payload=True)
+        return {record.id: record.payload or {} for record in records}
+
+    def count(self, collection: str) -> int:
+        return self.client.count(collection_name=collection, exact=True).count
+
+    def vectors(self, collection: str) -> List[Vector]:
+        """Выгрузка scroll'ом с with_vectors=True (по 1024 точки за запрос)"""
+        result: List[Vector] = []
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=collection, limit=1024, offset=offset, with_payload=False, with_vectors=True
+            )
+            result.extend(record.vector for record in records)
+            if offset is None:
+                return result
+
+    def info(self, collection: str) -> Dict[str, Any]:
+        info = self.client.get_collection(collection)
+        return {
+            "points_count": info.points_count,
+            "vectors_count": getattr(info, "vectors_count", None),
+            "indexed_at": getattr(info, "updated_at", None),
+            "quantization": self.quantization,
+        }
+
+    def close(self) -> None:
+        self.client.close()
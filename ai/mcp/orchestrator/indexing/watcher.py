@@ -0,0 +1,251 @@
+"""
+Отслеживание изменений файлов проекта для живого индекса
+inotify в Linux (через ctypes, без зависимостей) и опрос файловой системы как запасной вариант;
+пачки событий схлопываются (debounce) в один набор изменённых путей
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from .discovery import IgnoreMatcher, discover_files
+
+# Флаги inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class FileWatcher(ABC):
+    """Источник изменений: poll() блокируется не дольше timeout и возвращает изменённые пути"""
+
+    def __init__(self, root: Path, extensions: Iterable[str], ignored_dirs: Optional[Set[str]] = None):
+        self.root = Path(root)
+        self.extensions = {ext.lower() for ext in extensions}
+        self.ignored_dirs = ignored_dirs
+        # Переполнение очереди событий - изменения могли потеряться, нужен полный проход
+        self.overflowed = False
+
+    def _matcher(self) -> IgnoreMatcher:
+        return IgnoreMatcher(self.ignored_dirs)
+
+    @abstractmethod
+    def poll(self, timeout: Optional[float]) -> Set[Path]:
+        """Изменённые (созданные, изменённые, удалённые) пути; пустое множество по таймауту"""
+
+    def close(self) -> None:
+        pass
+
+
+class PollingWatcher(FileWatcher):
+    """
+    Опрос: раз в interval секунд обход дерева и сравнение (mtime, size) с предыдущим снимком
+    Работает везде (macOS, сетевые ФС); стоимость - один обход дерева за интервал
+    """
+
+    def __init__(self, root: Path, extensions: Iterable[str], ignored_dirs: Optional[Set[str]] = None,
+                 interval: float = 2.0):
+        super().__init__(root, extensions, ignored_dirs)
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for paths in discover_files(self.root, self.extensions, self._matcher()).values():
+            for path in paths:
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def poll(self, timeout: Optional[float]) -> Set[Path]:
+        wait = self._next_scan - time.monotonic()
+        if timeout is not None and wait > timeout:
+            time.sleep(max(0.0, timeout))
+            return set()
+        time.sleep(max(0.0, wait))
+        self._next_scan = time.monotonic() + self.interval
+
+        snapshot = self._scan()
+        previous = self._snapshot
+        self._snapshot = snapshot
+        changed = {path for path, state in snapshot.items() if previous.get(path) != state}
+        changed.update(path for path in previous if path not in snapshot)
+        return changed
+
+
+class InotifyWatcher(FileWatcher):
+    """
+    inotify (Linux): ядро сообщает об изменениях, в простое процесс спит в select() - CPU не тратится
+    Watch ставится на каждую неигнорируемую директорию, новые директории подхватываются на лету
+    """
+
+    def __init__(self, root: Path, extensions: Iterable[str], ignored_dirs: Optional[Set[str]] = None):
+        super().__init__(root, extensions, ignored_dirs)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches: Dict[int, Path] = {}
+        self._matcher_rules = self._matcher()
+        self._add_tree(self.root)
+
+    @staticmethod
+    def is_supported() -> bool:
+        return sys.platform.startswith("linux")
+
+    def _rel(self, path: Path) -> str:
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def _add_watch(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), WATCH_MASK)
+        if wd < 0:
+            # ENOSPC - исчерпан fs.inotify.max_user_watches; директория остаётся без watch
+            print(f"⚠️ inotify_add_watch {directory}: {os.strerror(ctypes.get_errno())}")
+            return
+        self._watches[wd] = directory
+
+    def _add_tree(self, directory: Path) -> None:
+        """Watch на директорию и все неигнорируемые поддиректории"""
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            if (current / ".gitignore").is_file():
+                self._matcher_rules.add_gitignore(current / ".gitignore", "" if current == self.root else self._rel(current))
+            self._add_watch(current)
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False) and not self._matcher_rules.is_ignored(
+                        self._rel(Path(entry.path)), True):
+                    stack.append(Path(entry.path))
+
+    def _is_relevant(self, path: Path, is_dir: bool) -> bool:
+        if self._matcher_rules.is_ignored(self._rel(path), is_dir):
+            return False
+        return is_dir or path.suffix.lower() in self.extensions
+
+    def poll(self, timeout: Optional[float]) -> Set[Path]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed: Set[Path] = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                offset += EVENT_HEADER.size + length
+                self._handle_event(wd, mask, os.fsdecode(name), changed)
+        return changed
+
+    def _handle_event(self, wd: int, mask: int, name: str, changed: Set[Path]) -> None:
+        if mask & IN_Q_OVERFLOW:
+            self.overflowed = True
+            changed.add(self.root)
+            return
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return
+
+        directory = self._watches.get(wd)
+        if directory is None or not name:
+            return
+        path = directory / name
+        is_dir = bool(mask & IN_ISDIR)
+        if not self._is_relevant(path, is_dir):
+            return
+
+        if is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+            self._add_tree(path)
+        elif is_dir and mask & IN_MOVED_FROM:
+            # Директория перемещена - её watch'и указывают на старые пути
+            for watch, watched in list(self._watches.items()):
+                if watched == path or path in watched.parents:
+                    self._libc.inotify_rm_watch(self._fd, watch)
+                    self._watches.pop(watch, None)
+        changed.add(path)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(root: Path, extensions: Iterable[str], force_polling: bool = False,
+                   poll_interval: float = 2.0, ignored_dirs: Optional[Set[str]] = None) -> FileWatcher:
+    """inotify, если доступен, иначе опрос (macOS, Windows, исчерпан лимит inotify)"""
+    if not force_polling and InotifyWatcher.is_supported():
+        try:
+            return InotifyWatcher(root, extensions, ignored_dirs)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify недоступен ({e}), используется опрос файловой системы")
+    return PollingWatcher(root, extensions, ignored_dirs, interval=poll_interval)
+
+
+def debounced_changes(watcher: FileWatcher, debounce: float = 0.5, max_delay: float = 5.0,
+                      stop_event: Optional[threading.Event] = None) -> Iterator[Set[Path]]:
+    """
+    Схлопывание событий: набор путей отдаётся после debounce секунд тишины,
+    но не позже max_delay с первого события (непрерывная запись не откладывает индексацию навсегда)
+    """
+    pending: Set[Path] = set()
+    first_event = last_event = 0.0
+
+    while stop_event is None or not stop_event.is_set():
+        now = time.monotonic()
+        if pending:
+            deadline = min(last_event + debounce, first_event + max_delay)
+            if now >= deadline:
+                yield pending
+                pending = set()
+                continue
+            timeout = deadline - now
+        else:
+            timeout = None
+        if stop_event is not None:
+            # Периодически просыпаемся, чтобы заметить остановку
+            timeout = 1.0 if timeout is None else min(timeout, 1.0)
+
+        changes = watcher.poll(timeout)
+        if changes:
+            now = time.monotonic()
+            if not pending:
+                first_event = now
+            last_event = now
+            pending |= changes
@@ -3,16 +3,73 @@ LangGraph Orchestrator для маршрутизации запросов к Aut
 Использует trigger_keywords из agents_mapping.json для умной маршрутизации
 """
 
-from langgraph.graph import StateGraph, END
-from typing import TypedDict, Literal, Annotated, List, Dict, Any
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
+from langgraph.config import get_stream_writer
+from langchain_core.runnables import RunnableLambda
+from typing import TypedDict, Annotated, List, Dict, Any, Optional, Union, AsyncIterator
 import operator
+import asyncio
+import concurrent.futures
 import json
+import threading
+import time
+import uuid
 from pathlib import Path
 from autogen_agents_generator import AutoGenAgentsGenerator
+from indexing import EmbeddingBackend, EmbeddingCache, EmbeddingEngine, LMStudioEmbeddingBackend
+from llm import LLMError, LMStudioChatClient, Message
+from context import (
+    ContextAssembler,
+    ContextChunk,
+    SessionStore,
+    count_tokens,
+    truncate_to_tokens,
+    truncating_summarizer,
+)
+from routing import HybridRouter, KeywordRouter, RoutingCache, RoutingDecision, SemanticRouter
 
 # Путь к маппингу агентов
 AGENTS_MAPPING_PATH = Path(__file__).parent.parent / "agents_mapping.json"
 
+# Локальное состояние маршрутизатора (центроиды агентов, кэш эмбеддингов запросов)
+ROUTING_STATE_PATH = Path(__file__).parent / ".routing_state"
+
+# Локальное состояние оркестратора (сессии диалогов, checkpoint'ы прогонов)
+ORCHESTRATOR_STATE_PATH = Path(__file__).parent / ".orchestrator_state"
+
+# Таймаут эмбеддинга запроса при семантической маршрутизации (секунд): зависший сервер
+# не должен задерживать каждый запрос (центроиды при старте считаются с обычным таймаутом)
+ROUTING_EMBEDDING_TIMEOUT = 2.0
+
+# Размер сводки свёрнутой части диалога (токенов)
+SESSION_SUMMARY_TOKENS = 400
+
+# Параллельных RAG-поисков (по одному на запрос); больше - новые запросы идут без RAG, а не в очередь
+RAG_WORKERS = 4
+
+# Источники RAG-контекста: коллекция QdrantIndexer на источник
+RAG_SOURCES = ("code", "docs")
+
+# Приоритетная маршрутизация: бонус к оценке агента, убывающий с позицией в списке
+PRIORITY_KEYWORDS: Dict[str, List[str]] = {
+    "UI": ["client_developer", "designer"],
+    "SwiftUI": ["client_developer", "designer"],
+    "View": ["client_developer"],
+    "ViewModel": ["client_developer"],
+    "API": ["server_developer", "server_integration_engineer"],
+    "LM Studio": ["server_developer", "server_integration_engineer"],
+    "network": ["server_developer"],
+    "SSE": ["server_developer"],
+    "архитектура": ["cto", "staff_engineer"],
+    "рефакторинг": ["staff_engineer", "cto"],
+    "тестирование": ["head_of_qa", "client_qa_lead", "server_qa_lead"],
+    "дизайн": ["designer", "designer_lead"],
+    "сборка": ["devops", "devops_lead"],
+    "анализ проекта": ["project_analysis", "cto"],
+    "новая фича": ["feature_analysis", "product_manager"],
+}
+
 
 class AgentState(TypedDict):
     """Состояние графа для маршрутизации между агентами"""
@@ -20,8 +77,19 @@ class AgentState(TypedDict):
     context: list[str]  # RAG-результаты из Qdrant
     agent_response: str  # Ответ выбранного агента
     selected_roles: Annotated[list[str], operator.add]  # История выбранных ролей
+    agent_responses: Annotated[list[dict], operator.add]  # Ответы агентов (параллельные ветки)
     conversation_history: list[dict]  # История диалога
-    context_from_qdrant: list[str]  # RAG-контекст из Qdrant
+    context_from_qdrant: list[dict]  # RAG-контекст из Qdrant (ContextChunk.to_dict)
+    session_id: Optional[str]  # Сессия диалога (ответ запоминается и при продолжении прогона)
+
+
+class AgentTask(TypedDict):
+    """Задача одной ветки fan-out: запрос к конкретному агенту"""
+    query: str
+    agent: str
+    rank: int  # Позиция агента в ранжировании маршрутизатора
+    context: list[dict]  # RAG-контекст (уже в пределах бюджета токенов)
+    history: list[dict]  # История диалога (сообщения role/content)
 
 
 class LangGraphOrchestrator:
@@ -30,11 +98,53 @@ class LangGraphOrchestrator:
     Использует trigger_keywords из agents_mapping.json для умной маршрутизации
     """
 
-    def __init__(self):
+    def __init__(self, routing_mode: str = "keyword", embedding_backend: Optional[EmbeddingBackend] = None,
+                 routing_cache_size: int = 1024, stem_routing_cache: bool = False,
+                 fan_out: int = 1, agent_deadline: Optional[float] = None,
+                 rag_budget_ms: float = 200.0, rag_token_budget: int = 1500, rag_top_k: int = 5,
+                 prompt_token_budget: int = 3000,
+                 session_store_path: Optional[Path] = ORCHESTRATOR_STATE_PATH / "sessions.sqlite",
+                 checkpoint_path: Optional[Path] = ORCHESTRATOR_STATE_PATH / "checkpoints.sqlite"):
+        if routing_mode not in ("keyword", "hybrid"):
+            raise ValueError(f"Неизвестный режим маршрутизации: {routing_mode}")
         self.agents_config: Dict[str, Any] = {}
         self.autogen_generator: AutoGenAgentsGenerator = None
+        # Асинхронный стриминг ответов агентов (ainvoke / astream), создаётся в init_autogen
+        self.chat_client: Optional[LMStudioChatClient] = None
         self.workflow: StateGraph = None
         self.app = None
+        # "keyword" - только ключевые слова, "hybrid" - плюс cosine к центроидам агентов (перефразированные запросы)
+        self.routing_mode = routing_mode
+        self.embedding_backend = embedding_backend
+        self.router: Optional[Union[KeywordRouter, HybridRouter]] = None
+        self.min_routing_confidence = 0.5  # Ниже - запрос уходит fallback-агенту (cto)
+        # Решения маршрутизации для повторных запросов (очищается при перезагрузке маппинга)
+        self.routing_cache = RoutingCache(routing_cache_size, stem=stem_routing_cache)
+        # Сколько уверенных кандидатов опрашивать параллельно и сколько секунд ждать каждого (None - без ограничения)
+        self.fan_out = fan_out
+        self.agent_deadline = agent_deadline
+        self._agent_pool = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="agent")
+        # RAG (QdrantIndexer, подключается в init_rag): идёт параллельно с маршрутизацией и не задерживает
+        # запрос больше чем на rag_budget_ms; найденное обрезается до rag_token_budget токенов
+        self.indexer = None
+        self.rag_budget_ms = rag_budget_ms
+        self.rag_token_budget = rag_token_budget
+        self.rag_top_k = rag_top_k
+        self._rag_pool = concurrent.futures.ThreadPoolExecutor(max_workers=RAG_WORKERS, thread_name_prefix="rag")
+        # Незавершённые поиски: не больше RAG_WORKERS, опоздавшие к бюджету дорабатывают в пуле
+        self._rag_inflight: set = set()
+        self._rag_lock = threading.Lock()
+        # Промпт агента (системный промпт + история + RAG + запрос) не больше prompt_token_budget токенов
+        # (сводка сессии - в отдельном бюджете, с запасом на заголовок и служебные токены сообщения)
+        self.context_assembler = ContextAssembler(prompt_token_budget, summary_tokens=SESSION_SUMMARY_TOKENS + 50)
+        # Диалоги по session_id: окно последних реплик + сводка старых (LLM-сводка - после init_autogen)
+        self.sessions = SessionStore(
+            session_store_path, summarizer=truncating_summarizer(SESSION_SUMMARY_TOKENS)
+        )
+        # Checkpoint каждого шага прогона (None - без checkpoint'ов): прерванный прогон продолжается
+        # через resume(run_id) без повторных вызовов уже ответивших агентов
+        self.checkpoint_path = checkpoint_path
+        self.checkpointer = None
 
         # Загрузка маппинга агентов
         self._load_agents_mapping()
@@ -46,145 +156,306 @@ class LangGraphOrchestrator:
             self.agents_config = data
         print(f"✅ Загружено {len(self.agents_config['agents'])} агентов для маршрутизации")
 
-    def _build_trigger_keywords_index(self) -> Dict[str, List[str]]:
-        """
-        Создание индекса trigger_keywords для быстрой маршрутизации
-        Возвращает словарь: {keyword: [agent_types]}
-        """
-        keyword_index = {}
-
-        for agent_data in self.agents_config['agents']:
-            subagent_type = agent_data['subagent_type']
-            trigger_keywords = agent_data.get('trigger_keywords', [])
-
-            for keyword in trigger_keywords:
-                keyword_lower = keyword.lower()
-                if keyword_lower not in keyword_index:
-                    keyword_index[keyword_lower] = []
-                if subagent_type not in keyword_index[keyword_lower]:
-                    keyword_index[keyword_lower].append(subagent_type)
-
-        return keyword_index
-
-    def _route_by_keyword(self, state: AgentState) -> Literal[
-        "client_developer",
-        "server_developer",
-        "designer",
-        "cto",
-        "project_analysis",
-        "feature_analysis",
-        "staff_engineer",
-        "devops",
-        "product_manager",
-        "head_of_qa",
-        "client_security_engineer",
-        "server_security_engineer",
-        "analytics_engineer",
-        "end"
-    ]:
-        """
-        Маршрутизация запроса к агенту на основе trigger_keywords
-        Использует индекс из _build_trigger_keywords_index()
-        """
-        query = state["query"].lower()
-
-        # Создаём индекс trigger_keywords (кэшируем для производительности)
-        if not hasattr(self, '_keyword_index'):
-            self._keyword_index = self._build_trigger_keywords_index()
-
-        # Поиск совпадений в запросе
-        matched_agents = []
-        for keyword, agents in self._keyword_index.items():
-            if keyword in query:
-                matched_agents.extend(agents)
-
-        # Приоритетная маршрутизация (если есть точное совпадение)
-        priority_keywords = {
-            "UI": ["client_developer", "designer"],
-            "SwiftUI": ["client_developer", "designer"],
-            "View": ["client_developer"],
-            "ViewModel": ["client_developer"],
-            "API": ["server_developer", "server_integration_engineer"],
-            "LM Studio": ["server_developer", "server_integration_engineer"],
-            "network": ["server_developer"],
-            "SSE": ["server_developer"],
-            "архитектура": ["cto", "staff_engineer"],
-            "рефакторинг": ["staff_engineer", "cto"],
-            "тестирование": ["head_of_qa", "client_qa_lead", "server_qa_lead"],
-            "дизайн": ["designer", "designer_lead"],
-            "сборка": ["devops", "devops_lead"],
-            "анализ проекта": ["project_analysis", "cto"],
-            "новая фича": ["feature_analysis", "product_manager"],
-        }
+        # Маршрутизатор (IDF, автомат ключевых слов, центроиды) строится один раз на загрузку маппинга
+        self.router = KeywordRouter.from_mapping(
+            self.agents_config, PRIORITY_KEYWORDS, min_confidence=self.min_routing_confidence
+        )
+        if self.routing_mode == "hybrid":
+            self.router = self._build_semantic_router(self.router)
+        # Решения, посчитанные по старому маппингу, недействительны
+        self.routing_cache.clear()
 
-        # Проверка на приоритетные ключевые слова
-        for keyword, agents in priority_keywords.items():
-            if keyword.lower() in query:
-                return agents[0]  # Возвращаем первого агента из списка
+    def reload_agents_mapping(self) -> None:
+        """Перезагрузка agents_mapping.json (после изменения агентов или trigger_keywords)"""
+        self._load_agents_mapping()
 
-        # Если есть совпадения в общем индексе - используем их
-        if hasattr(self, '_keyword_index') and self._keyword_index:
-            matched_agents = []
-            for keyword, agents in self._keyword_index.items():
-                if keyword.lower() in query:
-                    matched_agents.extend(agents)
+    def _build_semantic_router(self, keyword_router: KeywordRouter) -> Union[KeywordRouter, HybridRouter]:
+        """
+        Гибридный маршрутизатор: центроиды агентов считаются одним батчем эмбеддингов
+        и кэшируются на диске (повторный старт с тем же маппингом - без обращений к модели)
+        """
+        backend = self.embedding_backend or LMStudioEmbeddingBackend()
+        cache = EmbeddingCache(ROUTING_STATE_PATH / "embeddings.sqlite")
+        embedder = EmbeddingEngine(backend, max_workers=1, cache=cache)
+        try:
+            semantic = SemanticRouter.from_mapping(self.agents_config, embedder, ROUTING_STATE_PATH / "centroids.npz")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Эмбеддинги недоступны ({e}), используется маршрутизация по ключевым словам")
+            return keyword_router
+        if isinstance(backend, LMStudioEmbeddingBackend):
+            backend.timeout = ROUTING_EMBEDDING_TIMEOUT
+        print(f"✅ Семантическая маршрутизация: {len(semantic.agents)} центроидов агентов")
+        return HybridRouter(keyword_router, semantic)
+
+    def route(self, query: str) -> RoutingDecision:
+        """
+        Ранжирование агентов для запроса: выбранный агент, уверенность и кандидаты с оценками
+        Совпадения взвешиваются по специфичности ключевого слова, границам слова и приоритетной таблице;
+        повторный запрос (с точностью до регистра и пробелов) берётся из routing_cache;
+        маршрутизируется нормализованный запрос, поэтому решение из кэша совпадает со свежим
+        """
+        query = self.routing_cache.routing_query(query)
+        decision = self.routing_cache.get(query)
+        if decision is None:
+            decision = self.router.route(query)
+            self.routing_cache.put(query, decision)
+        return decision
+
+    def _select_agent(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Узел маршрутизации: выбранные агенты добавляются в selected_roles (и в поток astream)
+        При fan_out > 1 - до fan_out уверенных кандидатов ("UI" → client_developer и designer)
+        """
+        decision = self.route(state["query"])
+        agents = self.router.top_agents(decision, self.fan_out)
+        get_stream_writer()({
+            "type": "route",
+            "agent": decision.agent,
+            "agents": agents,
+            "confidence": decision.confidence,
+            "fallback": decision.fallback,
+        })
+        return {"selected_roles": agents}
+
+    def _dispatch_agents(self, state: AgentState) -> List[Send]:
+        """Параллельный вызов выбранных агентов: по задаче autogen_executor на агента"""
+        # selected_roles[0] - начальная роль "start"
+        return [
+            Send("autogen_executor", {
+                "query": state["query"],
+                "agent": agent,
+                "rank": rank,
+                "context": state["context_from_qdrant"],
+                "history": state["conversation_history"],
+            })
+            for rank, agent in enumerate(state["selected_roles"][1:])
+        ]
+
+    def _agent_messages(self, task: AgentTask, system_message: str) -> List[Message]:
+        """
+        Сообщения агенту в пределах prompt_token_budget: история + RAG-контекст + запрос
+        (системный промпт агента учитывается в бюджете, но передаётся отдельно)
+        """
+        prompt = self.context_assembler.assemble(
+            task["query"],
+            task["history"],
+            [ContextChunk(**chunk) for chunk in task["context"]],
+            reserved_tokens=count_tokens(system_message),
+        )
+        get_stream_writer()({
+            "type": "prompt",
+            "agent": task["agent"],
+            "tokens": prompt.tokens,
+            "chunks": len(prompt.chunks),
+            "history_turns": prompt.history_turns,
+        })
+        return prompt.messages
+
+    def _agent_response(self, task: AgentTask, status: str, content: str, started: float) -> Dict[str, Any]:
+        return {"agent_responses": [{
+            "agent": task["agent"],
+            "rank": task["rank"],
+            "status": status,
+            "content": content,
+            "elapsed": time.perf_counter() - started,
+        }]}
+
+    def _call_autogen_agent(self, task: AgentTask) -> Dict[str, Any]:
+        """
+        Вызов AutoGen агента (синхронная версия для invoke)
+        ainvoke / astream используют _acall_autogen_agent
+        """
+        started = time.perf_counter()
 
-            # Возвращаем первого уникального агента
-            unique_agents = list(dict.fromkeys(matched_agents))
-            if unique_agents:
-                return unique_agents[0]
+        if not self.autogen_generator:
+            return self._agent_response(
+                task, "error", f"❌ AutoGen генератор не инициализирован. Вызовите .init_autogen()", started
+            )
 
-        # Fallback: CTO для сложных/неоднозначных задач
-        return "cto"
+        agent = self.autogen_generator.auto_gen_agents.get(task["agent"])
+        if not agent:
+            return self._agent_response(task, "error", f"❌ Агент '{task['agent']}' не найден", started)
+
+        # Вызов агента (generate_reply нельзя прервать: по дедлайну ответ отбрасывается, поток дорабатывает)
+        messages = self._agent_messages(task, agent.system_message)
+        future = self._agent_pool.submit(agent.generate_reply, messages=messages)
+        try:
+            response = future.result(timeout=self.agent_deadline)
+        except concurrent.futures.TimeoutError:
+            return self._agent_response(task, "timeout", f"⚠️ Агент '{task['agent']}' не ответил вовремя", started)
 
-    def _call_autogen_agent(self, state: AgentState) -> Dict[str, Any]:
+        content = response.get("content", "No response")
+        return self._agent_response(task, "ok", content, started)
+
+    async def _acall_autogen_agent(self, task: AgentTask) -> Dict[str, Any]:
         """
-        Вызов AutoGen агента (синхронная версия для LangGraph)
-        В production использовать async version
+        Вызов агента без блокировки event loop: системный промпт AutoGen агента + запрос
+        отправляются в LM Studio стримингом, каждый токен уходит в поток astream
         """
-        selected_role = state["selected_roles"][-1]  # Берём последний выбранный агент
+        started = time.perf_counter()
 
-        if not self.autogen_generator:
-            return {
-                "agent_response": f"❌ AutoGen генератор не инициализирован. Вызовите .init_autogen()",
-                "context": state["context"]
-            }
+        if not self.autogen_generator or not self.chat_client:
+            return self._agent_response(
+                task, "error", f"❌ AutoGen генератор не инициализирован. Вызовите .init_autogen()", started
+            )
 
-        agent = self.autogen_generator.auto_gen_agents.get(selected_role)
+        agent = self.autogen_generator.auto_gen_agents.get(task["agent"])
         if not agent:
-            return {
-                "agent_response": f"❌ Агент '{selected_role}' не найден",
-                "context": state["context"]
-            }
-
-        # Вызов агента
-        response = agent.generate_reply(
-            messages=[{"role": "user", "content": state["query"]}]
-        )
+            return self._agent_response(task, "error", f"❌ Агент '{task['agent']}' не найден", started)
+
+        messages = [
+            {"role": "system", "content": agent.system_message},
+            *self._agent_messages(task, agent.system_message),
+        ]
+        write = get_stream_writer()
+        tokens = []
+
+        async def stream_tokens() -> None:
+            async for token in self.chat_client.stream(messages):
+                tokens.append(token)
+                write({"type": "token", "agent": task["agent"], "content": token})
+
+        try:
+            # wait_for, а не asyncio.timeout: оркестратор работает и на Python 3.10
+            await asyncio.wait_for(stream_tokens(), self.agent_deadline)
+        except asyncio.TimeoutError:
+            return self._agent_response(task, "timeout", "".join(tokens), started)
+        except LLMError as e:
+            return self._agent_response(task, "error", f"❌ Агент '{task['agent']}': {e}", started)
+
+        return self._agent_response(task, "ok", "".join(tokens) or "No response", started)
+
+    def _merge_responses(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Узел слияния: ответы в порядке ранга маршрутизации, опоздавшие и упавшие агенты отбрасываются
+        Один ответ - как есть, несколько - секциями по агентам
+        """
+        responses = sorted(state["agent_responses"], key=lambda response: response["rank"])
+        answered = [response for response in responses if response["status"] == "ok"]
 
-        content = response.get("content", "No response")
+        if not answered:
+            # Никто не успел - лучшее, что есть (частичный ответ или сообщение об ошибке)
+            content = next((r["content"] for r in responses if r["content"]), "No response")
+        elif len(answered) == 1:
+            content = answered[0]["content"]
+        else:
+            content = "\n\n".join(f"## {response['agent']}\n{response['content']}" for response in answered)
 
         return {
             "agent_response": content,
-            "context": state["context"] + [content],  # Добавляем в контекст для RAG
+            "context": state["context"] + [response["content"] for response in answered],  # Добавляем в контекст для RAG
         }
 
+    def _start_rag_search(self, query: str) -> Optional[concurrent.futures.Future]:
+        """
+        Поиск по коду и документации одним search_many в фоне (эмбеддинг запроса - один раз)
+        None - все потоки заняты поисками прошлых запросов (Qdrant не отвечает): запрос идёт без RAG,
+        иначе зависшие поиски копятся в очереди и каждый следующий запрос выходит за бюджет
+        """
+        from index_to_qdrant import SearchRequest
+        requests = [SearchRequest(query, source, self.rag_top_k) for source in RAG_SOURCES]
+        with self._rag_lock:
+            if len(self._rag_inflight) >= RAG_WORKERS:
+                return None
+            future = self._rag_pool.submit(self.indexer.search_many, requests)
+            self._rag_inflight.add(future)
+        future.add_done_callback(self._rag_search_done)
+        return future
+
+    def _rag_search_done(self, future: concurrent.futures.Future) -> None:
+        with self._rag_lock:
+            self._rag_inflight.discard(future)
+
+    def _rag_context(self, search: Optional[concurrent.futures.Future], started: float) -> Dict[str, Any]:
+        """
+        Контекст из поиска, завершившегося к дедлайну: чанки дедуплицируются, ранжируются
+        и добавляются целиком, пока помещаются в rag_token_budget
+        """
+        chunks, missed = [], []
+        if search is None:
+            missed = list(RAG_SOURCES)
+        elif not search.done():
+            # Ещё не начатый поиск снимается; начатый дорабатывает, но результат не ждут
+            search.cancel()
+            missed = list(RAG_SOURCES)
+        elif search.cancelled() or search.exception() is not None:
+            print(f"⚠️ RAG-поиск не удался: {'отменён' if search.cancelled() else search.exception()}")
+            missed = list(RAG_SOURCES)
+        else:
+            for source, hits in zip(RAG_SOURCES, search.result()):
+                chunks.extend(ContextChunk.from_hit(hit, source) for hit in hits)
+
+        context = self.context_assembler.select_chunks(chunks, self.rag_token_budget)
+
+        get_stream_writer()({
+            "type": "rag",
+            "chunks": len(context),
+            "tokens": sum(count_tokens(chunk.render()) for chunk in context),
+            "elapsed": time.perf_counter() - started,
+            "missed": missed,
+            "skipped": search is None,
+        })
+        return {"context_from_qdrant": [chunk.to_dict() for chunk in context]}
+
     def _add_qdrant_context(self, state: AgentState) -> Dict[str, Any]:
         """
         Добавление контекста из Qdrant (RAG)
-        В production - реальный запрос к векторной базе
+        Ждёт поиск не дольше rag_budget_ms: что не успело - не попадает в контекст
         """
-        # Здесь будет интеграция с Qdrant через MCP Memory Server
-        # Для примера возвращаем пустой список
-        return {
-            "context_from_qdrant": []
-        }
+        if self.indexer is None:
+            return {"context_from_qdrant": []}
+
+        started = time.perf_counter()
+        search = self._start_rag_search(state["query"])
+        if search is not None:
+            concurrent.futures.wait([search], timeout=self.rag_budget_ms / 1000)
+        return self._rag_context(search, started)
+
+    async def _aadd_qdrant_context(self, state: AgentState) -> Dict[str, Any]:
+        """Асинхронная версия _add_qdrant_context (поиск - в пуле потоков, event loop свободен)"""
+        if self.indexer is None:
+            return {"context_from_qdrant": []}
+
+        started = time.perf_counter()
+        search = self._start_rag_search(state["query"])
+        if search is not None:
+            await asyncio.wait([asyncio.wrap_future(search)], timeout=self.rag_budget_ms / 1000)
+        return self._rag_context(search, started)
+
+    def _await_context(self, state: AgentState) -> Dict[str, Any]:
+        """Точка сбора: маршрутизация и RAG завершены, можно вызывать агентов"""
+        return {}
+
+    def init_rag(self, indexer=None) -> None:
+        """Подключение поиска по проекту (QdrantIndexer из index_to_qdrant.py) для RAG-контекста"""
+        from index_to_qdrant import QdrantIndexer
+        # Поиск эмбеддит один-два запроса - пул процессов добавил бы только задержку запуска
+        self.indexer = indexer or QdrantIndexer(embedding_processes=False)
+        print("✅ RAG-контекст из Qdrant подключён")
+
+    def _summarize_turns(self, summary: str, turns: List[Message]) -> str:
+        """
+        Сводка диалога моделью (вызывается SessionStore в фоновом потоке, поэтому asyncio.run)
+        Прежняя сводка + новые реплики → новая сводка не длиннее SESSION_SUMMARY_TOKENS
+        """
+        dialog = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        messages = [
+            {
+                "role": "system",
+                "content": "Сожми историю диалога с командой агентов проекта Chat. Сохрани решения, факты, "
+                           "имена файлов и типов, открытые вопросы. Только сводка, без вступления, до 250 слов.",
+            },
+            {"role": "user", "content": f"Текущая сводка:\n{summary or '(пусто)'}\n\nНовые реплики:\n{dialog}"},
+        ]
+        return truncate_to_tokens(asyncio.run(self.chat_client.complete(messages)), SESSION_SUMMARY_TOKENS)
 
     def init_autogen(self) -> None:
         """Инициализация AutoGen агентов"""
         from autogen_agents_generator import AutoGenAgentsGenerator
         self.autogen_generator = AutoGenAgentsGenerator()
         components = self.autogen_generator.run()
+        self.chat_client = LMStudioChatClient.from_llm_config(self.autogen_generator.llm_config)
+        self.sessions.summarizer = self._summarize_turns
         print("✅ AutoGen агенты инициализированы")
 
     def build_workflow(self) -> StateGraph:
@@ -194,35 +465,29 @@ class LangGraphOrchestrator:
         # Создаём граф состояний
         workflow = StateGraph(AgentState)
 
-        # Добавляем узел для вызова AutoGen агента
-        workflow.add_node("autogen_executor", self._call_autogen_agent)
+        # Маршрутизация по trigger keywords: выбранный агент попадает в selected_roles
+        workflow.add_node("router", self._select_agent)
+
+        # Узел вызова AutoGen агента: invoke - синхронный вызов, ainvoke / astream - стриминг
+        workflow.add_node("autogen_executor", RunnableLambda(self._call_autogen_agent, afunc=self._acall_autogen_agent))
 
         # Добавляем узел для добавления Qdrant контекста (RAG)
-        workflow.add_node("rag_context", self._add_qdrant_context)
+        workflow.add_node("rag_context", RunnableLambda(self._add_qdrant_context, afunc=self._aadd_qdrant_context))
 
-        # Маршрутизация по trigger keywords
-        workflow.add_conditional_edges(
-            "start",
-            self._route_by_keyword,
-            {
-                "client_developer": "autogen_executor",
-                "server_developer": "autogen_executor",
-                "designer": "autogen_executor",
-                "cto": "autogen_executor",
-                "project_analysis": "autogen_executor",
-                "feature_analysis": "autogen_executor",
-                "staff_engineer": "autogen_executor",
-                "devops": "autogen_executor",
-                "product_manager": "autogen_executor",
-                "head_of_qa": "autogen_executor",
-                "client_security_engineer": "autogen_executor",
-                "server_security_engineer": "autogen_executor",
-                "analytics_engineer": "autogen_executor",
-            }
-        )
+        # Агенты вызываются, когда готовы и маршрут, и RAG-контекст
+        workflow.add_node("dispatch", self._await_context)
+
+        # Слияние ответов параллельно опрошенных агентов
+        workflow.add_node("merge", self._merge_responses)
 
-        # Добавляем edge от autogen_executor к END
-        workflow.add_edge("autogen_executor", "end")
+        # Маршрутизация и RAG идут параллельно; выбранные агенты вызываются параллельно (Send на агента),
+        # merge ждёт все ветки
+        workflow.add_edge(START, "router")
+        workflow.add_edge(START, "rag_context")
+        workflow.add_edge(["router", "rag_context"], "dispatch")
+        workflow.add_conditional_edges("dispatch", self._dispatch_agents, ["autogen_executor"])
+        workflow.add_edge("autogen_executor", "merge")
+        workflow.add_edge("merge", END)
 
         return workflow
 
@@ -231,40 +496,204 @@ class LangGraphOrchestrator:
         Компиляция workflow и создание приложения LangGraph
         """
         self.workflow = self.build_workflow()
-        self.app = self.workflow.compile()
-        print("✅ LangGraph workflow скомпилирован")
-
-    def invoke(self, query: str) -> Dict[str, Any]:
+        self.checkpointer = None
+        if self.checkpoint_path is not None:
+            try:
+                from checkpointing import open_sqlite_checkpointer
+                self.checkpointer = open_sqlite_checkpointer(self.checkpoint_path)
+            except ImportError as e:
+                print(f"⚠️ {e}. Workflow работает без checkpoint'ов")
+        self.app = self.workflow.compile(checkpointer=self.checkpointer)
+        print("✅ LangGraph workflow скомпилирован" + (" (checkpoint'ы в SQLite)" if self.checkpointer else ""))
+
+    def _run_config(self, run_id: str) -> Dict[str, Any]:
+        """Конфигурация прогона: run_id - thread_id checkpoint'ов"""
+        return {"configurable": {"thread_id": run_id}}
+
+    def _run_options(self, run_id: str) -> Dict[str, Any]:
         """
-        Запуск workflow с запросом пользователя
-        Возвращает результат выполнения графа
+        Параметры запуска графа: checkpoint пишется синхронно после каждого шага
+        (durability без checkpointer'а LangGraph не принимает)
         """
-        if not self.app:
-            return {"error": "Workflow не инициализирован. Вызовите .compile()"}
+        if self.checkpointer is None:
+            return {"config": self._run_config(run_id)}
+        return {"config": self._run_config(run_id), "durability": "sync"}
 
-        # Создаём начальное состояние
-        initial_state: AgentState = {
+    def _initial_state(self, query: str, session_id: Optional[str] = None) -> AgentState:
+        """Начальное состояние графа для запроса (с историей сессии, если она указана)"""
+        return {
             "query": query,
             "context": [],
             "agent_response": "",
-            "selected_roles": [],
-            "conversation_history": [],
-            "context_from_qdrant": []
+            # Начальная роль, выбранный агент добавляется узлом router
+            "selected_roles": ["start"],
+            "agent_responses": [],
+            "conversation_history": self.sessions.history(session_id) if session_id else [],
+            "context_from_qdrant": [],
+            "session_id": session_id,
         }
 
-        # Добавляем начальную роль (будет добавлена маршрутизатором)
-        initial_state["selected_roles"] = ["start"]
-
-        # Запуск workflow
-        result = self.app.invoke(initial_state)
-
+    def _remember(self, session_id: Optional[str], query: str, result: Dict[str, Any]) -> None:
+        """Запрос и ответ - в историю сессии (если хотя бы один агент ответил)"""
+        if not session_id:
+            return
+        if any(response["status"] == "ok" for response in result.get("agent_responses", [])):
+            self.sessions.extend(session_id, [
+                {"role": "user", "content": query},
+                {"role": "assistant", "content": result["agent_response"]},
+            ])
+
+    def _result(self, query: str, result: Dict[str, Any], run_id: str) -> Dict[str, Any]:
         return {
+            "run_id": run_id,
             "query": query,
             "agent_response": result.get("agent_response", "No response"),
-            "selected_agent": result["selected_roles"][-1] if result["selected_roles"] else "unknown",
+            "selected_agent": result["selected_roles"][1] if len(result["selected_roles"]) > 1 else "unknown",
+            "selected_agents": result["selected_roles"][1:],
+            "agent_responses": result.get("agent_responses", []),
             "context": result.get("context", []),
+            "context_from_qdrant": result.get("context_from_qdrant", []),
         }
 
+    def _resume_state(self, run_id: str) -> Optional[Any]:
+        """Последний checkpoint прогона (None - checkpoint'ов нет)"""
+        if self.checkpointer is None:
+            return None
+        snapshot = self.app.get_state(self._run_config(run_id))
+        return snapshot if snapshot.values else None
+
+    async def _aresume_state(self, run_id: str) -> Optional[Any]:
+        if self.checkpointer is None:
+            return None
+        snapshot = await self.app.aget_state(self._run_config(run_id))
+        return snapshot if snapshot.values else None
+
+    def _run_exists_error(self, run_id: str) -> Dict[str, Any]:
+        # Новый запрос в существующем потоке дописал бы selected_roles / agent_responses к старым
+        return {"error": f"Прогон {run_id} уже есть в checkpoint'ах: продолжение - resume({run_id!r})"}
+
+    def _finish_run(self, run_id: str) -> None:
+        """Завершённый прогон больше не нужен для resume - checkpoint'ы удаляются (база не растёт)"""
+        if self.checkpointer is not None:
+            self.checkpointer.delete_thread(run_id)
+
+    async def _afinish_run(self, run_id: str) -> None:
+        if self.checkpointer is not None:
+            await self.checkpointer.adelete_thread(run_id)
+
+    def invoke(self, query: str, session_id: Optional[str] = None, run_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Запуск workflow с запросом пользователя
+        Возвращает результат выполнения графа; с session_id - продолжение диалога,
+        run_id (по умолчанию новый) - ключ checkpoint'ов для resume() прерванного прогона
+        """
+        if not self.app:
+            return {"error": "Workflow не инициализирован. Вызовите .compile()"}
+
+        if run_id and self._resume_state(run_id) is not None:
+            return self._run_exists_error(run_id)
+        run_id = run_id or uuid.uuid4().hex
+        state = self.app.invoke(self._initial_state(query, session_id), **self._run_options(run_id))
+        result = self._result(query, state, run_id)
+        self._remember(session_id, query, result)
+        self._finish_run(run_id)
+        return result
+
+    async def ainvoke(self, query: str, session_id: Optional[str] = None,
+                      run_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Асинхронный запуск workflow: ожидание LLM не блокирует event loop,
+        поэтому много запросов обслуживаются одним процессом параллельно
+        """
+        if not self.app:
+            return {"error": "Workflow не инициализирован. Вызовите .compile()"}
+
+        if run_id and await self._aresume_state(run_id) is not None:
+            return self._run_exists_error(run_id)
+        run_id = run_id or uuid.uuid4().hex
+        state = await self.app.ainvoke(
+            self._initial_state(query, session_id), **self._run_options(run_id)
+        )
+        result = self._result(query, state, run_id)
+        self._remember(session_id, query, result)
+        await self._afinish_run(run_id)
+        return result
+
+    def resume(self, run_id: str) -> Dict[str, Any]:
+        """
+        Продолжение прерванного прогона с последнего checkpoint'а
+        Завершённые узлы и ветки fan-out (ответы агентов) не выполняются повторно;
+        checkpoint'ы завершённого прогона удаляются
+        """
+        if not self.app:
+            return {"error": "Workflow не инициализирован. Вызовите .compile()"}
+        snapshot = self._resume_state(run_id)
+        if snapshot is None:
+            return {"error": f"Нет checkpoint'ов прогона {run_id}"}
+
+        if snapshot.next:
+            state = self.app.invoke(None, **self._run_options(run_id))
+        else:
+            # Прогон завершился, но checkpoint'ы не были удалены (процесс остановился после merge)
+            state = snapshot.values
+        result = self._result(state["query"], state, run_id)
+        if snapshot.next:
+            self._remember(state.get("session_id"), state["query"], result)
+        self._finish_run(run_id)
+        return result
+
+    async def aresume(self, run_id: str) -> Dict[str, Any]:
+        """Асинхронная версия resume()"""
+        if not self.app:
+            return {"error": "Workflow не инициализирован. Вызовите .compile()"}
+        snapshot = await self._aresume_state(run_id)
+        if snapshot is None:
+            return {"error": f"Нет checkpoint'ов прогона {run_id}"}
+
+        if snapshot.next:
+            state = await self.app.ainvoke(None, **self._run_options(run_id))
+        else:
+            state = snapshot.values
+        result = self._result(state["query"], state, run_id)
+        if snapshot.next:
+            self._remember(state.get("session_id"), state["query"], result)
+        await self._afinish_run(run_id)
+        return result
+
+    async def astream(self, query: str, session_id: Optional[str] = None,
+                      run_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Стриминг выполнения workflow. События:
+        {"type": "route", "agent", "confidence", "fallback"} - выбранный агент,
+        {"type": "token", "agent", "content"} - токены ответа по мере генерации,
+        {"type": "done", ...результат invoke, "time_to_first_token"} - итог
+        """
+        if not self.app:
+            yield {"type": "error", "error": "Workflow не инициализирован. Вызовите .compile()"}
+            return
+        if run_id and await self._aresume_state(run_id) is not None:
+            yield {"type": "error", **self._run_exists_error(run_id)}
+            return
+
+        run_id = run_id or uuid.uuid4().hex
+        started = time.perf_counter()
+        time_to_first_token: Optional[float] = None
+        final_state: Dict[str, Any] = {}
+        initial_state = self._initial_state(query, session_id)
+        async for mode, chunk in self.app.astream(initial_state, stream_mode=["custom", "values"],
+                                                  **self._run_options(run_id)):
+            if mode == "values":
+                final_state = chunk
+                continue
+            if chunk.get("type") == "token" and time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - started
+            yield chunk
+
+        result = self._result(query, final_state, run_id)
+        self._remember(session_id, query, result)
+        await self._afinish_run(run_id)
+        yield {"type": "done", **result, "time_to_first_token": time_to_first_token}
+
 
 # Основной запуск для тестирования
 if __name__ == "__main__":
@@ -275,6 +704,9 @@ if __name__ == "__main__":
     # Инициализация AutoGen агентов
     orchestrator.init_autogen()
 
+    # RAG-контекст из Qdrant (индекс - index_to_qdrant.py)
+    orchestrator.init_rag()
+
     # Компиляция workflow
     orchestrator.compile()
 
@@ -0,0 +1,22 @@
+"""
+LLM - асинхронный доступ к модели LM Studio для оркестратора
+
+Используется LangGraphOrchestrator.ainvoke / astream (langgraph_orchestrator.py):
+
+```python
+from llm import LMStudioChatClient
+
+client = LMStudioChatClient.from_llm_config(generator.llm_config)
+async for token in client.stream([{"role": "user", "content": "Привет"}]):
+    print(token, end="", flush=True)
+```
+"""
+
+from .client import LLMError, LMStudioChatClient, Message
+
+__all__ = [
+    # Клиент
+    "LMStudioChatClient",
+    "LLMError",
+    "Message",
+]
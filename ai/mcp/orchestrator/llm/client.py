@@ -0,0 +1,90 @@
+"""
+Асинхронный клиент chat completions LM Studio (OpenAI-совместимый /v1/chat/completions)
+Ответ стримится по SSE: токены отдаются по мере генерации, ожидание не блокирует event loop
+httpx импортируется при создании клиента - без него оркестратор работает, пока стриминг не нужен
+"""
+
+import json
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+Message = Dict[str, str]
+
+
+class LLMError(RuntimeError):
+    """Ошибка сервера LLM (HTTP-статус не 2xx, обрыв соединения или некорректный поток)"""
+
+
+class LMStudioChatClient:
+    """
+    Стриминг ответов модели через LM Studio
+
+    Параметры по умолчанию совпадают с llm_config AutoGen агентов (autogen_agents_generator.py),
+    см. from_llm_config. transport - для тестов (httpx.MockTransport).
+    """
+
+    def __init__(self, model: str = "qwen3.5:35b", base_url: str = "http://localhost:1234",
+                 max_tokens: Optional[int] = 8192, temperature: Optional[float] = None,
+                 timeout: float = 300.0, transport: Optional["httpx.AsyncBaseTransport"] = None):
+        import httpx
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        # Долгая генерация - норма, ограничивается только ожидание соединения и очередного чанка
+        self.timeout = httpx.Timeout(timeout, connect=10.0)
+        self.transport = transport
+
+    @classmethod
+    def from_llm_config(cls, llm_config: Dict[str, Any], **kwargs) -> "LMStudioChatClient":
+        """Клиент по первой записи config_list из llm_config AutoGen"""
+        config = llm_config["config_list"][0]
+        kwargs.setdefault("model", config["model"])
+        kwargs.setdefault("base_url", config.get("base_url", "http://localhost:1234"))
+        kwargs.setdefault("max_tokens", config.get("max_tokens"))
+        return cls(**kwargs)
+
+    @property
+    def url(self) -> str:
+        base_url = self.base_url if self.base_url.endswith("/v1") else f"{self.base_url}/v1"
+        return f"{base_url}/chat/completions"
+
+    def _payload(self, messages: List[Message]) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"model": self.model, "messages": messages, "stream": True}
+        if self.max_tokens is not None:
+            payload["max_tokens"] = self.max_tokens
+        if self.temperature is not None:
+            payload["temperature"] = self.temperature
+        return payload
+
+    async def stream(self, messages: List[Message]) -> AsyncIterator[str]:
+        """Токены ответа (delta.content) по мере генерации; ошибки HTTP - LLMError"""
+        import httpx
+        try:
+            async with httpx.AsyncClient(timeout=self.timeout, transport=self.transport) as client:
+                async with client.stream("POST", self.url, json=self._payload(messages)) as response:
+                    if response.status_code >= 400:
+                        body = (await response.aread()).decode("utf-8", errors="replace")
+                        raise LLMError(f"LM Studio вернул {response.status_code}: {body[:200]}")
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            return
+                        try:
+                            chunk = json.loads(data)
+                        except ValueError as e:
+                            raise LLMError(f"Некорректный чанк SSE: {data[:200]}") from e
+                        for choice in chunk.get("choices", []):
+                            content = (choice.get("delta") or {}).get("content")
+                            if content:
+                                yield content
+        except httpx.HTTPError as e:
+            raise LLMError(f"LM Studio недоступен: {e}") from e
+
+    async def complete(self, messages: List[Message]) -> str:
+        """Полный ответ (тот же стриминговый запрос, собранный целиком)"""
+        return "".join([token async for token in self.stream(messages)])
@@ -0,0 +1,51 @@
+"""
+Routing - компоненты маршрутизации запросов к агентам
+
+Используется LangGraphOrchestrator (langgraph_orchestrator.py):
+
+```python
+from routing import KeywordRouter
+
+router = KeywordRouter.from_mapping(agents_config, PRIORITY_KEYWORDS)
+decision = router.route("Создай SwiftUI View")
+decision.agent, decision.confidence  # ("client_developer", 0.99)
+decision.candidates                  # [RouteCandidate("client_developer", 14.3, [...]), ...]
+
+# Ключевые слова + cosine к центроидам агентов (перефразированные запросы)
+semantic = SemanticRouter.from_mapping(agents_config, EmbeddingEngine(backend), cache_path)
+router = HybridRouter(router, semantic)
+
+# Кэш решений по нормализованному запросу
+cache = RoutingCache(max_entries=1024, stem=True)
+query = cache.routing_query(query)  # решение - по нормализованному запросу, как и ключ
+if (decision := cache.get(query)) is None:
+    cache.put(query, decision := router.route(query))
+```
+"""
+
+from .matcher import KeywordAutomaton, KeywordMatch
+from .scoring import KeywordRouter, RouteCandidate, RoutingDecision, match_weight
+from .semantic import SemanticRouter, HybridRouter, agent_texts
+from .cache import RoutingCache, normalize_routing_query, stem_russian
+
+__all__ = [
+    # Поиск ключевых слов
+    "KeywordAutomaton",
+    "KeywordMatch",
+
+    # Скоринговая маршрутизация
+    "KeywordRouter",
+    "RouteCandidate",
+    "RoutingDecision",
+    "match_weight",
+
+    # Семантическая маршрутизация
+    "SemanticRouter",
+    "HybridRouter",
+    "agent_texts",
+
+    # Кэш решений
+    "RoutingCache",
+    "normalize_routing_query",
+    "stem_russian",
+]
@@ -0,0 +1,111 @@
+"""
+Кэш решений маршрутизации (LRU в памяти процесса)
+Ключ - нормализованный запрос: повторные и шаблонные запросы не проходят скоринг
+и семантику (эмбеддинг запроса) заново. Маршрутизатор получает тот же нормализованный
+запрос (RoutingCache.routing_query), поэтому решение из кэша совпадает со свежим
+"""
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from .scoring import RoutingDecision
+
+# Окончания русских словоформ, от длинных к коротким (облегчённый стеммер без зависимостей)
+RUSSIAN_ENDINGS = tuple(sorted((
+    "иями", "ями", "ами", "иях", "ях", "ах", "ией", "ием", "ого", "его", "ому", "ему", "ыми", "ими",
+    "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие", "ую", "юю", "ом", "ем", "ам", "ям",
+    "ов", "ев", "ию", "ия", "ии", "ть", "ешь", "ет", "ют", "ут", "ит", "ат", "ят",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь",
+), key=len, reverse=True))
+
+# Основа короче - окончание не отрезается ("ui", "api", "вид" остаются как есть)
+MIN_STEM_LENGTH = 4
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def stem_russian(word: str) -> str:
+    """Отрезание окончания у кириллического слова ("архитектуры" → "архитектур"); латиница не меняется"""
+    if not ("а" <= word[-1:] <= "я" or word[-1:] == "ё"):
+        return word
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def normalize_routing_query(query: str, stem: bool = False) -> str:
+    """
+    Нормализация запроса для ключа кэша: NFC, casefold, схлопывание пробелов
+    stem=True дополнительно сводит русские словоформы к основе ("сборки проекта" = "сборка проекта")
+    """
+    text = " ".join(unicodedata.normalize("NFC", query).casefold().split())
+    if stem:
+        text = _WORD_RE.sub(lambda m: stem_russian(m.group()), text)
+    return text
+
+
+class RoutingCache:
+    """
+    LRU-кэш решений маршрутизации
+
+    Нормализация меняет решение (двойной пробел рвёт многословное ключевое слово "LM  Studio",
+    регистр меняет вход эмбеддинга), поэтому маршрутизируется routing_query(query), а не сырой
+    запрос: без stem ключ и решение согласованы. Со stem словоформы делят одно решение - первое
+    посчитанное (оценка точного совпадения и словоформы немного отличается).
+    Кэш очищается при перезагрузке маппинга.
+    """
+
+    def __init__(self, max_entries: int = 1024, stem: bool = False):
+        self.max_entries = max_entries
+        self.stem = stem
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, RoutingDecision]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def routing_query(query: str) -> str:
+        """Запрос, по которому считается решение для кэша (нормализация без stem)"""
+        return normalize_routing_query(query)
+
+    def make_key(self, query: str) -> str:
+        return normalize_routing_query(query, self.stem)
+
+    def get(self, query: str) -> Optional[RoutingDecision]:
+        key = self.make_key(query)
+        with self._lock:
+            decision = self._entries.get(key)
+            if decision is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return decision
+
+    def put(self, query: str, decision: RoutingDecision) -> None:
+        key = self.make_key(query)
+        with self._lock:
+            self._entries[key] = decision
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,118 @@
+"""
+Поиск ключевых слов маршрутизации в запросе (Aho-Corasick)
+Автомат строится один раз по всем trigger_keywords; запрос проходится один раз,
+независимо от количества ключевых слов
+"""
+
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+
+class KeywordMatch(NamedTuple):
+    """Вхождение ключевого слова: позиции в запросе, приведённом к нижнему регистру"""
+    keyword: str
+    start: int
+    end: int
+
+
+class KeywordAutomaton:
+    """
+    Автомат Aho-Corasick по набору ключевых слов (без учёта регистра)
+
+    Состояния - узлы бора, fail-ссылки ведут в самый длинный собственный суффикс,
+    который тоже является префиксом какого-то ключевого слова. Поиск - O(len(text) + число вхождений).
+    """
+
+    def __init__(self, keywords: Iterable[str] = ()):
+        self.keywords: List[str] = []
+        self._keyword_ids: Dict[str, int] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Номера ключевых слов, заканчивающихся в узле
+        self._terminal: List[Tuple[int, ...]] = [()]
+        # То же вместе с ключевыми словами, достижимыми по fail-ссылкам (заполняется в build)
+        self._output: List[Tuple[int, ...]] = [()]
+        self._built = True
+        for keyword in keywords:
+            self.add(keyword)
+        self.build()
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def __contains__(self, keyword: str) -> bool:
+        return keyword.lower() in self._keyword_ids
+
+    def add(self, keyword: str) -> int:
+        """Добавление ключевого слова (повторное добавление возвращает тот же номер)"""
+        keyword = keyword.lower()
+        if not keyword:
+            raise ValueError("Пустое ключевое слово")
+        if keyword in self._keyword_ids:
+            return self._keyword_ids[keyword]
+
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._terminal.append(())
+                self._goto[node][char] = next_node
+            node = next_node
+
+        keyword_id = len(self.keywords)
+        self.keywords.append(keyword)
+        self._keyword_ids[keyword] = keyword_id
+        self._terminal[node] += (keyword_id,)
+        self._built = False
+        return keyword_id
+
+    def build(self) -> None:
+        """Расчёт fail-ссылок обходом в ширину (после добавления ключевых слов)"""
+        if self._built:
+            return
+        output = [self._terminal[0]] + [()] * (len(self._goto) - 1)
+        queue = deque()
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            output[node] = self._terminal[node]
+            queue.append(node)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                # Выход узла дополняется выходом fail-узла: все ключевые слова-суффиксы без обхода цепочки
+                output[child] = self._terminal[child] + output[self._fail[child]]
+                queue.append(child)
+        self._output = output
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[KeywordMatch]:
+        """Все вхождения всех ключевых слов в порядке окончания, при равном окончании - длинные первыми"""
+        if not self._built:
+            self.build()
+        goto, fail, output, keywords = self._goto, self._fail, self._output, self.keywords
+        node = 0
+        for position, char in enumerate(text.lower()):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for keyword_id in output[node]:
+                keyword = keywords[keyword_id]
+                yield KeywordMatch(keyword, position + 1 - len(keyword), position + 1)
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        return list(self.iter_matches(text))
+
+    def matched_keywords(self, text: str) -> Dict[str, List[KeywordMatch]]:
+        """Вхождения, сгруппированные по ключевому слову (в порядке первого вхождения)"""
+        matched: Dict[str, List[KeywordMatch]] = {}
+        for match in self.iter_matches(text):
+            matched.setdefault(match.keyword, []).append(match)
+        return matched
@@ -0,0 +1,163 @@
+"""
+Маршрутизация по ключевым словам со скорингом
+Каждое совпадение взвешивается по специфичности ключевого слова (IDF по агентам),
+границам слова и приоритетной таблице; результат - ранжированный список агентов с оценками
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+from .matcher import KeywordAutomaton, KeywordMatch
+
+# Вес совпадения в зависимости от границ слова: "ui" в "ui элемент", "компонент" в "компонента", "ui" в "build"
+WORD_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.6
+INFIX_WEIGHT = 0.1
+
+
+@dataclass
+class RouteCandidate:
+    """Агент-кандидат с оценкой, ключевыми словами, которые её дали, и семантическим сходством"""
+    agent: str
+    score: float
+    keywords: List[str] = field(default_factory=list)
+    semantic: float = 0.0
+
+
+@dataclass
+class RoutingDecision:
+    """Результат маршрутизации: выбранный агент, уверенность и полный ранжированный список"""
+    agent: str
+    confidence: float
+    candidates: List[RouteCandidate] = field(default_factory=list)
+    fallback: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "agent": self.agent,
+            "confidence": self.confidence,
+            "fallback": self.fallback,
+            "candidates": [
+                {"agent": c.agent, "score": c.score, "keywords": c.keywords, "semantic": c.semantic}
+                for c in self.candidates
+            ],
+        }
+
+
+def match_weight(text: str, match: KeywordMatch) -> float:
+    """Вес вхождения по границам слова (text - запрос в нижнем регистре)"""
+    starts_word = match.start == 0 or not text[match.start - 1].isalnum()
+    ends_word = match.end == len(text) or not text[match.end].isalnum()
+    if starts_word and ends_word:
+        return WORD_WEIGHT
+    if starts_word:
+        # Начало слова - обычно словоформа ключевого слова ("архитектуры", "компонента")
+        return PREFIX_WEIGHT
+    return INFIX_WEIGHT
+
+
+class KeywordRouter:
+    """
+    Скоринговый маршрутизатор по trigger_keywords
+
+    score(agent) = Σ по найденным ключевым словам: вес границ · IDF(keyword) · (1 + бонус приоритета),
+    IDF = ln(1 + N / df), где df - число агентов с этим ключевым словом. Бонус приоритетной таблицы
+    убывает с позицией агента в списке (priority_boost / (позиция + 1)).
+
+    Уверенность = 1 - exp(-score лучшего агента): одно полное совпадение специфичного
+    ключевого слова даёт ~0.9, только вхождения внутри других слов - ниже порога, и запрос уходит fallback-агенту.
+    """
+
+    def __init__(self, agent_keywords: Mapping[str, Iterable[str]],
+                 priority_keywords: Optional[Mapping[str, Sequence[str]]] = None,
+                 fallback_agent: str = "cto", min_confidence: float = 0.5, priority_boost: float = 1.0):
+        self.fallback_agent = fallback_agent
+        self.min_confidence = min_confidence
+        self.priority_boost = priority_boost
+        # Порядок агентов из маппинга - детерминированный tie-break при равных оценках
+        self.agent_order: Dict[str, int] = {}
+        # {keyword: {agent: множитель приоритета}}
+        self.keyword_agents: Dict[str, Dict[str, float]] = {}
+
+        for agent, keywords in agent_keywords.items():
+            self.agent_order.setdefault(agent, len(self.agent_order))
+            for keyword in keywords:
+                keyword = keyword.strip().lower()
+                if keyword:
+                    self.keyword_agents.setdefault(keyword, {})[agent] = 1.0
+
+        for keyword, agents in (priority_keywords or {}).items():
+            keyword = keyword.strip().lower()
+            for position, agent in enumerate(agents):
+                self.agent_order.setdefault(agent, len(self.agent_order))
+                multipliers = self.keyword_agents.setdefault(keyword, {})
+                multipliers[agent] = 1.0 + priority_boost / (position + 1)
+
+        n_agents = max(1, len(self.agent_order))
+        self.idf: Dict[str, float] = {
+            keyword: math.log(1.0 + n_agents / len(agents)) for keyword, agents in self.keyword_agents.items()
+        }
+        self.matcher = KeywordAutomaton(self.keyword_agents)
+
+    @classmethod
+    def from_mapping(cls, agents_config: Dict[str, Any],
+                     priority_keywords: Optional[Mapping[str, Sequence[str]]] = None, **kwargs) -> "KeywordRouter":
+        """Маршрутизатор из agents_mapping.json (fallback-агент - fallback.default_subagent)"""
+        agent_keywords = {
+            agent["subagent_type"]: agent.get("trigger_keywords", []) for agent in agents_config["agents"]
+        }
+        kwargs.setdefault("fallback_agent", agents_config.get("fallback", {}).get("default_subagent", "cto"))
+        return cls(agent_keywords, priority_keywords, **kwargs)
+
+    def keyword_weights(self, query: str) -> Dict[str, float]:
+        """Найденные ключевые слова и их вес (лучшее вхождение по границам слова, один проход по запросу)"""
+        text = query.lower()
+        weights: Dict[str, float] = {}
+        for match in self.matcher.iter_matches(text):
+            weight = match_weight(text, match)
+            if weight > weights.get(match.keyword, 0.0):
+                weights[match.keyword] = weight
+        return weights
+
+    def rank(self, query: str) -> List[RouteCandidate]:
+        """Агенты с ненулевой оценкой по убыванию score"""
+        candidates: Dict[str, RouteCandidate] = {}
+        for keyword, weight in self.keyword_weights(query).items():
+            base = weight * self.idf[keyword]
+            for agent, multiplier in self.keyword_agents[keyword].items():
+                candidate = candidates.get(agent)
+                if candidate is None:
+                    candidate = candidates[agent] = RouteCandidate(agent, 0.0)
+                candidate.score += base * multiplier
+                candidate.keywords.append(keyword)
+        return sorted(candidates.values(), key=lambda c: (-c.score, self.agent_order.get(c.agent, 0)))
+
+    def confidence(self, score: float) -> float:
+        return 1.0 - math.exp(-score)
+
+    def route(self, query: str) -> RoutingDecision:
+        """Лучший агент или fallback-агент, если уверенность ниже порога"""
+        return self.decide(self.rank(query))
+
+    def top_agents(self, decision: RoutingDecision, limit: int, min_ratio: float = 0.5) -> List[str]:
+        """
+        Агенты для параллельного опроса: до limit кандидатов с уверенностью не ниже порога
+        и оценкой не ниже min_ratio от лучшей (fallback-решение - только fallback-агент)
+        """
+        if decision.fallback or limit <= 1:
+            return [decision.agent]
+        best = decision.candidates[0].score
+        return [
+            candidate.agent for candidate in decision.candidates[:limit]
+            if self.confidence(candidate.score) >= self.min_confidence and candidate.score >= min_ratio * best
+        ]
+
+    def decide(self, candidates: List[RouteCandidate]) -> RoutingDecision:
+        """Решение по ранжированному списку (общее для маршрутизаторов с той же шкалой оценок)"""
+        if not candidates:
+            return RoutingDecision(self.fallback_agent, 0.0, [], fallback=True)
+        confidence = self.confidence(candidates[0].score)
+        if confidence < self.min_confidence:
+            return RoutingDecision(self.fallback_agent, confidence, candidates, fallback=True)
+        return RoutingDecision(candidates[0].agent, confidence, candidates)
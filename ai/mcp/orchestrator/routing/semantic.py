@@ -0,0 +1,160 @@
+"""
+Семантическая маршрутизация по эмбеддингам
+Центроид агента - средний эмбеддинг его domains и trigger_keywords; все центроиды лежат
+в одной матрице NumPy, и маршрутизация запроса - одно матрично-векторное произведение
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .scoring import KeywordRouter, RouteCandidate, RoutingDecision
+
+
+def agent_texts(agents_config: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Тексты для центроида каждого агента: domains + trigger_keywords (без повторов)"""
+    texts = {}
+    for agent in agents_config["agents"]:
+        items = [*agent.get("domains", []), *agent.get("trigger_keywords", [])]
+        texts[agent["subagent_type"]] = list(dict.fromkeys(item.strip() for item in items if item.strip()))
+    return texts
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SemanticRouter:
+    """
+    Маршрутизация по cosine-сходству запроса с центроидами агентов
+
+    embedder - indexing.EmbeddingEngine (батчи, кэш эмбеддингов). Центроиды сохраняются в .npz
+    с ключом (модель, тексты агентов): при неизменном маппинге старт не требует ни одного эмбеддинга.
+    """
+
+    VERSION = 1
+
+    def __init__(self, embedder, texts: Dict[str, List[str]], cache_path: Optional[Path] = None):
+        self.embedder = embedder
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.agents: List[str] = [agent for agent, items in texts.items() if items]
+        self.centroids = self._load_or_build({agent: texts[agent] for agent in self.agents})
+
+    @classmethod
+    def from_mapping(cls, agents_config: Dict[str, Any], embedder,
+                     cache_path: Optional[Path] = None) -> "SemanticRouter":
+        return cls(embedder, agent_texts(agents_config), cache_path)
+
+    def _cache_key(self, texts: Dict[str, List[str]]) -> str:
+        payload = json.dumps([self.VERSION, self.embedder.backend.model_id, texts], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load_or_build(self, texts: Dict[str, List[str]]) -> np.ndarray:
+        key = self._cache_key(texts)
+        if self.cache_path is not None and self.cache_path.exists():
+            try:
+                with np.load(self.cache_path, allow_pickle=False) as data:
+                    if str(data["key"]) == key:
+                        return data["centroids"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Кэш центроидов {self.cache_path} повреждён, будет пересоздан: {e}")
+
+        centroids = self.build_centroids(texts)
+        if self.cache_path is not None:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp.npz")
+            np.savez(tmp_path, key=np.array(key), centroids=centroids)
+            os.replace(tmp_path, self.cache_path)
+        return centroids
+
+    def build_centroids(self, texts: Dict[str, List[str]]) -> np.ndarray:
+        """Все тексты всех агентов - одним вызовом embed_many; центроид - нормализованное среднее"""
+        flat = [item for agent in self.agents for item in texts[agent]]
+        vectors = _normalize(np.asarray(self.embedder.embed_many(flat), dtype=np.float32))
+        centroids = np.zeros((len(self.agents), vectors.shape[1] if len(vectors) else self.embedder.dim),
+                             dtype=np.float32)
+        offset = 0
+        for row, agent in enumerate(self.agents):
+            count = len(texts[agent])
+            centroids[row] = vectors[offset:offset + count].mean(axis=0)
+            offset += count
+        return _normalize(centroids)
+
+    def similarities(self, query: str) -> np.ndarray:
+        """Cosine-сходство запроса со всеми центроидами (в порядке self.agents)"""
+        vector = _normalize(np.asarray(self.embedder.embed(query), dtype=np.float32))
+        return self.centroids @ vector
+
+    def rank(self, query: str, limit: Optional[int] = None) -> List[RouteCandidate]:
+        """Агенты по убыванию сходства: RouteCandidate.score - cosine"""
+        similarities = self.similarities(query)
+        order = np.argsort(-similarities, kind="stable")[:limit]
+        return [RouteCandidate(self.agents[row], float(similarities[row]), semantic=float(similarities[row]))
+                for row in order]
+
+
+class HybridRouter:
+    """
+    Ключевые слова + семантика: score = score по ключевым словам + semantic_weight · cosine
+    (cosine ниже min_similarity не учитывается - шум несвязанных агентов)
+
+    Перефразированный запрос без ключевых слов получает уверенность от семантики
+    и не уходит к fallback-агенту; точные ключевые слова по-прежнему доминируют.
+    После ошибки эмбеддинга семантика отключается на failure_cooldown секунд (circuit breaker):
+    недоступный сервер не опрашивается на каждом запросе.
+    """
+
+    def __init__(self, keyword_router: KeywordRouter, semantic_router: SemanticRouter,
+                 semantic_weight: float = 2.0, min_similarity: float = 0.35, failure_cooldown: float = 30.0):
+        self.keyword_router = keyword_router
+        self.semantic_router = semantic_router
+        self.semantic_weight = semantic_weight
+        self.min_similarity = min_similarity
+        self.failure_cooldown = failure_cooldown
+        self._disabled_until = 0.0
+
+    @property
+    def semantic_available(self) -> bool:
+        return time.monotonic() >= self._disabled_until
+
+    @property
+    def fallback_agent(self) -> str:
+        return self.keyword_router.fallback_agent
+
+    @property
+    def min_confidence(self) -> float:
+        return self.keyword_router.min_confidence
+
+    def rank(self, query: str) -> List[RouteCandidate]:
+        candidates = {candidate.agent: candidate for candidate in self.keyword_router.rank(query)}
+        if not self.semantic_available:
+            return list(candidates.values())
+        try:
+            similarities = self.semantic_router.similarities(query)
+        except (OSError, ValueError, KeyError) as e:
+            # Сервер эмбеддингов недоступен или ответил не тем - маршрутизация только по ключевым словам
+            self._disabled_until = time.monotonic() + self.failure_cooldown
+            print(f"⚠️ Семантическая маршрутизация недоступна на {self.failure_cooldown:.0f} с: {e}")
+            return list(candidates.values())
+        for row in np.flatnonzero(similarities >= self.min_similarity):
+            agent = self.semantic_router.agents[row]
+            candidate = candidates.get(agent)
+            if candidate is None:
+                candidate = candidates[agent] = RouteCandidate(agent, 0.0)
+            candidate.semantic = float(similarities[row])
+            candidate.score += self.semantic_weight * candidate.semantic
+        order = self.keyword_router.agent_order
+        return sorted(candidates.values(), key=lambda c: (-c.score, order.get(c.agent, 0)))
+
+    def route(self, query: str) -> RoutingDecision:
+        return self.keyword_router.decide(self.rank(query))
+
+    def top_agents(self, decision: RoutingDecision, limit: int, min_ratio: float = 0.5) -> List[str]:
+        return self.keyword_router.top_agents(decision, limit, min_ratio)
@@ -0,0 +1,192 @@
+"""
+Unit Tests for Checkpointing
+Тестирование продолжения прерванного прогона LangGraph по checkpoint'ам в SQLite
+"""
+
+import asyncio
+import operator
+from types import SimpleNamespace
+from typing import Annotated, TypedDict
+
+import pytest
+
+pytest.importorskip("langgraph.checkpoint.sqlite")
+
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Send
+from checkpointing import open_sqlite_checkpointer
+
+class FanOutState(TypedDict):
+    agents: list[str]
+    responses: Annotated[list[str], operator.add]
+    answer: str
+
+
+class TestSqliteCheckpointer:
+    """Тесты для checkpoint'ов workflow в SQLite"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.calls = []
+        self.failing = set()
+
+    def build(self, path):
+        def call_agent(task):
+            self.calls.append(task["agent"])
+            if task["agent"] in self.failing:
+                raise RuntimeError(f"{task['agent']} недоступен")
+            return {"responses": [task["agent"]]}
+
+        workflow = StateGraph(FanOutState)
+        workflow.add_node("router", lambda state: {})
+        workflow.add_node("agent", call_agent)
+        workflow.add_node("merge", lambda state: {"answer": "+".join(sorted(state["responses"]))})
+        workflow.add_edge(START, "router")
+        workflow.add_conditional_edges(
+            "router", lambda state: [Send("agent", {"agent": agent}) for agent in state["agents"]], ["agent"]
+        )
+        workflow.add_edge("agent", "merge")
+        workflow.add_edge("merge", END)
+        return workflow.compile(checkpointer=open_sqlite_checkpointer(path))
+
+    def test_resume_skips_finished_branches(self, tmp_path):
+        """Тест: после сбоя одной ветки продолжение вызывает только её, ответ остальных берётся из checkpoint'а"""
+        config = {"configurable": {"thread_id": "run-1"}}
+        self.failing = {"designer"}
+        app = self.build(tmp_path / "checkpoints.sqlite")
+        with pytest.raises(RuntimeError):
+            app.invoke({"agents": ["client_developer", "designer"], "responses": []}, config, durability="sync")
+
+        # Новый процесс: checkpoint'ы читаются с диска
+        self.failing = set()
+        self.calls = []
+        app = self.build(tmp_path / "checkpoints.sqlite")
+        state = app.invoke(None, config, durability="sync")
+
+        assert self.calls == ["designer"]
+        assert state["answer"] == "client_developer+designer"
+        assert not app.get_state(config).next
+
+    def test_async_resume(self, tmp_path):
+        """Тест: ainvoke работает с синхронным SqliteSaver через пул потоков"""
+        config = {"configurable": {"thread_id": "run-2"}}
+        self.failing = {"devops"}
+        app = self.build(tmp_path / "checkpoints.sqlite")
+
+        async def run():
+            with pytest.raises(RuntimeError):
+                await app.ainvoke({"agents": ["devops", "devops_lead"], "responses": []}, config, durability="sync")
+            self.failing = set()
+            return await app.ainvoke(None, config, durability="sync")
+
+        state = asyncio.run(run())
+
+        assert sorted(self.calls) == ["devops", "devops", "devops_lead"]
+        assert state["answer"] == "devops+devops_lead"
+
+
+class FakeAgent:
+    """Агент с ответом без LLM; падает, пока его имя в failing"""
+
+    def __init__(self, name: str, calls: list, failing: set):
+        self.name = name
+        self.system_message = f"Ты - {name}"
+        self.calls = calls
+        self.failing = failing
+
+    def generate_reply(self, messages):
+        self.calls.append(self.name)
+        if self.name in self.failing:
+            raise RuntimeError(f"{self.name} недоступен")
+        return {"content": f"ответ {self.name}"}
+
+
+class FakeChatClient:
+    """Стриминг для ainvoke / aresume: агент определяется по системному промпту"""
+
+    def __init__(self, agents: dict):
+        self.agents = agents
+
+    async def stream(self, messages):
+        agent = next(a for a in self.agents.values() if a.system_message == messages[0]["content"])
+        yield agent.generate_reply(messages)["content"]
+
+
+class TestOrchestratorResume:
+    """Тесты для resume / aresume LangGraphOrchestrator"""
+
+    QUERY = "UI для экрана настроек"  # client_developer и designer
+
+    @pytest.fixture(autouse=True)
+    def orchestrator(self, tmp_path, orchestrator_module):
+        """Оркестратор с fan-out на двух агентов и checkpoint'ами в tmp_path"""
+        self.calls, self.failing = [], set()
+        self.orchestrator = orchestrator_module.LangGraphOrchestrator(
+            fan_out=2, session_store_path=None, checkpoint_path=tmp_path / "checkpoints.sqlite"
+        )
+        agents = {
+            name: FakeAgent(name, self.calls, self.failing)
+            for name in ("client_developer", "designer", "cto")
+        }
+        self.orchestrator.autogen_generator = SimpleNamespace(auto_gen_agents=agents)
+        self.orchestrator.chat_client = FakeChatClient(agents)
+        self.orchestrator.compile()
+
+    def crash(self, run_id: str, agent: str) -> None:
+        self.failing.add(agent)
+        with pytest.raises(RuntimeError):
+            self.orchestrator.invoke(self.QUERY, session_id="s1", run_id=run_id)
+        self.failing.clear()
+
+    def test_resume_calls_only_failed_agent(self):
+        """Тест: resume вызывает только упавшего агента, ответ запоминается в сессии, checkpoint'ы удаляются"""
+        self.crash("run-1", "designer")
+        assert sorted(self.calls) == ["client_developer", "designer"]
+
+        result = self.orchestrator.resume("run-1")
+
+        assert sorted(self.calls) == ["client_developer", "designer", "designer"]
+        assert result["selected_agents"] == ["client_developer", "designer"]
+        assert [r["agent"] for r in result["agent_responses"]] == ["client_developer", "designer"]
+        assert self.orchestrator.sessions.history("s1")[-1]["content"] == result["agent_response"]
+        assert "error" in self.orchestrator.resume("run-1")
+
+    def test_aresume_calls_only_failed_agent(self):
+        """Тест: aresume продолжает прогон, прерванный в invoke"""
+        self.crash("run-2", "client_developer")
+        result = asyncio.run(self.orchestrator.aresume("run-2"))
+
+        assert sorted(self.calls) == ["client_developer", "client_developer", "designer"]
+        assert result["agent_response"] == "## client_developer\nответ client_developer\n\n## designer\nответ designer"
+
+    def test_existing_run_id_rejected(self):
+        """Тест: новый запрос с run_id прерванного прогона не смешивается с его состоянием"""
+        self.crash("run-3", "designer")
+        calls = len(self.calls)
+
+        assert "error" in self.orchestrator.invoke(self.QUERY, run_id="run-3")
+        assert "error" in asyncio.run(self.orchestrator.ainvoke(self.QUERY, run_id="run-3"))
+        assert len(self.calls) == calls
+
+    def test_finished_run_is_pruned(self):
+        """Тест: checkpoint'ы завершённого прогона удаляются, run_id можно использовать снова"""
+        first = self.orchestrator.invoke(self.QUERY, run_id="run-4")
+        second = asyncio.run(self.orchestrator.ainvoke(self.QUERY, run_id="run-4"))
+
+        assert self.orchestrator._resume_state("run-4") is None
+        assert first["selected_agents"] == second["selected_agents"] == ["client_developer", "designer"]
+        assert len(second["agent_responses"]) == 2
+
+    def test_without_checkpointer(self):
+        """Тест: без checkpoint'ов workflow работает, resume сообщает об ошибке"""
+        self.orchestrator.checkpoint_path = None
+        self.orchestrator.compile()
+
+        result = self.orchestrator.invoke(self.QUERY, run_id="run-5")
+
+        assert result["selected_agents"] == ["client_developer", "designer"]
+        assert "error" in self.orchestrator.resume("run-5")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
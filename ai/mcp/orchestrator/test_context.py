@@ -0,0 +1,188 @@
+"""
+Unit Tests for Context Assembly
+Тестирование сборки промпта агента в бюджет токенов
+"""
+
+import pytest
+from context import (
+    ContextAssembler, ContextChunk, SessionStore, count_tokens, deduplicate_chunks, truncate_to_tokens,
+    truncating_summarizer,
+)
+
+
+def file_chunk(start: int, end: int, score: float = 0.0, path: str = "Features/Chat/ChatView.swift") -> ContextChunk:
+    """Чанк из строк start..end файла, где строка N - "line N" """
+    content = "\n".join(f"line {n}" for n in range(start, end + 1))
+    return ContextChunk(content, "code", path, start, end, score)
+
+
+class TestTokenEstimate:
+    """Тесты для оценки числа токенов"""
+
+    def test_scripts_and_symbols(self):
+        """Тест: кириллица дороже латиницы, пунктуация и цифры - по токену"""
+        assert count_tokens("") == 0
+        assert count_tokens("view") == 1
+        assert count_tokens("экран") == 2
+        assert count_tokens("a.b(1)") == 6
+        assert count_tokens("struct ChatView: View {}") < count_tokens("struct ChatView: View {}\n" * 2)
+
+    def test_truncate_by_lines(self):
+        """Тест: обрезка по границе строки в пределах бюджета"""
+        text = "\n".join(f"line {n}" for n in range(100))
+        truncated = truncate_to_tokens(text, 20)
+
+        assert count_tokens(truncated) <= 20
+        assert text.startswith(truncated)
+        assert truncate_to_tokens("short", 20) == "short"
+
+
+class TestDeduplication:
+    """Тесты для дедупликации RAG-чанков"""
+
+    def test_overlap_is_trimmed_and_contained_dropped(self):
+        """Тест: перекрытие окон отрезается, чанк внутри уже взятого - отбрасывается"""
+        chunks = deduplicate_chunks([file_chunk(1, 10), file_chunk(8, 18), file_chunk(3, 9)])
+
+        assert [(c.start_line, c.end_line) for c in chunks] == [(1, 10), (11, 18)]
+        assert chunks[1].content.startswith("line 11\n")
+
+    def test_same_text_from_two_sources(self):
+        """Тест: одинаковый текст (с точностью до пробелов) остаётся один раз"""
+        chunks = deduplicate_chunks([
+            ContextChunk("let a = 1\n", "code", "A.swift"),
+            ContextChunk("let  a = 1", "docs", "README.md"),
+        ])
+
+        assert [c.file_path for c in chunks] == ["A.swift"]
+
+
+class TestContextAssembler:
+    """Тесты для ContextAssembler"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.assembler = ContextAssembler(token_budget=200, history_share=0.4)
+        self.history = [
+            {"role": "user" if n % 2 == 0 else "assistant", "content": f"реплика номер {n} " * 5}
+            for n in range(50)
+        ]
+
+    def test_budget_holds_for_long_history(self):
+        """Тест: промпт не растёт с историей - берутся свежие реплики в пределах бюджета"""
+        prompt = self.assembler.assemble("Вопрос", self.history, [file_chunk(1, 5, 0.9)], reserved_tokens=30)
+
+        assert prompt.tokens <= 200
+        assert prompt.messages[-1]["role"] == "user"
+        assert prompt.messages[-1]["content"].endswith("Запрос: Вопрос")
+        assert prompt.messages[-2] == self.history[-1]
+        assert 0 < prompt.history_turns < len(self.history)
+        assert prompt.dropped_turns == len(self.history) - prompt.history_turns
+
+    def test_higher_ranked_chunks_win(self):
+        """Тест: в бюджет попадают чанки с большим score, без истории RAG получает весь бюджет"""
+        chunks = [file_chunk(1, 20, 0.1, "Low.swift"), file_chunk(1, 20, 0.9, "High.swift")]
+        prompt = self.assembler.assemble("Вопрос", [], chunks)
+
+        assert [c.file_path for c in prompt.chunks] == ["High.swift"]
+        assert prompt.dropped_chunks == 1
+        assert prompt.tokens <= 200
+
+    def test_summary_and_turns_survive_long_reply(self):
+        """Тест: длинный последний ответ обрезается, сводка и более ранние реплики остаются в промпте"""
+        assembler = ContextAssembler(token_budget=3000, summary_tokens=100)
+        history = [
+            {"role": "system", "content": "Краткое содержание: обсуждали ChatView"},
+            {"role": "user", "content": "Первый вопрос"},
+            {"role": "assistant", "content": "Первый ответ"},
+            {"role": "user", "content": "Второй вопрос"},
+            {"role": "assistant", "content": "\n".join(f"строка ответа номер {n}" for n in range(2000))},
+        ]
+        prompt = assembler.assemble("Вопрос", history)
+
+        contents = [message["content"] for message in prompt.messages]
+        assert prompt.tokens <= 3000
+        assert contents[0] == history[0]["content"]
+        assert contents[1:4] == ["Первый вопрос", "Первый ответ", "Второй вопрос"]
+        assert contents[4].startswith("строка ответа номер 0\n")
+        assert count_tokens(contents[4]) < count_tokens(history[4]["content"])
+
+    def test_summary_kept_with_full_window(self):
+        """Тест: сводка не вытесняется, даже когда реплики заполняют весь бюджет истории"""
+        history = [{"role": "system", "content": "Краткое содержание: решили перейти на SSE"}, *self.history]
+        prompt = self.assembler.assemble("Вопрос", history)
+
+        assert prompt.messages[0] == history[0]
+        assert prompt.messages[-2] == self.history[-1]
+        assert prompt.tokens <= 200
+
+    def test_query_only(self):
+        """Тест: без истории и контекста сообщение - сам запрос"""
+        prompt = self.assembler.assemble("Привет")
+
+        assert prompt.messages == [{"role": "user", "content": "Привет"}]
+
+
+class TestSessionStore:
+    """Тесты для памяти диалогов"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.calls = []
+
+    def summarizer(self, summary, turns):
+        self.calls.append(len(turns))
+        return f"{summary}+{len(turns)}"
+
+    def add_turns(self, store: SessionStore, session_id: str, count: int) -> None:
+        for n in range(count):
+            store.append(session_id, "user" if n % 2 == 0 else "assistant", f"реплика {n}")
+            store.wait()
+
+    def test_window_stays_constant(self):
+        """Тест: старые реплики сворачиваются в сводку, история не растёт с сессией"""
+        store = SessionStore(window_turns=4, summarize_batch=2, summarizer=self.summarizer)
+        self.add_turns(store, "s1", 100)
+
+        history = store.history("s1")
+        assert len(history) <= 1 + 4 + 2
+        assert history[0]["role"] == "system"
+        assert history[-1]["content"] == "реплика 99"
+        assert sum(self.calls) + len(history) - 1 == 100
+
+    def test_persisted_and_loaded_lazily(self, tmp_path):
+        """Тест: сводка и окно восстанавливаются из SQLite при первом обращении"""
+        store = SessionStore(tmp_path / "sessions.sqlite", window_turns=4, summarize_batch=2,
+                             summarizer=self.summarizer)
+        self.add_turns(store, "s1", 10)
+        expected = store.history("s1")
+        store.close()
+
+        reopened = SessionStore(tmp_path / "sessions.sqlite", window_turns=4, summarize_batch=2)
+        assert len(reopened) == 1
+        assert reopened.history("s1") == expected
+        assert reopened.history("unknown") == []
+
+    def test_failed_summary_keeps_turns(self):
+        """Тест: ошибка сводки не теряет реплики - окно просто остаётся длиннее"""
+        def failing(summary, turns):
+            raise RuntimeError("LM Studio недоступен")
+
+        store = SessionStore(window_turns=2, summarize_batch=1, summarizer=failing)
+        self.add_turns(store, "s1", 5)
+
+        assert [m["content"] for m in store.history("s1")] == [f"реплика {n}" for n in range(5)]
+
+    def test_truncating_summarizer_is_bounded(self):
+        """Тест: сводка без LLM не превышает лимит токенов"""
+        summarize = truncating_summarizer(max_tokens=30)
+        summary = ""
+        for n in range(50):
+            summary = summarize(summary, [{"role": "user", "content": f"вопрос номер {n}\nподробности"}])
+
+        assert count_tokens(summary) <= 30
+        assert "вопрос номер 49" in summary
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,1035 @@
+"""
+Unit Tests for Indexing
+Тестирование компонентов индексации проекта (без Qdrant)
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pytest
+from indexing import (
+    IndexManifest,
+    FileState,
+    chunk_swift,
+    chunk_markdown,
+    EmbeddingEngine,
+    HashingEmbeddingBackend,
+    LMStudioEmbeddingBackend,
+    tokenize,
+    IndexingPipeline,
+    CompletionTracker,
+    EmbeddingCache,
+    PointIdRegistry,
+    PointIdCollisionError,
+    chunk_point_id,
+    relative_source_path,
+    discover_files,
+    read_files,
+    LexicalIndex,
+    reciprocal_rank_fusion,
+    QueryCache,
+    IndexGeneration,
+    normalize_query,
+    LocalVectorStore,
+    SearchFilter,
+    IndexingMetrics,
+    percentile,
+    FileWatcher,
+    InotifyWatcher,
+    PollingWatcher,
+    debounced_changes,
+)
+from indexing.storage import Quantizer, parse_qdrant_url, path_prefixes, quantization_report
+
+
+class TestIndexManifest:
+    """Тесты для IndexManifest"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.collection = "chat_code"
+
+    def _write(self, path, text):
+        path.write_text(text, encoding="utf-8")
+        return path
+
+    def test_new_files_are_added(self, tmp_path):
+        """Тест: файлы, которых нет в манифесте, попадают в added"""
+        manifest = IndexManifest(tmp_path / "manifest.json")
+        file_a = self._write(tmp_path / "A.swift", "struct A {}")
+
+        diff = manifest.diff([file_a], self.collection)
+
+        assert diff.added == [file_a]
+        assert diff.has_changes
+
+    def test_scoped_diff_only_deletes_within_scope(self, tmp_path):
+        """Тест: diff по изменённым путям не считает удалёнными остальные файлы коллекции"""
+        manifest = IndexManifest(tmp_path / "manifest.json")
+        (tmp_path / "Features").mkdir()
+        for name in ("Features/A.swift", "Features/B.swift", "C.swift"):
+            path = self._write(tmp_path / name, name)
+            manifest.record(path, self.collection, [name], FileState.read(path))
+        (tmp_path / "Features/A.swift").unlink()
+        (tmp_path / "Features/B.swift").unlink()
+
+        diff = manifest.diff([], self.collection, scope=[tmp_path / "Features"])
+
+        assert sorted(entry.path for entry in diff.deleted) == [
+            str(tmp_path / "Features/A.swift"), str(tmp_path / "Features/B.swift")
+        ]
+
+    def test_unchanged_files_are_skipped(self, tmp_path):
+        """Тест: файлы без изменений пропускаются после save/load"""
+        manifest = IndexManifest(tmp_path / "manifest.json")
+        file_a = self._write(tmp_path / "A.swift", "struct A {}")
+        manifest.record(file_a, self.collection, [1], FileState.read(file_a))
+        manifest.save()
+
+        reloaded = IndexManifest.load(tmp_path / "manifest.json")
+        diff = reloaded.diff([file_a], self.collection)
+
+        assert diff.unchanged == [file_a]
+        assert not diff.has_changes
+
+    def test_touched_file_with_same_content_is_skipped(self, tmp_path):
+        """Тест: изменение mtime без изменения содержимого не вызывает переиндексацию"""
+        manifest = IndexManifest(tmp_path / "manifest.json")
+        file_a = self._write(tmp_path / "A.swift", "struct A {}")
+        manifest.record(file_a, self.collection, [1], FileState.read(file_a))
+        os.utime(file_a, (1, 1))
+
+        diff = manifest.diff([file_a], self.collection)
+
+        assert diff.unchanged == [file_a]
+        assert manifest.get(file_a).mtime == 1
+
+    def test_modified_and_deleted_files(self, tmp_path):
+        """Тест: изменённые файлы попадают в modified, отсутствующие - в deleted"""
+        manifest = IndexManifest(tmp_path / "manifest.json")
+        file_a = self._write(tmp_path / "A.swift", "struct A {}")
+        file_b = self._write(tmp_path / "B.swift", "struct B {}")
+        manifest.record(file_a, self.collection, [1], FileState.read(file_a))
+        manifest.record(file_b, self.collection, [2], FileState.read(file_b))
+
+        self._write(file_a, "struct A { let value: Int }")
+        diff = manifest.diff([file_a], self.collection)
+
+        assert diff.modified == [file_a]
+        assert [entry.point_ids for entry in diff.deleted] == [[2]]
+
+    def test_other_collection_is_not_deleted(self, tmp_path):
+        """Тест: записи другой коллекции не считаются удалёнными"""
+        manifest = IndexManifest(tmp_path / "manifest.json")
+        readme = self._write(tmp_path / "README.md", "# Chat")
+        manifest.record(readme, "chat_docs", [3], FileState.read(readme))
+
+        diff = manifest.diff([], self.collection)
+
+        assert diff.deleted == []
+
+    def test_corrupted_manifest_loads_empty(self, tmp_path):
+        """Тест: повреждённый манифест приводит к полной индексации"""
+        path = self._write(tmp_path / "manifest.json", "{not json")
+
+        manifest = IndexManifest.load(path)
+
+        assert manifest.entries == {}
+
+
+class TestChunking:
+    """Тесты для чанкинга Swift и Markdown"""
+
+    SWIFT_SOURCE = "\n".join([
+        "import SwiftUI",
+        "",
+        "/// Экран чата",
+        "struct ChatView: View {",
+        "    var body: some View { Text(\"Chat\") }",
+        "}",
+        "",
+        "extension ChatView {",
+        "    func reload() {}",
+        "}",
+    ])
+
+    def test_swift_declarations_become_chunks(self):
+        """Тест: каждое объявление - отдельный чанк, импорты и doc-комментарии в первом"""
+        chunks = chunk_swift(self.SWIFT_SOURCE, "ChatView.swift", max_chars=110)
+
+        assert [chunk.symbol for chunk in chunks] == ["struct ChatView", "extension ChatView"]
+        assert (chunks[0].start_line, chunks[0].end_line) == (1, 7)
+        assert chunks[1].start_line == 8
+        assert "/// Экран чата" in chunks[0].text
+
+    def test_small_declarations_are_merged(self):
+        """Тест: маленькие соседние объявления склеиваются в один чанк"""
+        chunks = chunk_swift(self.SWIFT_SOURCE, "ChatView.swift")
+
+        assert len(chunks) == 1
+        assert (chunks[0].start_line, chunks[0].end_line) == (1, 10)
+
+    def test_large_declaration_is_split_with_overlap(self):
+        """Тест: большое объявление режется на окна с перекрытием и ограниченным размером"""
+        body = ["func long() {"] + [f"    let value{i} = {i}" for i in range(100)] + ["}"]
+        chunks = chunk_swift("\n".join(body), "Long.swift", max_chars=300, overlap_lines=2)
+
+        assert len(chunks) > 1
+        assert all(len(chunk.text) <= 300 for chunk in chunks)
+        assert chunks[1].start_line == chunks[0].end_line - 1
+
+    def test_markdown_heading_path(self):
+        """Тест: Markdown режется по заголовкам, заголовки в code fence игнорируются"""
+        text = "\n".join([
+            "# Guide",
+            "intro",
+            "## Setup",
+            "```",
+            "# not a heading",
+            "```",
+            "## Usage",
+            "text",
+        ])
+        chunks = chunk_markdown(text, "README.md", max_chars=40)
+
+        assert [chunk.symbol for chunk in chunks] == ["Guide", "Guide > Setup", "Guide > Usage"]
+        assert (chunks[1].start_line, chunks[1].end_line) == (3, 6)
+
+
+class TestEmbeddingEngine:
+    """Тесты для EmbeddingEngine и локального hashing-бэкенда"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.backend = HashingEmbeddingBackend(dim=64)
+
+    def test_tokenize_splits_identifiers(self):
+        """Тест: camelCase и snake_case идентификаторы разбиваются на части"""
+        tokens = tokenize("ChatViewModel send_message")
+
+        assert "chatviewmodel" in tokens
+        assert {"chat", "view", "model", "send", "message"} <= set(tokens)
+
+    def test_hashing_backend_is_deterministic(self):
+        """Тест: одинаковый текст даёт одинаковый нормализованный вектор"""
+        first, second = self.backend.embed_batch(["struct ChatView", "struct ChatView"])
+
+        assert first == second
+        assert len(first) == 64
+        assert abs(sum(v * v for v in first) - 1.0) < 1e-9
+
+    def test_batches_respect_token_budget(self):
+        """Тест: батчи группируются по бюджету токенов и размеру"""
+        engine = EmbeddingEngine(self.backend, max_batch_tokens=30, max_batch_size=3)
+        texts = ["x" * 40, "x" * 40, "x" * 40, "y", "y", "y", "y"]
+
+        batches = engine.make_batches(texts)
+
+        assert batches == [[0, 1], [2, 3, 4], [5, 6]]
+
+    def test_executor_follows_backend(self):
+        """Тест: CPU-bound hashing считается в пуле процессов (и одиночный батч), сетевой бэкенд - в потоках"""
+        assert not EmbeddingEngine(LMStudioEmbeddingBackend()).use_processes
+        assert not EmbeddingEngine(self.backend, use_processes=False).use_processes
+        engine = EmbeddingEngine(self.backend, max_workers=2)
+
+        try:
+            vector = engine.embed("struct ChatView")
+            assert isinstance(engine._executor, ProcessPoolExecutor)
+        finally:
+            engine.close()
+        assert vector == self.backend.embed_batch(["struct ChatView"])[0]
+
+    def test_embed_many_preserves_order(self):
+        """Тест: параллельный embed_many возвращает векторы в исходном порядке"""
+        engine = EmbeddingEngine(self.backend, max_batch_size=2, max_workers=4)
+        texts = [f"func handler{i}()" for i in range(9)]
+
+        try:
+            vectors = engine.embed_many(texts)
+        finally:
+            engine.close()
+
+        assert vectors == self.backend.embed_batch(texts)
+
+
+class TestEmbeddingCache:
+    """Тесты для персистентного кэша эмбеддингов"""
+
+    def test_cached_texts_are_not_reembedded(self, tmp_path):
+        """Тест: повторный прогон тех же текстов не вызывает бэкенд"""
+        backend = HashingEmbeddingBackend(dim=16)
+        texts = ["struct A", "struct B", "struct A"]
+
+        engine = EmbeddingEngine(backend, max_workers=1, cache=EmbeddingCache(tmp_path / "cache.sqlite"))
+        first = engine.embed_many(texts)
+        assert engine.backend_calls == 1
+
+        reopened = EmbeddingEngine(backend, max_workers=1, cache=EmbeddingCache(tmp_path / "cache.sqlite"))
+        second = reopened.embed_many(texts)
+
+        assert reopened.backend_calls == 0
+        assert reopened.cache.hits == 3
+        assert [v for vector in second for v in vector] == pytest.approx(
+            [v for vector in first for v in vector], abs=1e-6
+        )
+
+    def test_key_includes_model(self, tmp_path):
+        """Тест: векторы разных моделей не смешиваются"""
+        cache = EmbeddingCache(tmp_path / "cache.sqlite")
+        cache.put_many("model-a", ["text"], [[1.0, 0.0]])
+
+        assert cache.get_many("model-b", ["text"]) == [None]
+        assert cache.get_many("model-a", ["text"]) == [[1.0, 0.0]]
+
+    def test_least_recently_used_entries_are_evicted(self, tmp_path):
+        """Тест: при превышении лимита вытесняются давно не использованные записи"""
+        cache = EmbeddingCache(tmp_path / "cache.sqlite", max_entries=2, evict_fraction=0)
+        cache.put_many("m", ["a"], [[1.0]])
+        cache.put_many("m", ["b"], [[2.0]])
+        cache.get_many("m", ["a"])
+        cache.put_many("m", ["c"], [[3.0]])
+
+        assert len(cache) == 2
+        assert cache.get_many("m", ["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+
+class TestPointIds:
+    """Тесты для стабильных 64-битных ID точек"""
+
+    def test_id_is_stable_and_fits_int64(self):
+        """Тест: ID детерминирован и помещается в signed int64"""
+        point_id = chunk_point_id("chat", "Features/Chat/Views/ChatView.swift", 1, 40)
+
+        assert point_id == chunk_point_id("chat", "Features/Chat/Views/ChatView.swift", 1, 40)
+        assert 0 <= point_id < 2 ** 63
+
+    def test_id_depends_on_repository_and_range(self):
+        """Тест: ID различается для разных репозиториев и диапазонов строк"""
+        ids = {
+            chunk_point_id("chat", "A.swift", 1, 40),
+            chunk_point_id("chat", "A.swift", 38, 80),
+            chunk_point_id("server", "A.swift", 1, 40),
+        }
+
+        assert len(ids) == 3
+
+    def test_relative_path_does_not_depend_on_checkout(self, tmp_path):
+        """Тест: путь в ID считается относительно корня репозитория"""
+        file_path = tmp_path / "Features" / "A.swift"
+
+        assert relative_source_path(file_path, tmp_path) == "Features/A.swift"
+
+    def test_collision_is_detected(self):
+        """Тест: одинаковый ID для разных чанков - ошибка"""
+        registry = PointIdRegistry()
+        registry.register(42, "A.swift:1-10")
+        registry.register(42, "A.swift:1-10")
+
+        with pytest.raises(PointIdCollisionError):
+            registry.register(42, "B.swift:1-10")
+
+
+class TestDiscovery:
+    """Тесты для обхода проекта и параллельного чтения"""
+
+    def _touch(self, root, rel_path, text="// swift"):
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+        return path
+
+    def test_build_dirs_and_gitignore_are_skipped(self, tmp_path):
+        """Тест: build-директории, скрытые директории и .gitignore исключаются одним обходом"""
+        self._touch(tmp_path, ".gitignore", "Generated/\n*.generated.swift\n!Keep.generated.swift\n")
+        keep = self._touch(tmp_path, "Features/ChatView.swift")
+        keep_negated = self._touch(tmp_path, "Features/Keep.generated.swift")
+        readme = self._touch(tmp_path, "README.md", "# Chat")
+        for rel_path in [
+            "DerivedData/Build/Intermediates/A.swift",
+            "Pods/Alamofire/Source/B.swift",
+            ".build/checkouts/C.swift",
+            "Generated/D.swift",
+            "Features/E.generated.swift",
+        ]:
+            self._touch(tmp_path, rel_path)
+
+        found = discover_files(tmp_path, [".swift", ".md"])
+
+        assert found[".swift"] == [keep, keep_negated]
+        assert found[".md"] == [readme]
+
+    def test_nested_gitignore_is_scoped(self, tmp_path):
+        """Тест: вложенный .gitignore действует только внутри своей директории"""
+        self._touch(tmp_path, "Docs/.gitignore", "/draft.md\n")
+        self._touch(tmp_path, "Docs/draft.md")
+        root_draft = self._touch(tmp_path, "draft.md")
+
+        found = discover_files(tmp_path, [".md"])
+
+        assert found[".md"] == [root_draft]
+
+    def test_subtree_uses_root_gitignore(self, tmp_path):
+        """Тест: обход новой поддиректории применяет .gitignore корня и промежуточных директорий"""
+        self._touch(tmp_path, ".gitignore", "*.generated.swift\nFeatures/Generated/\n")
+        self._touch(tmp_path, "Features/.gitignore", "/Drafts/\n")
+        keep = self._touch(tmp_path, "Features/Chat/ChatView.swift")
+        self._touch(tmp_path, "Features/Chat/ChatView.generated.swift")
+        self._touch(tmp_path, "Features/Generated/Model.swift")
+        self._touch(tmp_path, "Features/Drafts/Draft.swift")
+
+        assert discover_files(tmp_path / "Features/Chat", [".swift"], base=tmp_path)[".swift"] == [keep]
+        assert discover_files(tmp_path / "Features/Generated", [".swift"], base=tmp_path)[".swift"] == []
+        assert discover_files(tmp_path / "Features/Drafts", [".swift"], base=tmp_path)[".swift"] == []
+
+    def test_read_files_preserves_order_and_reports_errors(self, tmp_path):
+        """Тест: параллельное чтение сохраняет порядок и не падает на ошибках"""
+        paths = [self._touch(tmp_path, f"F{i}.swift", f"struct F{i} {{}}") for i in range(5)]
+        paths.insert(2, tmp_path / "missing.swift")
+
+        sources = list(read_files(paths, max_workers=3, max_in_flight=2))
+
+        assert [source.path for source in sources] == paths
+        assert sources[2].error is not None
+        assert sources[0].content == "struct F0 {}"
+
+
+class TestLexicalIndex:
+    """Тесты для BM25-индекса и слияния рангов"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.index = LexicalIndex()
+        self.index.add(1, "final class ChatViewModel: ObservableObject", {"file_path": "ChatViewModel.swift"})
+        self.index.add(2, "struct ChatView: View { let viewModel: ChatViewModel }", {"file_path": "ChatView.swift"})
+        self.index.add(3, "struct SettingsView: View {}", {"file_path": "SettingsView.swift"})
+
+    def test_exact_identifier_ranks_first(self):
+        """Тест: точное имя типа находит объявление и использования"""
+        results = self.index.search("ChatViewModel", top_k=2)
+
+        assert {doc_id for doc_id, _ in results} == {1, 2}
+        assert self.index.payloads[1] == {"file_path": "ChatViewModel.swift"}
+
+    def test_remove_and_replace_documents(self):
+        """Тест: удалённые и заменённые документы не находятся по старому тексту"""
+        self.index.remove([1])
+        self.index.add(2, "struct HistoryView: View {}", {})
+
+        assert self.index.search("ObservableObject") == []
+        assert self.index.search("HistoryView")[0][0] == 2
+        assert 1 not in {doc_id for doc_id, _ in self.index.search("ChatViewModel")}
+        assert len(self.index) == 2
+
+    def test_long_postings_use_top_impacts(self):
+        """Тест: длинные posting-листы ранжируются так же при ограниченном сканировании"""
+        index = LexicalIndex(max_posting_scan=2)
+        for i in range(10):
+            index.add(i, "view " * (i % 3 + 1) + "filler " * i, {})
+
+        full = LexicalIndex(max_posting_scan=1000)
+        for i in range(10):
+            full.add(i, "view " * (i % 3 + 1) + "filler " * i, {})
+
+        assert index.search("view", top_k=2) == full.search("view", top_k=2)
+
+    def test_save_and_load(self, tmp_path):
+        """Тест: индекс сохраняется и загружается с диска"""
+        self.index.path = tmp_path / "lexical.pkl"
+        self.index.save()
+
+        loaded = LexicalIndex.load(tmp_path / "lexical.pkl")
+
+        assert loaded.search("SettingsView") == self.index.search("SettingsView")
+
+    def test_search_with_payload_filter(self):
+        """Тест: фильтр по директории отсекает документы вне неё"""
+        self.index.add(4, "struct ChatViewModelTests", {"path_prefixes": ["Tests"]})
+        self.index.add(5, "extension ChatViewModel", {"path_prefixes": ["Features", "Features/Chat"]})
+
+        results = self.index.search("ChatViewModel", top_k=5, query_filter=SearchFilter.build(directory="Features/"))
+
+        assert [doc_id for doc_id, _ in results] == [5]
+
+    def test_reciprocal_rank_fusion(self):
+        """Тест: документ из обоих рангов поднимается выше"""
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c"]])
+
+        assert [doc_id for doc_id, _ in fused] == ["b", "c", "a"]
+
+
+class TestQueryCache:
+    """Тесты для кэша результатов поиска"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.now = 0.0
+        self.cache = QueryCache(max_entries=2, ttl=10.0, clock=lambda: self.now)
+
+    def test_normalized_query_hits(self):
+        """Тест: запросы, отличающиеся только пробелами, дают один ключ"""
+        self.cache.put(QueryCache.make_key("chat_code", "ChatView  body", 5, "hybrid"), ["result"])
+
+        assert self.cache.get(QueryCache.make_key("chat_code", " ChatView body ", 5, "hybrid")) == ["result"]
+        assert self.cache.get(QueryCache.make_key("chat_code", "ChatView body", 3, "hybrid")) is None
+        assert (self.cache.hits, self.cache.misses) == (1, 1)
+        assert normalize_query("ChatView\n\tbody") == "ChatView body"
+
+    def test_ttl_expiry(self):
+        """Тест: запись истекает через ttl секунд"""
+        self.cache.put("key", "value")
+        self.now = 9.0
+        assert self.cache.get("key") == "value"
+
+        self.now = 10.5
+        assert self.cache.get("key") is None
+
+    def test_lru_eviction(self):
+        """Тест: при переполнении вытесняется давно не использованная запись"""
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+        self.cache.get("a")
+        self.cache.put("c", 3)
+
+        assert self.cache.get("b") is None
+        assert self.cache.get("a") == 1
+        assert self.cache.get("c") == 3
+
+    def test_generation_bump_invalidates(self, tmp_path):
+        """Тест: смена поколения индекса (в том числе из другого процесса) очищает кэш"""
+        generation = IndexGeneration(tmp_path / "generation")
+        self.cache.put("key", "value", generation.value)
+        assert self.cache.get("key", generation.value) == "value"
+
+        # Другой экземпляр - как CLI индексации в отдельном процессе
+        IndexGeneration(tmp_path / "generation").bump()
+
+        assert generation.value == 1
+        assert self.cache.get("key", generation.value) is None
+        assert len(self.cache) == 0
+
+    def test_lexical_index_reloads_on_generation(self, tmp_path, monkeypatch):
+        """Тест: BM25-индекс процесса поиска перезагружается после переиндексации другим процессом"""
+        import index_to_qdrant
+        monkeypatch.setattr(index_to_qdrant, "INDEX_STATE_PATH", tmp_path)
+        monkeypatch.setattr(index_to_qdrant, "GENERATION_PATH", tmp_path / "generation")
+        indexer = index_to_qdrant.QdrantIndexer(
+            embedding_cache_path=None, store=LocalVectorStore(tmp_path / "vectors")
+        )
+        assert len(indexer._lexical_index("chat_code")) == 0
+
+        # CLI индексации: новый индекс на диске и новое поколение
+        lexical = LexicalIndex(tmp_path / "lexical_chat_code.pkl")
+        lexical.add(1, "struct ChatView: View {}", {"file_path": "ChatView.swift"})
+        lexical.save()
+        assert len(indexer._lexical_index("chat_code")) == 0
+        IndexGeneration(tmp_path / "generation").bump()
+
+        assert indexer._lexical_index("chat_code").search("ChatView")[0][0] == 1
+
+
+class TestLocalVectorStore:
+    """Тесты для встроенного хранилища векторов"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.backend = HashingEmbeddingBackend(dim=32)
+        self.texts = [
+            "final class ChatViewModel: ObservableObject",
+            "struct SettingsView: View",
+            "func sendMessage(_ text: String) async throws",
+            "enum NetworkError: Error",
+        ]
+        self.points = [
+            (i + 1, vector, {"text": text})
+            for i, (text, vector) in enumerate(zip(self.texts, self.backend.embed_batch(self.texts)))
+        ]
+
+    def test_search_returns_nearest(self, tmp_path):
+        """Тест: точка с тем же вектором находится первой, payload возвращается"""
+        store = LocalVectorStore(tmp_path)
+        store.create_collection("code", 32)
+        store.upsert("code", self.points)
+
+        hits = store.search("code", self.points[2][1], 2)
+
+        assert hits[0].id == 3
+        assert hits[0].score == pytest.approx(1.0, abs=1e-5)
+        assert hits[0].payload == {"text": self.texts[2]}
+        assert len(hits) == 2
+
+    def test_delete_keeps_matrix_dense(self, tmp_path):
+        """Тест: после удаления последняя строка переносится, ID не путаются"""
+        store = LocalVectorStore(tmp_path)
+        store.create_collection("code", 32)
+        store.upsert("code", self.points)
+
+        store.delete("code", [1, 42])
+
+        assert store.count("code") == 3
+        assert store.search("code", self.points[3][1], 1)[0].id == 4
+        assert store.retrieve("code", [1, 4]) == {4: {"text": self.texts[3]}}
+
+    def test_persisted_and_reopened(self, tmp_path):
+        """Тест: коллекция float16 переживает переоткрытие и рост матрицы"""
+        store = LocalVectorStore(tmp_path, dtype="float16")
+        store.create_collection("code", 32)
+        many = [(100 + i, self.backend.embed_batch([f"symbol{i}"])[0], {"i": i}) for i in range(1500)]
+        store.upsert("code", self.points + many)
+        store.close()
+
+        reopened = LocalVectorStore(tmp_path)
+
+        assert reopened.collection_exists("code")
+        assert reopened.count("code") == 1504
+        assert reopened.info("code")["dtype"] == "float16"
+        assert reopened.search("code", self.points[1][1], 1)[0].id == 2
+
+    def test_ivf_index_matches_exact_search(self, tmp_path):
+        """Тест: IVF-индекс строится после индексации и находит точное совпадение"""
+        store = LocalVectorStore(tmp_path, index="ivf", index_min_points=100)
+        store.create_collection("code", 32)
+        many = [(i, self.backend.embed_batch([f"symbol{i} value{i % 7}"])[0], {}) for i in range(400)]
+        store.upsert("code", many)
+        store.optimize("code")
+
+        assert store.info("code")["index"] == "ivf"
+        for _, vector, _ in many[:20]:
+            assert store.search("code", vector, 1)[0].score == pytest.approx(1.0, abs=1e-5)
+
+        # Запись делает индекс устаревшим - до перестроения поиск точный
+        store.delete("code", [0])
+        assert store.info("code")["index"] is None
+
+    def test_search_filter_normalization(self):
+        """Тест: фильтр нормализует директорию и регистр, пустой фильтр - None"""
+        search_filter = SearchFilter.build(directory="./Features/Chat/", language=["Swift"])
+
+        assert path_prefixes("Features/Chat/ChatView.swift") == ["Features", "Features/Chat"]
+        assert search_filter.conditions() == [("path_prefixes", ("Features/Chat",)), ("language", ("swift",))]
+        assert search_filter.matches({"path_prefixes": ["Features", "Features/Chat"], "language": "swift"})
+        assert not search_filter.matches({"path_prefixes": ["Features"], "language": "swift"})
+        assert SearchFilter.build() is None
+
+    @pytest.mark.parametrize("quantization", [None, "int8"])
+    def test_filtered_search_uses_payload_index(self, tmp_path, quantization):
+        """Тест: поиск с фильтром возвращает только подходящие точки, индекс переживает запись и удаление"""
+        store = LocalVectorStore(tmp_path, quantization=quantization)
+        store.create_collection("code", 32)
+        store.upsert("code", [
+            (point_id, vector, {**payload, "language": "swift" if point_id % 2 else "markdown"})
+            for point_id, vector, payload in self.points
+        ])
+        store.create_payload_index("code", "language")
+        store.create_payload_index("code", "language")
+
+        swift = SearchFilter.build(language="swift")
+        hits = store.search("code", self.points[1][1], 4, swift)
+        assert {hit.id for hit in hits} == {1, 3}
+
+        store.delete("code", [1])
+        store.upsert("code", [(2, self.points[1][1], {"language": "swift"})])
+        hits = store.search("code", self.points[1][1], 4, swift)
+        assert [hit.id for hit in hits][0] == 2
+        assert {hit.id for hit in hits} == {2, 3}
+        assert store.info("code")["payload_indexes"] == ["language"]
+
+        # Поле без индекса фильтруется по payload
+        assert [hit.id for hit in store.search("code", self.points[0][1], 4, SearchFilter(type=("code",)))] == []
+
+    def test_large_filters_respect_sqlite_variable_limit(self, tmp_path):
+        """Тест: фильтр по тысячам директорий и retrieve тысяч точек не упираются в лимит переменных SQLite"""
+        store = LocalVectorStore(tmp_path)
+        store.create_collection("code", 32)
+        store.create_payload_index("code", "path_prefixes")
+        vectors = np.random.default_rng(2).normal(size=(1500, 32))
+        store.upsert("code", [(i, vector, {"path_prefixes": [f"Module{i}"], "language": "swift"})
+                              for i, vector in enumerate(vectors)])
+        store._collection("code")._conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+
+        directories = [f"Module{i}" for i in range(1500)]
+        hits = store.search("code", vectors[7], 3, SearchFilter.build(directory=directories, language="swift"))
+
+        assert hits[0].id == 7
+        assert len(store.retrieve("code", list(range(1500)))) == 1500
+
+    @pytest.mark.parametrize("dtype", ["float32", "float16"])
+    def test_search_batch_matches_single_queries(self, tmp_path, dtype):
+        """Тест: batch-поиск (одно матричное произведение) совпадает с поиском по одному запросу"""
+        store = LocalVectorStore(tmp_path, dtype=dtype)
+        store.create_collection("code", 32)
+        store.upsert("code", [(point_id, vector, {"language": "swift" if point_id > 2 else "markdown"})
+                              for point_id, vector, _ in self.points])
+        queries = [vector for _, vector, _ in self.points]
+        filters = [None, None, SearchFilter.build(language="swift"), None]
+
+        batch = store.search_batch("code", queries, 3, filters)
+
+        assert len(batch) == 4
+        for hits, vector, query_filter in zip(batch, queries, filters):
+            single = store.search("code", vector, 3, query_filter)
+            assert [(hit.id, hit.payload) for hit in hits] == [(hit.id, hit.payload) for hit in single]
+            assert [hit.score for hit in hits] == pytest.approx([hit.score for hit in single], abs=1e-3)
+        assert {hit.id for hit in batch[2]} == {3, 4}
+        assert store.search_batch("code", [], 3) == []
+
+    def test_parse_qdrant_url(self):
+        """Тест: адрес со схемой больше не ломает разбор host:port"""
+        assert parse_qdrant_url("http://localhost:6333") == {"url": "http://localhost:6333"}
+        assert parse_qdrant_url("localhost:6333") == {"url": "http://localhost:6333"}
+        assert parse_qdrant_url(":memory:") == {"location": ":memory:"}
+
+
+class TestQuantization:
+    """Тесты для квантования векторов"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        backend = HashingEmbeddingBackend(dim=64)
+        self.vectors = backend.embed_batch([f"func handler{i}(value: Int) token{i % 13}" for i in range(300)])
+
+    def test_report_memory_and_recall(self):
+        """Тест: int8 сжимает в 4 раза без потери recall, binary - в 32 раза"""
+        matrix = np.asarray(self.vectors, dtype=np.float32)
+        report = {row["quantization"]: row for row in quantization_report(matrix, matrix[:30], top_k=5)}
+
+        assert report["none"]["recall_at_k"] == 1.0
+        assert report["int8"]["compression"] == 4.0
+        assert report["int8"]["recall_at_k"] >= 0.98
+        assert report["binary"]["compression"] == 32.0
+
+    def test_indexer_report_holds_out_queries(self, tmp_path, monkeypatch):
+        """Тест: запросы отчёта исключаются из поиска, --oversampling попадает в отчёт"""
+        import index_to_qdrant
+        monkeypatch.setattr(index_to_qdrant, "GENERATION_PATH", tmp_path / "generation")
+        store = LocalVectorStore(tmp_path / "vectors")
+        store.create_collection("chat_code", 64)
+        vectors = np.random.default_rng(1).normal(size=(300, 64))
+        store.upsert("chat_code", [(i, vector, {}) for i, vector in enumerate(vectors)])
+        indexer = index_to_qdrant.QdrantIndexer(embedding_cache_path=None, store=store)
+        searched = []
+        monkeypatch.setattr(index_to_qdrant, "quantization_report",
+                            lambda matrix, queries, **kwargs: searched.append((matrix, queries, kwargs)) or [])
+
+        indexer.quantization_report("chat_code", sample=50, oversampling=3.0)
+
+        matrix, queries, kwargs = searched[0]
+        assert (len(matrix), len(queries)) == (250, 50)
+        # Ни один запрос не совпадает с вектором, по которому идёт поиск
+        assert np.max(queries @ matrix.T) < 1 - 1e-6
+        assert kwargs["oversampling"] == {"int8": 3.0, "binary": 3.0}
+
+    def test_qdrant_store_report(self, tmp_path, monkeypatch):
+        """Тест: отчёт квантования работает и для QdrantStore - векторы выгружаются scroll'ом постранично"""
+        pytest.importorskip("qdrant_client")
+        import index_to_qdrant
+        monkeypatch.setattr(index_to_qdrant, "GENERATION_PATH", tmp_path / "generation")
+        store = index_to_qdrant.QdrantStore(":memory:")
+        store.create_collection("chat_code", 64)
+        store.upsert("chat_code", [(i, vector, {}) for i, vector in enumerate(self.vectors * 5)])
+        indexer = index_to_qdrant.QdrantIndexer(embedding_cache_path=None, store=store)
+
+        report = {row["quantization"]: row for row in indexer.quantization_report("chat_code", sample=30, top_k=5)}
+
+        assert len(store.vectors("chat_code")) == 1500
+        assert set(report) == {"none", "int8", "binary"}
+        with pytest.raises(TypeError):
+            Quantizer(64)
+
+    @pytest.mark.parametrize("quantization", ["int8", "binary"])
+    def test_local_store_rescoring(self, tmp_path, quantization):
+        """Тест: поиск по кодам с rescoring находит точное совпадение, коды пересчитываются после переоткрытия"""
+        store = LocalVectorStore(tmp_path, quantization=quantization)
+        store.create_collection("code", 64)
+        store.upsert("code", [(i, vector, {}) for i, vector in enumerate(self.vectors)])
+        store.delete("code", [0])
+        store.close()
+
+        reopened = LocalVectorStore(tmp_path)
+        info = reopened.info("code")
+
+        assert info["quantization"] == quantization
+        assert info["ram_bytes"] * 4 <= info["vectors_bytes"]
+        hit = reopened.search("code", self.vectors[42], 1)[0]
+        assert hit.score == pytest.approx(1.0, abs=1e-5)
+
+    def test_reopen_applies_requested_settings(self, tmp_path, capsys):
+        """Тест: квантование и ANN-индекс, заданные при открытии, применяются к существующей коллекции"""
+        store = LocalVectorStore(tmp_path)
+        store.create_collection("code", 64)
+        store.upsert("code", [(i, vector, {}) for i, vector in enumerate(self.vectors)])
+        store.close()
+
+        reopened = LocalVectorStore(tmp_path, dtype="float16", index="ivf", quantization="int8")
+        info = reopened.info("code")
+        reopened.close()
+
+        assert info["quantization"] == "int8"
+        assert info["dtype"] == "float32"
+        assert "float16 требует переиндексации" in capsys.readouterr().out
+        assert LocalVectorStore(tmp_path).info("code")["quantization"] == "int8"
+
+    def test_int8_range_tracks_later_batches(self, tmp_path):
+        """Тест: батч вне диапазона первого не обрезается - диапазон расширяется, коды пересчитываются"""
+        store = LocalVectorStore(tmp_path, quantization="int8")
+        store.create_collection("code", 64)
+        store.upsert("code", [(i, vector, {}) for i, vector in enumerate(self.vectors)])
+        collection = store._collection("code")
+        alpha = collection._quantizer.alpha
+
+        spiky = np.zeros((4, 64), dtype=np.float32)
+        spiky[np.arange(4), np.arange(4)] = 1.0
+        store.upsert("code", [(1000 + i, vector, {}) for i, vector in enumerate(spiky)])
+
+        assert collection._quantizer.alpha > alpha
+        approx = collection._quantizer.scores(collection._codes[:collection.count], spiky[0])
+        assert approx[collection._id_to_row[1000]] == pytest.approx(1.0, abs=0.02)
+        assert approx[collection._id_to_row[0]] == pytest.approx(float(np.dot(self.vectors[0], spiky[0])), abs=0.02)
+
+
+class TestIndexingMetrics:
+    """Тесты для метрик индексации"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.now = 0.0
+        self.metrics = IndexingMetrics(clock=lambda: self.now)
+
+    def test_percentiles_and_throughput(self):
+        """Тест: перцентили латентности и пропускная способность по счётчикам"""
+        for ms in range(1, 101):
+            self.metrics.observe("embed_batch", ms / 1000)
+        self.metrics.count("files_indexed", 20)
+        self.metrics.count("bytes_read", 2 * 1024 * 1024)
+        self.now = 2.0
+
+        report = self.metrics.report()
+
+        assert report["latencies"]["embed_batch"]["p50_ms"] == pytest.approx(50)
+        assert report["latencies"]["embed_batch"]["p99_ms"] == pytest.approx(99)
+        assert report["throughput"]["files_per_s"] == pytest.approx(10)
+        assert report["throughput"]["mb_per_s"] == pytest.approx(1)
+        assert percentile([], 90) == 0.0
+
+    def test_stage_timing_and_prometheus(self):
+        """Тест: стадии суммируются, текст Prometheus содержит счётчики и summary"""
+        with self.metrics.stage("discovery"):
+            self.now += 0.5
+        with self.metrics.timed("upsert_batch"):
+            self.now += 0.25
+        self.metrics.count("chunks", 7)
+
+        text = self.metrics.to_prometheus()
+
+        assert self.metrics.stages["discovery"] == pytest.approx(0.5)
+        assert "# TYPE chat_indexer_chunks_total counter" in text
+        assert "chat_indexer_chunks_total 7" in text
+        assert 'chat_indexer_stage_seconds{stage="discovery"} 0.5' in text
+        assert 'chat_indexer_upsert_batch_seconds{quantile="0.5"} 0.25' in text
+        assert "chat_indexer_upsert_batch_seconds_count 1" in text
+
+
+class TestWatcher:
+    """Тесты для отслеживания изменений файлов"""
+
+    class FakeWatcher(FileWatcher):
+        """Источник событий по расписанию: [(задержка, {пути})]"""
+
+        def __init__(self, schedule):
+            super().__init__(".", [".swift"])
+            self.schedule = list(schedule)
+
+        def poll(self, timeout):
+            if not self.schedule:
+                time.sleep(min(timeout or 0.05, 0.05))
+                return set()
+            delay, paths = self.schedule[0]
+            if timeout is not None and delay > timeout:
+                time.sleep(timeout)
+                self.schedule[0] = (delay - timeout, paths)
+                return set()
+            time.sleep(delay)
+            self.schedule.pop(0)
+            return paths
+
+    def test_burst_is_coalesced(self):
+        """Тест: пачка событий отдаётся одним набором после паузы debounce"""
+        watcher = self.FakeWatcher([(0, {"A.swift"}), (0.01, {"B.swift"}), (0.01, {"A.swift"}), (0.3, {"C.swift"})])
+
+        batches = debounced_changes(watcher, debounce=0.1, max_delay=5.0)
+
+        assert next(batches) == {"A.swift", "B.swift"}
+        assert next(batches) == {"C.swift"}
+
+    def test_continuous_writes_flush_by_max_delay(self):
+        """Тест: непрерывный поток событий не откладывает индексацию дольше max_delay"""
+        watcher = self.FakeWatcher([(0.02, {f"F{i}.swift"}) for i in range(50)])
+
+        started = time.monotonic()
+        batch = next(debounced_changes(watcher, debounce=0.1, max_delay=0.2))
+
+        assert time.monotonic() - started < 0.5
+        assert 0 < len(batch) < 50
+
+    def test_polling_detects_changes(self, tmp_path):
+        """Тест: опрос находит созданные, изменённые и удалённые файлы нужных расширений"""
+        (tmp_path / "A.swift").write_text("struct A {}")
+        (tmp_path / "B.swift").write_text("struct B {}")
+        watcher = PollingWatcher(tmp_path, [".swift"], interval=0)
+
+        (tmp_path / "A.swift").write_text("struct A { let x = 1 }")
+        (tmp_path / "B.swift").unlink()
+        (tmp_path / "C.swift").write_text("struct C {}")
+        (tmp_path / "notes.txt").write_text("ignored")
+
+        assert watcher.poll(1.0) == {tmp_path / "A.swift", tmp_path / "B.swift", tmp_path / "C.swift"}
+
+    def test_watch_survives_failed_batch_and_resets_overflow(self, tmp_path, monkeypatch):
+        """Тест: ошибка пачки не останавливает демон (пути повторяются), после полного прохода overflow сброшен"""
+        import index_to_qdrant
+        watcher = self.FakeWatcher([(0, {tmp_path / "A.swift"}), (0.2, {tmp_path / "B.swift"}),
+                                    (0.2, {tmp_path / "C.swift"}), (0.2, {tmp_path / "D.swift"})])
+        stop = threading.Event()
+        batches = []
+
+        def index_changed_paths(paths, manifest, project_path):
+            batches.append(set(paths))
+            if len(batches) == 1:
+                raise OSError("хранилище недоступно")
+            if len(batches) == 2:
+                watcher.overflowed = True
+            if len(batches) == 4:
+                stop.set()
+            return {"added": 0, "updated": 0, "deleted": 0}
+
+        indexer = index_to_qdrant.QdrantIndexer(
+            embedding_cache_path=None, store=LocalVectorStore(tmp_path / "vectors")
+        )
+        monkeypatch.setattr(indexer, "run_incremental_indexation", lambda *args: None)
+        monkeypatch.setattr(indexer, "index_changed_paths", index_changed_paths)
+        monkeypatch.setattr(index_to_qdrant, "create_watcher", lambda *args: watcher)
+
+        indexer.watch(tmp_path, tmp_path / "manifest.json", debounce=0.05, stop_event=stop)
+
+        assert batches == [{tmp_path / "A.swift"}, {tmp_path / "A.swift", tmp_path / "B.swift"},
+                           {tmp_path}, {tmp_path / "D.swift"}]
+        assert not watcher.overflowed
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify есть только в Linux")
+    def test_inotify_reports_new_directories(self, tmp_path):
+        """Тест: inotify сообщает об изменениях и подхватывает новые директории, игнорируя build/"""
+        watcher = InotifyWatcher(tmp_path, [".swift"])
+        try:
+            (tmp_path / "Features").mkdir()
+            assert watcher.poll(1.0) == {tmp_path / "Features"}
+
+            (tmp_path / "Features/A.swift").write_text("struct A {}")
+            (tmp_path / "build").mkdir()
+            (tmp_path / "build/Gen.swift").write_text("struct Gen {}")
+
+            assert watcher.poll(1.0) == {tmp_path / "Features/A.swift"}
+        finally:
+            watcher.close()
+
+
+class TestIndexingPipeline:
+    """Тесты для потокового конвейера индексации"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.engine = EmbeddingEngine(HashingEmbeddingBackend(dim=16), max_workers=1)
+        self.items = [(i, f"chunk {i}", {"file_path": f"F{i // 3}.swift"}) for i in range(10)]
+
+    def test_items_are_upserted_in_fixed_batches(self):
+        """Тест: точки загружаются батчами фиксированного размера в исходном порядке"""
+        upserted = []
+        pipeline = IndexingPipeline(self.engine, upserted.append, batch_size=4, max_pending_batches=2)
+
+        stats = pipeline.run(iter(self.items))
+
+        assert [len(batch) for batch in upserted] == [4, 4, 2]
+        assert [point_id for batch in upserted for point_id, _, _ in batch] == list(range(10))
+        assert stats.points == 10
+
+    def test_batch_latencies_are_recorded(self):
+        """Тест: конвейер пишет латентности эмбеддинга и upsert в метрики"""
+        metrics = IndexingMetrics()
+        pipeline = IndexingPipeline(self.engine, lambda batch: None, batch_size=4, metrics=metrics)
+
+        pipeline.run(self.items)
+
+        assert metrics.latency_summary("embed_batch")["count"] == 3
+        assert metrics.latency_summary("upsert_batch")["count"] == 3
+        assert metrics.counters["embedded_texts"] == 10
+
+    def test_failed_batch_is_retried(self):
+        """Тест: батч повторяется при временной ошибке upsert"""
+        calls = []
+
+        def flaky_upsert(batch):
+            calls.append(batch)
+            if len(calls) == 1:
+                raise ConnectionError("Qdrant недоступен")
+
+        pipeline = IndexingPipeline(self.engine, flaky_upsert, batch_size=10, retry_delay=0)
+        stats = pipeline.run(self.items)
+
+        assert stats.retries == 1
+        assert stats.points == 10
+        assert stats.failed_batches == 0
+
+    def test_failed_batch_does_not_stop_pipeline(self):
+        """Тест: окончательно упавший батч не теряет остальные"""
+        def upsert(batch):
+            if batch[0][0] == 0:
+                raise ConnectionError("Qdrant недоступен")
+
+        pipeline = IndexingPipeline(self.engine, upsert, batch_size=5, max_retries=2, retry_delay=0)
+        stats = pipeline.run(self.items)
+
+        assert stats.failed_points == 5
+        assert stats.points == 5
+
+    def test_file_edited_during_indexing_stays_modified(self, tmp_path, monkeypatch):
+        """Тест: правка файла между чтением и upsert не помечает его проиндексированным с новым хешем"""
+        import index_to_qdrant
+        monkeypatch.setattr(index_to_qdrant, "INDEX_STATE_PATH", tmp_path)
+        monkeypatch.setattr(index_to_qdrant, "GENERATION_PATH", tmp_path / "generation")
+        store = LocalVectorStore(tmp_path / "vectors")
+        indexer = index_to_qdrant.QdrantIndexer(embedding_cache_path=None, store=store)
+        indexer._create_collections()
+        source = tmp_path / "ChatView.swift"
+        source.write_text("struct ChatView: View {}", encoding="utf-8")
+        read_state = FileState.read(source)
+        upsert = store.upsert
+
+        def upsert_after_edit(collection, points):
+            source.write_text("struct ChatView: View { let title: String }", encoding="utf-8")
+            upsert(collection, points)
+
+        monkeypatch.setattr(store, "upsert", upsert_after_edit)
+        manifest = IndexManifest(tmp_path / "manifest.json")
+
+        indexer._index_files([source], "chat_code", manifest)
+
+        assert manifest.get(source).content_hash == read_state.content_hash
+        assert manifest.diff([source], "chat_code").modified == [source]
+
+    def test_completion_tracker_reports_finished_files(self):
+        """Тест: файл завершён только после подтверждения всех его точек"""
+        tracker = CompletionTracker()
+        tracker.expect("A.swift", [1, 2])
+        tracker.expect("B.swift", [3])
+
+        assert tracker.ack([1, 3]) == [("B.swift", [3], None)]
+        assert tracker.pending() == ["A.swift"]
+        assert tracker.ack([2]) == [("A.swift", [1, 2], None)]
+        assert tracker.expect("Empty.swift", []) is True
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
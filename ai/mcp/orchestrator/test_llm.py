@@ -0,0 +1,79 @@
+"""
+Unit Tests for LLM Client
+Тестирование стримингового клиента LM Studio (без сервера: httpx.MockTransport)
+"""
+
+import asyncio
+import json
+import httpx
+import pytest
+from llm import LLMError, LMStudioChatClient
+
+
+def sse(*tokens: str) -> bytes:
+    """Ответ LM Studio в формате SSE: по чанку на токен и [DONE]"""
+    events = [json.dumps({"choices": [{"delta": {"content": token}}]}) for token in tokens]
+    return "".join(f"data: {event}\n\n" for event in [*events, "[DONE]"]).encode("utf-8")
+
+
+class TestLMStudioChatClient:
+    """Тесты для LMStudioChatClient"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.requests = []
+
+    def make_client(self, response: httpx.Response, **kwargs) -> LMStudioChatClient:
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return response
+        return LMStudioChatClient(transport=httpx.MockTransport(handler), **kwargs)
+
+    def test_stream_yields_tokens(self):
+        """Тест: токены отдаются по одному, запрос - стриминговый chat completion"""
+        client = self.make_client(httpx.Response(200, content=sse("При", "вет", "!")))
+
+        async def collect():
+            return [token async for token in client.stream([{"role": "user", "content": "Привет"}])]
+
+        assert asyncio.run(collect()) == ["При", "вет", "!"]
+        request = self.requests[0]
+        assert request.url.path == "/v1/chat/completions"
+        assert json.loads(request.content)["stream"] is True
+
+    def test_complete_joins_stream(self):
+        """Тест: complete собирает ответ целиком, чанки без content пропускаются"""
+        body = b'data: {"choices": [{"delta": {"role": "assistant"}}]}\n\n' + sse("Готово")
+        client = self.make_client(httpx.Response(200, content=body))
+
+        assert asyncio.run(client.complete([{"role": "user", "content": "?"}])) == "Готово"
+
+    def test_error_status_raises(self):
+        """Тест: HTTP-ошибка сервера - LLMError с текстом ответа"""
+        client = self.make_client(httpx.Response(404, content=b"model not loaded"))
+
+        with pytest.raises(LLMError, match="model not loaded"):
+            asyncio.run(client.complete([{"role": "user", "content": "?"}]))
+
+    def test_connection_error_raises(self):
+        """Тест: недоступный сервер - LLMError (оркестратор не зависит от исключений httpx)"""
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("connection refused", request=request)
+        client = LMStudioChatClient(transport=httpx.MockTransport(handler))
+
+        with pytest.raises(LLMError, match="connection refused"):
+            asyncio.run(client.complete([{"role": "user", "content": "?"}]))
+
+    def test_from_llm_config(self):
+        """Тест: параметры берутся из llm_config AutoGen агентов"""
+        client = LMStudioChatClient.from_llm_config({
+            "config_list": [{"model": "qwen3.5:35b", "base_url": "http://localhost:1234/v1", "max_tokens": 512}]
+        })
+
+        assert client.model == "qwen3.5:35b"
+        assert client.max_tokens == 512
+        assert client.url == "http://localhost:1234/v1/chat/completions"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,175 @@
+"""
+Unit Tests for LangGraph Orchestrator
+Тестирование RAG-контекста в workflow: бюджет времени и медленный индекс
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from context import count_tokens
+
+
+class EchoAgent:
+    """Агент без LLM: отвечает числом сообщений промпта"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.system_message = f"Ты - {name}"
+
+    def generate_reply(self, messages):
+        return {"content": f"ответ {self.name}"}
+
+
+class SlowIndexer:
+    """Индекс с search_many, который ждёт release (имитация зависшего Qdrant)"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def search_many(self, requests):
+        self.calls.append([(request.collection, request.query) for request in requests])
+        self.release.wait(timeout=5)
+        return [
+            [{"content": f"{request.collection} {request.query}", "file_path": f"{request.collection}.swift",
+              "score": 0.5}]
+            for request in requests
+        ]
+
+
+class FixedIndexer:
+    """Индекс с готовыми результатами по источникам; error - search_many падает"""
+
+    def __init__(self, results=None, error=None):
+        self.results = results or {}
+        self.error = error
+
+    def search_many(self, requests):
+        if self.error is not None:
+            raise self.error
+        return [self.results.get(request.collection, []) for request in requests]
+
+
+class FakeChatClient:
+    """Стриминг для astream: агенты без LLM отвечают одной строкой"""
+
+    async def stream(self, messages):
+        yield "ответ"
+
+
+class TestRagContext:
+    """Тесты для RAG-узла LangGraphOrchestrator"""
+
+    @pytest.fixture(autouse=True)
+    def orchestrator(self, orchestrator_module):
+        """Оркестратор без checkpoint'ов с медленным индексом и бюджетом RAG 50 мс"""
+        self.module = orchestrator_module
+        self.orchestrator = orchestrator_module.LangGraphOrchestrator(
+            rag_budget_ms=50, session_store_path=None, checkpoint_path=None
+        )
+        agents = {agent["subagent_type"]: EchoAgent(agent["subagent_type"])
+                  for agent in self.orchestrator.agents_config["agents"]}
+        self.orchestrator.autogen_generator = SimpleNamespace(auto_gen_agents=agents)
+        self.orchestrator.chat_client = FakeChatClient()
+        self.indexer = SlowIndexer()
+        self.orchestrator.init_rag(self.indexer)
+        self.orchestrator.compile()
+        yield
+        self.indexer.release.set()
+
+    def stream_events(self, query):
+        async def collect():
+            return [event async for event in self.orchestrator.astream(query)]
+        return asyncio.run(collect())
+
+    def test_slow_search_misses_budget(self):
+        """Тест: медленный поиск не задерживает запрос, контекст пустой"""
+        started = time.perf_counter()
+        result = self.orchestrator.invoke("Создай SwiftUI View")
+
+        assert time.perf_counter() - started < 1
+        assert result["context_from_qdrant"] == []
+        assert self.indexer.calls == [[("code", "Создай SwiftUI View"), ("docs", "Создай SwiftUI View")]]
+
+    def test_stale_searches_do_not_queue(self):
+        """Тест: пока все потоки заняты зависшими поисками, новые запросы идут без RAG, а не в очередь"""
+        for n in range(self.module.RAG_WORKERS + 3):
+            self.orchestrator.invoke(f"Создай SwiftUI View {n}")
+
+        assert len(self.indexer.calls) == self.module.RAG_WORKERS
+
+        # Индекс ожил: поиски завершаются, следующий запрос снова получает контекст
+        self.indexer.release.set()
+        deadline = time.perf_counter() + 2
+        while self.orchestrator._rag_inflight and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        result = self.orchestrator.invoke("Создай SwiftUI View")
+
+        assert sorted(chunk["source"] for chunk in result["context_from_qdrant"]) == ["code", "docs"]
+
+    def test_token_budget_keeps_whole_chunks(self):
+        """Тест: контекст обрезается по границам чанков в пределах rag_token_budget"""
+        hits = [
+            {"content": f"struct View{i} {{\n" + "    let value: Int\n" * 20 + "}", "file_path": f"View{i}.swift",
+             "start_line": 1, "end_line": 22, "score": 1.0 - i / 10}
+            for i in range(6)
+        ]
+        chunk_tokens = count_tokens(f"// View0.swift:1-22\n{hits[0]['content']}") + 1
+        self.orchestrator.rag_token_budget = chunk_tokens * 2 + chunk_tokens // 2
+        self.orchestrator.init_rag(FixedIndexer({"code": hits}))
+
+        context = self.orchestrator.invoke("Создай SwiftUI View")["context_from_qdrant"]
+
+        assert [chunk["file_path"] for chunk in context] == ["View0.swift", "View1.swift"]
+        assert [chunk["content"] for chunk in context] == [hits[0]["content"], hits[1]["content"]]
+
+    def test_failed_search_reported_in_stream(self):
+        """Тест: упавший поиск не ломает запрос, его источники попадают в missed события rag"""
+        self.orchestrator.init_rag(FixedIndexer(error=ConnectionError("Qdrant недоступен")))
+
+        events = self.stream_events("Создай SwiftUI View")
+
+        rag = next(event for event in events if event["type"] == "rag")
+        assert rag["missed"] == ["code", "docs"]
+        assert rag["chunks"] == 0 and rag["skipped"] is False
+        assert events[-1]["type"] == "done" and events[-1]["context_from_qdrant"] == []
+
+
+
+class SlowChatClient:
+    """Стриминг, который отдаёт первый токен и зависает"""
+
+    async def stream(self, messages):
+        yield "начало"
+        await asyncio.sleep(5)
+        yield "конец"
+
+
+class TestAgentDeadline:
+    """Тесты для дедлайна агентов в ainvoke"""
+
+    def test_slow_agent_returns_partial_answer(self, orchestrator_module):
+        """Тест: агент, не уложившийся в agent_deadline, отдаёт частичный ответ со статусом timeout"""
+        orchestrator = orchestrator_module.LangGraphOrchestrator(
+            agent_deadline=0.1, session_store_path=None, checkpoint_path=None
+        )
+        agents = {agent["subagent_type"]: EchoAgent(agent["subagent_type"])
+                  for agent in orchestrator.agents_config["agents"]}
+        orchestrator.autogen_generator = SimpleNamespace(auto_gen_agents=agents)
+        orchestrator.chat_client = SlowChatClient()
+        orchestrator.compile()
+
+        started = time.perf_counter()
+        result = asyncio.run(orchestrator.ainvoke("Создай SwiftUI View"))
+
+        assert time.perf_counter() - started < 2
+        assert [response["status"] for response in result["agent_responses"]] == ["timeout"]
+        assert result["agent_response"] == "начало"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,257 @@
+"""
+Unit Tests for Routing
+Тестирование компонентов маршрутизации запросов к агентам (без LLM)
+"""
+
+import random
+import pytest
+from indexing import EmbeddingEngine, HashingEmbeddingBackend
+from routing import (
+    KeywordAutomaton, KeywordMatch, KeywordRouter, SemanticRouter, HybridRouter,
+    RoutingCache, RoutingDecision, normalize_routing_query,
+)
+
+
+class TestKeywordAutomaton:
+    """Тесты для автомата Aho-Corasick"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.matcher = KeywordAutomaton(["UI", "SwiftUI", "View", "ViewModel", "LM Studio", "модальное окно"])
+
+    def test_all_overlapping_matches_in_one_pass(self):
+        """Тест: вложенные ключевые слова находятся все, с позициями"""
+        matches = self.matcher.find_all("Создай SwiftUI ViewModel")
+
+        assert matches == [
+            KeywordMatch("swiftui", 7, 14),
+            KeywordMatch("ui", 12, 14),
+            KeywordMatch("view", 15, 19),
+            KeywordMatch("viewmodel", 15, 24),
+        ]
+
+    def test_case_insensitive_and_multiword(self):
+        """Тест: регистр не учитывается, ключевые слова из нескольких слов находятся"""
+        matched = self.matcher.matched_keywords("Как подключить lm studio и показать МОДАЛЬНОЕ ОКНО?")
+
+        assert list(matched) == ["lm studio", "модальное окно"]
+        assert "LM Studio" in self.matcher
+        assert self.matcher.find_all("сборка проекта") == []
+
+    def test_matches_naive_substring_search(self):
+        """Тест: результат совпадает с наивным поиском подстрок, в том числе после add()"""
+        rng = random.Random(7)
+        for _ in range(200):
+            keywords = list({"".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(6)})
+            matcher = KeywordAutomaton(keywords[:3])
+            for keyword in keywords[3:]:
+                matcher.add(keyword)
+            text = "".join(rng.choice("abcd") for _ in range(30))
+
+            found = sorted((match.keyword, match.start) for match in matcher.iter_matches(text))
+            expected = sorted((keyword, i) for keyword in keywords for i in range(len(text))
+                              if text.startswith(keyword, i))
+            assert found == expected
+
+    def test_duplicate_and_empty_keywords(self):
+        """Тест: повторное ключевое слово не дублируется, пустое - ошибка"""
+        assert self.matcher.add("swiftui") == self.matcher.add("SwiftUI")
+        assert len(self.matcher) == 6
+        with pytest.raises(ValueError):
+            self.matcher.add("")
+
+
+class TestKeywordRouter:
+    """Тесты для скоринговой маршрутизации"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.agents_config = {
+            "agents": [
+                {"subagent_type": "client_developer", "trigger_keywords": ["UI", "SwiftUI", "View", "компонент"]},
+                {"subagent_type": "designer", "trigger_keywords": ["дизайн", "компонент", "иконка"]},
+                {"subagent_type": "devops", "trigger_keywords": ["build", "сборка"]},
+                {"subagent_type": "server_developer", "trigger_keywords": ["API", "network"]},
+                {"subagent_type": "cto", "trigger_keywords": ["архитектура"]},
+            ],
+            "fallback": {"default_subagent": "cto"},
+        }
+        self.router = KeywordRouter.from_mapping(self.agents_config, {"UI": ["client_developer", "designer"]})
+
+    def test_ranked_candidates_with_scores(self):
+        """Тест: несколько совпадений дают ранжированный список с объяснением"""
+        decision = self.router.route("Создай SwiftUI View для экрана")
+
+        assert decision.agent == "client_developer"
+        assert not decision.fallback
+        assert decision.confidence > 0.9
+        assert [c.agent for c in decision.candidates] == ["client_developer", "designer"]
+        assert set(decision.candidates[0].keywords) == {"swiftui", "ui", "view"}
+        assert decision.candidates[0].score > decision.candidates[1].score > 0
+
+    def test_specific_keyword_outweighs_shared(self):
+        """Тест: ключевое слово одного агента весит больше общего для нескольких"""
+        decision = self.router.route("компонент для дизайн-системы")
+
+        assert decision.agent == "designer"
+        assert self.router.idf["дизайн"] > self.router.idf["компонент"]
+
+    def test_match_inside_word_falls_back(self):
+        """Тест: совпадение внутри другого слова ("ui" в "guide") не уверенно - ответ fallback-агента"""
+        decision = self.router.route("Напиши guide по проекту")
+
+        assert decision.fallback
+        assert decision.agent == "cto"
+        assert decision.candidates[0].agent == "client_developer"
+        assert decision.confidence < self.router.min_confidence
+
+    def test_word_form_counts_as_prefix_match(self):
+        """Тест: словоформа ("компонента") засчитывается как начало слова"""
+        weights = self.router.keyword_weights("Нужен новый компонента")
+
+        assert weights == {"компонент": pytest.approx(0.6)}
+
+    def test_top_agents_for_fan_out(self):
+        """Тест: для fan-out берутся уверенные кандидаты, близкие к лучшему; fallback - один агент"""
+        decision = self.router.route("UI для экрана")
+
+        assert self.router.top_agents(decision, 3) == ["client_developer", "designer"]
+        assert self.router.top_agents(decision, 1) == ["client_developer"]
+        assert self.router.top_agents(self.router.route("Привет!"), 3) == ["cto"]
+
+    def test_no_matches_routes_to_fallback(self):
+        """Тест: запрос без ключевых слов уходит fallback-агенту из маппинга"""
+        decision = self.router.route("Привет!")
+
+        assert decision.agent == "cto"
+        assert decision.fallback
+        assert decision.to_dict()["candidates"] == []
+
+
+class TestSemanticRouter:
+    """Тесты для семантической маршрутизации по центроидам"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.agents_config = {
+            "agents": [
+                {"subagent_type": "designer", "domains": ["Visual Elements", "Design System"],
+                 "trigger_keywords": ["дизайн"]},
+                {"subagent_type": "devops", "domains": ["Build Automation", "CI/CD"], "trigger_keywords": ["сборка"]},
+                {"subagent_type": "cto", "domains": ["Architecture"], "trigger_keywords": ["архитектура"]},
+            ],
+            "fallback": {"default_subagent": "cto"},
+        }
+
+    def make_embedder(self) -> EmbeddingEngine:
+        return EmbeddingEngine(HashingEmbeddingBackend(dim=256), max_workers=1)
+
+    def test_centroids_are_one_matrix(self, tmp_path):
+        """Тест: центроиды - нормализованная матрица, все тексты эмбеддятся одним батчем"""
+        embedder = self.make_embedder()
+        router = SemanticRouter.from_mapping(self.agents_config, embedder, tmp_path / "centroids.npz")
+
+        assert router.agents == ["designer", "devops", "cto"]
+        assert router.centroids.shape == (3, 256)
+        assert embedder.backend_calls == 1
+        assert router.rank("automation of the build")[0].agent == "devops"
+
+    def test_centroids_are_cached_on_disk(self, tmp_path):
+        """Тест: повторный старт с тем же маппингом не вызывает модель, изменение маппинга - пересчёт"""
+        SemanticRouter.from_mapping(self.agents_config, self.make_embedder(), tmp_path / "centroids.npz")
+
+        embedder = self.make_embedder()
+        SemanticRouter.from_mapping(self.agents_config, embedder, tmp_path / "centroids.npz")
+        assert embedder.backend_calls == 0
+
+        self.agents_config["agents"][0]["trigger_keywords"].append("иконка")
+        SemanticRouter.from_mapping(self.agents_config, embedder, tmp_path / "centroids.npz")
+        assert embedder.backend_calls == 1
+
+    def test_hybrid_routes_paraphrase_without_keywords(self, tmp_path):
+        """Тест: запрос без ключевых слов уходит агенту по семантике, а не fallback-агенту"""
+        keyword_router = KeywordRouter.from_mapping(self.agents_config)
+        semantic = SemanticRouter.from_mapping(self.agents_config, self.make_embedder())
+        router = HybridRouter(keyword_router, semantic, min_similarity=0.2)
+
+        assert keyword_router.route("refresh visual elements palette").fallback
+        decision = router.route("refresh visual elements palette")
+        assert decision.agent == "designer"
+        assert not decision.fallback
+        assert decision.candidates[0].semantic > 0.2
+
+        # Точное ключевое слово по-прежнему решает
+        assert router.route("сборка релиза").agent == "devops"
+
+    def test_hybrid_falls_back_and_backs_off(self, tmp_path):
+        """Тест: ошибка эмбеддинга - маршрутизация по ключевым словам, сервер не опрашивается до конца паузы"""
+        semantic = SemanticRouter.from_mapping(self.agents_config, self.make_embedder())
+        router = HybridRouter(KeywordRouter.from_mapping(self.agents_config), semantic, failure_cooldown=60)
+        calls = []
+
+        def broken(query):
+            calls.append(query)
+            raise ValueError("Expecting value: line 1 column 1")
+
+        semantic.similarities = broken
+        assert router.route("сборка релиза").agent == "devops"
+        assert router.route("refresh visual elements palette").fallback
+        assert calls == ["сборка релиза"]
+        assert not router.semantic_available
+
+        router._disabled_until = 0.0
+        del semantic.similarities
+        assert router.route("refresh visual elements palette").agent == "designer"
+
+
+class TestRoutingCache:
+    """Тесты для кэша решений маршрутизации"""
+
+    def setup_method(self):
+        """Подготовка перед каждым тестом"""
+        self.cache = RoutingCache(max_entries=2)
+
+    def test_normalized_key_hits(self):
+        """Тест: регистр и пробелы не влияют на ключ, счётчики попаданий и промахов"""
+        decision = RoutingDecision("devops", 0.9)
+        assert self.cache.get("Сборка  проекта") is None
+        self.cache.put("Сборка  проекта", decision)
+
+        assert self.cache.get("  сборка проекта ") is decision
+        assert self.cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+    def test_cached_decision_matches_fresh(self):
+        """Тест: решение по routing_query одинаково для вариантов запроса, делящих ключ"""
+        router = KeywordRouter.from_mapping({
+            "agents": [
+                {"subagent_type": "server_developer", "trigger_keywords": ["LM Studio"]},
+                {"subagent_type": "cto", "trigger_keywords": ["архитектура"]},
+            ],
+            "fallback": {"default_subagent": "cto"},
+        })
+        queries = ["Подключи LM  Studio", "подключи lm studio"]
+
+        assert router.route(queries[0]).fallback
+        assert {self.cache.make_key(query) for query in queries} == {"подключи lm studio"}
+        assert {router.route(self.cache.routing_query(query)).agent for query in queries} == {"server_developer"}
+
+    def test_lru_eviction(self):
+        """Тест: при переполнении вытесняется давно не использованный запрос"""
+        self.cache.put("a", RoutingDecision("cto", 0.0))
+        self.cache.put("b", RoutingDecision("cto", 0.0))
+        self.cache.get("a")
+        self.cache.put("c", RoutingDecision("cto", 0.0))
+
+        assert self.cache.get("b") is None
+        assert self.cache.get("a") is not None
+        assert len(self.cache) == 2
+
+    def test_optional_russian_stemming(self):
+        """Тест: со stem словоформы дают один ключ, короткие и латинские слова не меняются"""
+        assert normalize_routing_query("Сборки проекта") != normalize_routing_query("сборка проекту")
+        assert normalize_routing_query("Сборки проекта", stem=True) == normalize_routing_query("сборка проекту", stem=True)
+        assert normalize_routing_query("UI API вид", stem=True) == "ui api вид"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])